@@ -0,0 +1,257 @@
+import datetime
+import logging
+import os
+import threading
+import time
+
+from cache import LRUCache
+from db import get_connection
+
+try:
+    import numpy as np
+except ImportError:  # Optional: cohort analytics are unavailable without it
+    np = None
+
+log = logging.getLogger(__name__)
+
+# Same thresholds as ingest.grade_for(): below 60 is C, 90 and above is A+
+GRADE_EDGES = (60, 70, 80, 90)
+GRADE_LABELS = ('C', 'B', 'B+', 'A', 'A+')
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = 10
+
+# One cohort's marks, read through idx_academic_records_standard_year
+COHORT_SQL = """
+    SELECT ar.student_id, s.current_school_id, ar.subject, CAST(ar.percentage AS DOUBLE)
+    FROM academic_records ar
+    JOIN students s ON s.student_id = ar.student_id
+    WHERE ar.school_standard = %s AND ar.academic_year = %s
+"""
+
+
+class AnalyticsUnavailable(RuntimeError):
+    """ NumPy is not installed """
+
+
+def available():
+    return np is not None
+
+
+def load_marks(standard, academic_year, school_id=None):
+    """ ``(student_ids, school_ids, subject_codes, subject_names, percentages)`` for one cohort.
+
+    One query over idx_academic_records_standard_year, which covers every
+    academic_records column read here. Subjects come back as integer codes
+    into ``subject_names``; NumPy is far slower at sorting strings.
+    """
+    sql = COHORT_SQL
+    params = [standard, academic_year]
+    if school_id is not None:
+        sql += " AND s.current_school_id = %s"
+        params.append(school_id)
+
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        cursor.close()
+
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, [], np.empty(0, dtype=np.float64)
+    student_ids, school_ids, subjects, percentages = zip(*rows)
+    codes = {}
+    subject_codes = np.fromiter((codes.setdefault(subject, len(codes)) for subject in subjects),
+                                dtype=np.int64, count=len(rows))
+    return (
+        np.fromiter(student_ids, dtype=np.int64, count=len(rows)),
+        # Students without a school are grouped under -1
+        np.fromiter((-1 if school is None else school for school in school_ids),
+                    dtype=np.int64, count=len(rows)),
+        subject_codes,
+        list(codes),
+        np.fromiter(percentages, dtype=np.float64, count=len(rows)),
+    )
+
+
+def _grade_counts(values):
+    counts = np.bincount(np.searchsorted(GRADE_EDGES, values, side='right'), minlength=len(GRADE_LABELS))
+    return {label: int(count) for label, count in zip(GRADE_LABELS, counts)}
+
+
+def _describe(values):
+    """ Count, mean, spread and percentiles of a non-empty float array """
+    return {
+        "count": int(values.size),
+        "average": round(float(values.mean()), 2),
+        "stdDev": round(float(values.std()), 2),
+        "min": round(float(values.min()), 2),
+        "max": round(float(values.max()), 2),
+        "percentiles": {
+            f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))
+        },
+        "gradeDistribution": _grade_counts(values),
+    }
+
+
+class Cohort:
+    """ Marks statistics and rankings for one (school, standard, academic year).
+
+    Everything is computed once, in vectorized form, when the cohort is built;
+    lookups afterwards are array indexing or a binary search.
+    """
+
+    def __init__(self, key, student_ids, school_ids, subject_codes, subject_names, percentages):
+        started = time.perf_counter()
+        self.key = key
+        self.records = int(percentages.size)
+
+        # Dense student index; np.unique also sorts the ids for searchsorted()
+        self.student_ids, student_index = np.unique(student_ids, return_inverse=True)
+        size = self.student_ids.size
+        # Renumber subject codes so subjects are reported alphabetically
+        by_name = sorted(range(len(subject_names)), key=subject_names.__getitem__)
+        self.subject_names = [subject_names[code] for code in by_name]
+        renumber = np.empty(len(subject_names), dtype=np.int64)
+        renumber[by_name] = np.arange(len(subject_names))
+        subject_index = renumber[subject_codes]
+
+        # The school of each student (all of a student's rows carry the same one)
+        self.school_ids = np.empty(size, dtype=np.int64)
+        self.school_ids[student_index] = school_ids
+
+        # Per-student average across their subjects, rounded so equal averages tie exactly
+        counts = np.bincount(student_index, minlength=size)
+        totals = np.bincount(student_index, weights=percentages, minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.averages = np.round(totals / counts, 2)
+        self.subject_counts = counts
+
+        # Competition ranking ("1224"): 1 + number of strictly higher averages
+        ascending = np.sort(self.averages)
+        self.ranks = size - np.searchsorted(ascending, self.averages, side='right') + 1
+        # Share of the cohort strictly below each student
+        self.percentile_ranks = np.round(
+            np.searchsorted(ascending, self.averages, side='left') * 100.0 / max(size, 1), 2
+        )
+        # Student positions ordered by rank, ties by student id
+        self.order = np.lexsort((self.student_ids, self.ranks))
+
+        self.overall = _describe(self.averages) if size else None
+        if size:
+            self.overall["records"] = self.records
+            edges = np.linspace(0, 100, HISTOGRAM_BINS + 1)
+            histogram, _ = np.histogram(self.averages, bins=edges)
+            self.overall["histogram"] = {"edges": edges.tolist(), "counts": histogram.tolist()}
+
+        # Per-subject statistics over contiguous slices of the marks sorted by subject
+        by_subject = np.argsort(subject_index, kind='stable')
+        bounds = np.searchsorted(subject_index[by_subject], np.arange(len(self.subject_names) + 1))
+        sorted_marks = percentages[by_subject]
+        self.subjects = [
+            {"subject": str(name), **_describe(sorted_marks[bounds[i]:bounds[i + 1]])}
+            for i, name in enumerate(self.subject_names)
+        ]
+
+        self.computed_at = datetime.datetime.now().isoformat(timespec='seconds')
+        self.compute_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    def __len__(self):
+        return int(self.student_ids.size)
+
+    def _entry(self, position):
+        return {
+            "student_id": int(self.student_ids[position]),
+            "school_id": None if self.school_ids[position] == -1 else int(self.school_ids[position]),
+            "rank": int(self.ranks[position]),
+            "average": float(self.averages[position]),
+            "percentileRank": float(self.percentile_ranks[position]),
+            "subjects": int(self.subject_counts[position]),
+        }
+
+    def ranking(self, offset=0, limit=50):
+        """ Students from ``offset`` in rank order """
+        return [self._entry(position) for position in self.order[offset:offset + limit]]
+
+    def position(self, student_id):
+        """ Index of a student in the cohort arrays, or None """
+        index = int(np.searchsorted(self.student_ids, student_id))
+        if index < len(self) and self.student_ids[index] == student_id:
+            return index
+        return None
+
+    def student(self, student_id):
+        position = self.position(student_id)
+        return None if position is None else self._entry(position)
+
+    def school_of(self, student_id):
+        position = self.position(student_id)
+        if position is None or self.school_ids[position] == -1:
+            return None
+        return int(self.school_ids[position])
+
+    def summary(self):
+        school_id, standard, academic_year = self.key
+        return {
+            "schoolId": school_id,
+            "standard": standard,
+            "academicYear": academic_year,
+            "students": len(self),
+            "overall": self.overall,
+            "subjects": self.subjects,
+            "computedAt": self.computed_at,
+            "computeMs": self.compute_ms,
+        }
+
+
+class CohortCache:
+    """ Built cohorts keyed by (school_id, standard, academic_year).
+
+    invalidate(standard, academic_year) bumps a generation that is part of the
+    cache key, which drops the standard-wide cohort and every school's at once;
+    the superseded entries simply age out of the LRU.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self._cache = LRUCache(max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self._generations = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(int(os.environ.get('ANALYTICS_CACHE_SIZE', 64)),
+                   float(os.environ.get('ANALYTICS_CACHE_TTL', 600)))
+
+    def get(self, standard, academic_year, school_id=None):
+        if np is None:
+            raise AnalyticsUnavailable("Cohort analytics need NumPy (pip install numpy)")
+        key = (school_id, standard, academic_year)
+        with self._lock:
+            generation = self._generations.get((standard, academic_year), 0)
+        cohort = self._cache.get((key, generation))
+        if cohort is not None:
+            with self._lock:
+                self.hits += 1
+            return cohort
+
+        with self._lock:
+            self.misses += 1
+        cohort = Cohort(key, *load_marks(standard, academic_year, school_id))
+        log.info("Built cohort %s: %d students in %.1fms", key, len(cohort), cohort.compute_ms)
+        self._cache.set((key, generation), cohort)
+        return cohort
+
+    def invalidate(self, standard, academic_year):
+        with self._lock:
+            key = (standard, academic_year)
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses,
+                    "evictions": self._cache.evictions}
+
+
+cohort_cache = CohortCache.from_env()
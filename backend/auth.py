@@ -0,0 +1,197 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from functools import wraps
+
+from flask import g, jsonify, request
+from werkzeug.security import check_password_hash, generate_password_hash
+
+try:
+    from gevent import get_hub, monkey
+except ImportError:  # Optional: only used when served by gevent workers
+    get_hub = monkey = None
+
+log = logging.getLogger(__name__)
+
+ACCESS_TOKEN_TTL = int(os.environ.get('AUTH_ACCESS_TOKEN_TTL', 15 * 60))
+REFRESH_TOKEN_TTL = int(os.environ.get('AUTH_REFRESH_TOKEN_TTL', 7 * 24 * 3600))
+
+_secret = os.environ.get('AUTH_SECRET')
+if not _secret:
+    # Tokens from a random secret stop verifying on restart and differ between
+    # worker processes; set AUTH_SECRET for anything beyond local development
+    log.warning("AUTH_SECRET is not set; using a random per-process signing key")
+    _secret = secrets.token_hex(32)
+SECRET = _secret.encode()
+
+ROLES = ('student', 'admin')
+
+
+class AuthError(Exception):
+    pass
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _sign(payload):
+    return _b64encode(hmac.new(SECRET, payload.encode('ascii'), hashlib.sha256).digest())
+
+
+def issue_token(user_id, role, kind='access'):
+    """ Signed ``payload.signature`` token carrying the user id, role and expiry """
+    now = int(time.time())
+    claims = {
+        "sub": user_id,
+        "role": role,
+        "typ": kind,
+        "iat": now,
+        "exp": now + (ACCESS_TOKEN_TTL if kind == 'access' else REFRESH_TOKEN_TTL),
+        "jti": secrets.token_hex(8),
+    }
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_token(token, kind='access'):
+    """ Return the token's claims, or raise AuthError. No database access. """
+    try:
+        payload, signature = token.split('.')
+    except (AttributeError, ValueError):
+        raise AuthError("Malformed token")
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise AuthError("Invalid token signature")
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        raise AuthError("Malformed token")
+    if claims.get('typ') != kind:
+        raise AuthError("Wrong token type")
+    if claims.get('exp', 0) <= time.time():
+        raise AuthError("Token expired")
+    if revocations.is_revoked(claims.get('jti')):
+        raise AuthError("Token revoked")
+    return claims
+
+
+class RevocationList:
+    """ In-process set of revoked token ids, each kept only until the token would expire.
+
+    Not shared between worker processes; with several workers a revoked token
+    stays usable elsewhere until it expires, which the short access-token
+    lifetime bounds.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, jti, expires_at):
+        now = time.time()
+        with self._lock:
+            self._entries[jti] = expires_at
+            # Prune on write; reads stay a single dict lookup
+            for expired in [key for key, exp in self._entries.items() if exp <= now]:
+                del self._entries[expired]
+
+    def is_revoked(self, jti):
+        return jti in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+revocations = RevocationList()
+
+
+def revoke(claims):
+    revocations.revoke(claims['jti'], claims['exp'])
+
+
+def token_pair(user_id, role):
+    return {
+        "token": issue_token(user_id, role, 'access'),
+        "refreshToken": issue_token(user_id, role, 'refresh'),
+        "expiresIn": ACCESS_TOKEN_TTL,
+    }
+
+
+def _off_loop(fn, *args):
+    """ Run slow password hashing without stalling a gevent worker's event loop.
+
+    hashlib releases the GIL while it hashes. With threaded servers the request
+    thread can simply run it. Under gevent every request shares one OS thread,
+    so the work goes to the hub's native thread pool and only this greenlet waits.
+    """
+    if monkey is not None and monkey.is_module_patched('threading'):
+        return get_hub().threadpool.apply(fn, args)
+    return fn(*args)
+
+
+def is_password_hash(stored):
+    return stored.startswith(('pbkdf2:', 'scrypt:'))
+
+
+def hash_password(password):
+    return _off_loop(generate_password_hash, password)
+
+
+def check_password(stored, password):
+    """ Returns ``(ok, needs_rehash)``; plaintext legacy passwords match but need rehashing """
+    if not stored:
+        return False, False
+    if is_password_hash(stored):
+        return _off_loop(check_password_hash, stored, password), False
+    ok = hmac.compare_digest(stored.encode(), password.encode())
+    return ok, ok
+
+
+def bearer_token():
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[7:].strip()
+    return None
+
+
+def require_auth(*roles, query_token=False):
+    """ Guard a route to the given roles using the request's bearer token.
+
+    The verified claims are stored on ``g.auth``. A student may only reach
+    routes whose ``student_id`` argument is their own; admins may reach any.
+    With ``query_token`` the token may also come from ``?token=``, for clients
+    such as EventSource that cannot set headers; such URLs end up in access
+    logs, so only use it where it is needed.
+    """
+    roles = roles or ROLES
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            token = bearer_token()
+            if not token and query_token:
+                token = request.args.get('token')
+            if not token:
+                return jsonify({"message": "Authentication required"}), 401
+            try:
+                claims = verify_token(token)
+            except AuthError as e:
+                return jsonify({"message": str(e)}), 401
+            if claims['role'] not in roles:
+                return jsonify({"message": "Forbidden"}), 403
+            if claims['role'] == 'student' and 'student_id' in kwargs and kwargs['student_id'] != claims['sub']:
+                return jsonify({"message": "Forbidden"}), 403
+            g.auth = claims
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
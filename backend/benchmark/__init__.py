@@ -0,0 +1,11 @@
+""" Benchmark tooling for the OnePass backend.
+
+Run from the backend directory against a throwaway database:
+
+    python -m benchmark.generate --students 100000 --records 5000000
+    python -m benchmark.load --duration 60 --concurrency 16 --output results/baseline.json
+    python -m benchmark.compare results/baseline.json results/candidate.json
+
+The load driver uses only the standard library; the generator needs the
+backend's own requirements (mysql-connector, werkzeug).
+"""
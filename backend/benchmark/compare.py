@@ -0,0 +1,75 @@
+""" Compare two benchmark.load reports and fail on latency or error-rate regressions """
+import argparse
+import json
+import sys
+
+
+def load_report(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def delta(base, new):
+    if not base:
+        return None
+    return (new - base) / base
+
+
+def format_delta(value):
+    return '     n/a' if value is None else f"{value * 100:+7.1f}%"
+
+
+def compare(base, new, threshold):
+    """ Print per-endpoint percentile deltas; returns the list of regressions found """
+    regressions = []
+    header = f"{'endpoint':58} {'p50 Δ':>8} {'p95 Δ':>8} {'p99 Δ':>8} {'err% base':>9} {'err% new':>9}"
+    print(header)
+    print('-' * len(header))
+
+    labels = sorted(set(base["endpoints"]) | set(new["endpoints"]))
+    for label in labels + ['TOTAL']:
+        if label == 'TOTAL':
+            before, after = base["total"], new["total"]
+        else:
+            before, after = base["endpoints"].get(label), new["endpoints"].get(label)
+        if before is None or after is None:
+            print(f"{label[:58]:58} {'only in ' + ('new' if before is None else 'base'):>26}")
+            continue
+
+        changes = {p: delta(before["latency_ms"][p], after["latency_ms"][p]) for p in ('p50', 'p95', 'p99')}
+        print(f"{label[:58]:58} {format_delta(changes['p50'])} {format_delta(changes['p95'])} "
+              f"{format_delta(changes['p99'])} {before['error_rate'] * 100:>8.2f}% {after['error_rate'] * 100:>8.2f}%")
+
+        if changes['p95'] is not None and changes['p95'] > threshold:
+            regressions.append(f"{label}: p95 {before['latency_ms']['p95']:.2f}ms -> "
+                               f"{after['latency_ms']['p95']:.2f}ms ({changes['p95'] * 100:+.1f}%)")
+        if after["error_rate"] > before["error_rate"]:
+            regressions.append(f"{label}: error rate {before['error_rate'] * 100:.2f}% -> "
+                               f"{after['error_rate'] * 100:.2f}%")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument('base', help="report from the baseline run")
+    parser.add_argument('new', help="report from the candidate run")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="allowed relative p95 increase per endpoint (default 0.10)")
+    args = parser.parse_args(argv)
+
+    base, new = load_report(args.base), load_report(args.new)
+    for key in ('concurrency', 'student_share', 'writes', 'compressed'):
+        if base["meta"].get(key) != new["meta"].get(key):
+            print(f"Warning: runs differ in {key} ({base['meta'].get(key)} vs {new['meta'].get(key)})")
+
+    regressions = compare(base, new, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over the {args.threshold:.0%} threshold:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+""" Fill the create_tables.sql schema with synthetic data at realistic volumes.
+
+Every generated user has the password ``password`` (stored hashed) and a
+predictable username: ``bench_student_<n>`` and ``bench_admin``, which is
+what benchmark.load logs in as. Output is deterministic for a given seed.
+"""
+import argparse
+import datetime
+import random
+import sys
+import time
+
+from werkzeug.security import generate_password_hash
+
+import schema
+import summary
+from db import get_connection
+
+STANDARDS = ['1st', '2nd', '3rd', '4th', '5th', '6th', '7th', '8th', '9th', '10th', '11th', '12th']
+SUBJECTS = ['Mathematics', 'Science', 'English', 'Hindi', 'Social Studies',
+            'Computer Science', 'Physical Education', 'Art']
+DOCUMENT_TYPES = ['Birth Certificate', 'Aadhaar Card', 'Marksheet', 'Transfer Certificate', 'Photo']
+TC_STATUSES = ['pending', 'approved', 'rejected']
+SCHEME_STATUSES = ['active', 'completed', 'cancelled']
+
+PASSWORD = 'password'
+FINAL_YEAR = 2024  # 12th standard is the FINAL_YEAR-(FINAL_YEAR+1) academic year
+
+# Tables written by the generator, children first so --reset can truncate in order
+TABLES = ['scheme_history', 'transfer_certificates', 'documents', 'academic_records',
+          'students', 'schemes', 'schools', 'admins']
+
+
+def grade_for(marks):
+    if marks >= 90:
+        return 'A+'
+    if marks >= 80:
+        return 'A'
+    if marks >= 70:
+        return 'B+'
+    if marks >= 60:
+        return 'B'
+    return 'C'
+
+
+def academic_year(standard_index):
+    start = FINAL_YEAR - (len(STANDARDS) - 1 - standard_index)
+    return f"{start}-{start + 1}"
+
+
+def random_date(rng, start, days):
+    return start + datetime.timedelta(days=rng.randrange(days))
+
+
+class Writer:
+    """ Batches rows per table into multi-row INSERTs, committing each batch """
+
+    def __init__(self, connection, db_schema, batch_size):
+        self.connection = connection
+        self.cursor = connection.cursor()
+        self.schema = db_schema
+        self.batch_size = batch_size
+        self.counts = {}
+
+    def write(self, table, rows):
+        """ ``rows`` yields dicts; keys the table does not have are dropped """
+        columns = None
+        batch = []
+        for row in rows:
+            if columns is None:
+                columns = [column for column in row if self.schema.has_column(table, column)]
+            batch.append(tuple(row[column] for column in columns))
+            if len(batch) >= self.batch_size:
+                self._flush(table, columns, batch)
+                batch = []
+        if batch:
+            self._flush(table, columns, batch)
+
+    def _flush(self, table, columns, batch):
+        self.cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+            batch
+        )
+        self.connection.commit()
+        self.counts[table] = self.counts.get(table, 0) + len(batch)
+
+
+def generate(args):
+    rng = random.Random(args.seed)
+    password_hash = generate_password_hash(PASSWORD)  # one hash shared by every generated user
+    db_schema = schema.refresh()
+    missing = [table for table in TABLES if not db_schema.has_table(table)]
+    if missing:
+        sys.exit(f"Missing tables {', '.join(missing)}; run create_tables.sql and migrate.py first")
+
+    records_per_student = min(len(STANDARDS) * len(SUBJECTS), -(-args.records // args.students))
+    today = datetime.date(FINAL_YEAR + 1, 3, 31)
+
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM students")
+        if cursor.fetchone()[0] and not args.reset:
+            sys.exit("students is not empty; pass --reset to truncate the generated tables first")
+
+        # Bulk-load settings for this session only
+        cursor.execute("SET foreign_key_checks = 0")
+        cursor.execute("SET unique_checks = 0")
+        if args.reset:
+            for table in TABLES:
+                cursor.execute(f"TRUNCATE TABLE {table}")
+
+        writer = Writer(connection, db_schema, args.batch_size)
+        started = time.perf_counter()
+
+        writer.write('admins', ({
+            "admin_id": 1, "name": "Bench Admin", "username": "bench_admin", "password": password_hash,
+        } for _ in range(1)))
+
+        writer.write('schools', ({
+            "school_id": n,
+            "name": f"Government School {n}",
+            "address": f"{n} School Road",
+            "contact_info": f"school{n}@example.com",
+        } for n in range(1, args.schools + 1)))
+
+        writer.write('schemes', ({
+            "scheme_id": n,
+            "name": f"Scheme {n}",
+            "description": f"Synthetic benefit scheme {n}",
+        } for n in range(1, args.schemes + 1)))
+
+        writer.write('students', ({
+            "student_id": n,
+            "name": f"Bench Student {n}",
+            "username": f"bench_student_{n}",
+            "password": password_hash,
+            "dob": random_date(rng, datetime.date(2005, 1, 1), 3650),
+            "current_school_id": rng.randint(1, args.schools),
+            "contact_info": f"student{n}@example.com",
+        } for n in range(1, args.students + 1)))
+
+        def academic_rows():
+            combos = [(s, subject) for s in range(len(STANDARDS)) for subject in SUBJECTS]
+            for student_id in range(1, args.students + 1):
+                # Most recent standards first, so small volumes still look like a real history
+                for standard_index, subject in combos[-records_per_student:]:
+                    marks = round(rng.triangular(35, 100, 78), 2)
+                    yield {
+                        "student_id": student_id,
+                        "school_standard": STANDARDS[standard_index],
+                        "subject": subject,
+                        "marks": marks,
+                        "percentage": marks,
+                        "grade": grade_for(marks),
+                        "academic_year": academic_year(standard_index),
+                    }
+
+        writer.write('academic_records', academic_rows())
+
+        def document_rows():
+            for n in range(1, args.documents + 1):
+                file_name = f"{n}_bench_document.pdf"
+                yield {
+                    "student_id": rng.randint(1, args.students),
+                    "document_type": rng.choice(DOCUMENT_TYPES),
+                    "file_name": file_name,
+                    "file_path": file_name,
+                    "upload_date": random_date(rng, today - datetime.timedelta(days=730), 730),
+                }
+
+        writer.write('documents', document_rows())
+
+        def tc_rows():
+            for _ in range(args.tcs):
+                application_date = random_date(rng, today - datetime.timedelta(days=730), 730)
+                status = rng.choices(TC_STATUSES, weights=(3, 6, 1))[0]
+                yield {
+                    "student_id": rng.randint(1, args.students),
+                    "application_date": application_date,
+                    "destination_school": f"Government School {rng.randint(1, args.schools)}",
+                    "reason": rng.choice(["Family relocation", "Change of residence", "Better facilities"]),
+                    "transfer_date": application_date + datetime.timedelta(days=rng.randint(15, 90)),
+                    "status": status,
+                    "comments": None if status == 'pending' else "Processed by benchmark generator",
+                    "processed_date": None if status == 'pending'
+                    else application_date + datetime.timedelta(days=rng.randint(1, 14)),
+                }
+
+        writer.write('transfer_certificates', tc_rows())
+
+        def scheme_rows():
+            for student_id in range(1, args.students + 1):
+                for _ in range(rng.randint(0, args.schemes_per_student * 2)):
+                    start_date = random_date(rng, today - datetime.timedelta(days=1460), 1460)
+                    yield {
+                        "student_id": student_id,
+                        "scheme_id": rng.randint(1, args.schemes),
+                        "start_date": start_date,
+                        "end_date": start_date + datetime.timedelta(days=365),
+                        "status": rng.choice(SCHEME_STATUSES),
+                        "benefits": "Synthetic benefits",
+                        "details": "Generated for load testing",
+                    }
+
+        writer.write('scheme_history', scheme_rows())
+
+        cursor.execute("SET unique_checks = 1")
+        cursor.execute("SET foreign_key_checks = 1")
+        # Fresh statistics so the optimizer plans against the new volumes
+        for table in TABLES:
+            cursor.execute(f"ANALYZE TABLE {table}")
+            cursor.fetchall()
+        cursor.close()
+
+    # Bulk inserts bypass ingest.py, so fill the rollup in one pass afterwards
+    if summary.available():
+        writer.counts['academic_summary'] = summary.rebuild()[1]
+
+    elapsed = time.perf_counter() - started
+    return writer.counts, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic OnePass data for benchmarking")
+    parser.add_argument('--students', type=int, default=100_000)
+    parser.add_argument('--records', type=int, default=5_000_000,
+                        help="academic records in total (at most 96 per student)")
+    parser.add_argument('--documents', type=int, default=50_000)
+    parser.add_argument('--tcs', type=int, default=30_000)
+    parser.add_argument('--schools', type=int, default=500)
+    parser.add_argument('--schemes', type=int, default=20)
+    parser.add_argument('--schemes-per-student', type=int, default=1, help="average scheme_history rows")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help="truncate the generated tables first")
+    args = parser.parse_args(argv)
+
+    counts, elapsed = generate(args)
+    for table, count in counts.items():
+        print(f"{table:22} {count:>10,}")
+    total = sum(counts.values())
+    print(f"Inserted {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+""" Replay a student/admin traffic mix against a running backend and report latency.
+
+Each worker thread keeps one HTTP/1.1 connection open and repeatedly picks a
+scenario by weight. A scenario makes one or more requests; every request is
+timed and recorded under its route template, so the report reads like the
+route list in main.py. Only the standard library is used.
+"""
+import argparse
+import gzip
+import http.client
+import json
+import os
+import platform
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmark.stats import Recorder
+
+PASSWORD = 'password'
+
+
+class Client:
+    """ One keep-alive connection plus the JSON/multipart helpers the scenarios need """
+
+    def __init__(self, base_url, recorder, compressed):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        self.https = parsed.scheme == 'https'
+        self.recorder = recorder
+        self.compressed = compressed
+        self.connection = None
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        self.connection = cls(self.host, self.port, timeout=30)
+
+    def request(self, label, method, path, token=None, body=None, headers=None, json_body=None):
+        """ Send one request, record it under ``label`` and return ``(status, parsed JSON or None)`` """
+        headers = dict(headers or {})
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        if self.compressed:
+            headers['Accept-Encoding'] = 'gzip'
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+
+        started = time.perf_counter()
+        try:
+            if self.connection is None:
+                self._connect()
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            status = response.status
+            if response.getheader('Content-Encoding') == 'gzip':
+                data = gzip.decompress(data)
+            content_type = response.getheader('Content-Type') or ''
+        except (OSError, http.client.HTTPException):
+            self.recorder.record(label, time.perf_counter() - started, 0, 0)
+            # Drop the broken connection; the next request reconnects
+            if self.connection is not None:
+                self.connection.close()
+            self.connection = None
+            return 0, None
+        self.recorder.record(label, time.perf_counter() - started, status, len(data))
+
+        if content_type.startswith('application/json') and data:
+            try:
+                return status, json.loads(data)
+            except ValueError:
+                return status, None
+        return status, None
+
+    def upload(self, label, path, token, filename, content, fields):
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in fields.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n'.encode() + content + b'\r\n'
+        )
+        parts.append(f'--{boundary}--\r\n'.encode())
+        return self.request(label, 'POST', path, token=token, body=b''.join(parts),
+                            headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+class Sessions:
+    """ Tokens shared by all workers; users log in on first use and again shortly before expiry """
+
+    def __init__(self, args):
+        self.args = args
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def token(self, client, username, user_type):
+        """ ``(token, user id)`` for a user, or None if the login failed """
+        with self._lock:
+            cached = self._sessions.get(username)
+        if cached and cached[2] > time.monotonic():
+            return cached[:2]
+        status, data = client.request(
+            '/api/auth/login', 'POST', '/api/auth/login',
+            json_body={"username": username, "password": self.args.password, "userType": user_type}
+        )
+        if status != 200 or not data:
+            return None
+        renew_at = time.monotonic() + max(data.get('expiresIn', 900) - 60, 30)
+        session = (data['token'], data['user']['id'], renew_at)
+        with self._lock:
+            self._sessions[username] = session
+        return session[:2]
+
+
+class Worker:
+    """ Scenario implementations; each call issues the requests of one user action """
+
+    def __init__(self, args, sessions, client, rng):
+        self.args = args
+        self.sessions = sessions
+        self.client = client
+        self.rng = rng
+
+    def _student(self):
+        n = self.rng.randint(1, self.args.student_pool)
+        return self.sessions.token(self.client, f'bench_student_{n}', 'student')
+
+    def _admin(self):
+        return self.sessions.token(self.client, self.args.admin_user, 'admin')
+
+    def _student_id(self):
+        return self.rng.randint(1, self.args.students)
+
+    def call(self, label, method, path, session_getter, **kwargs):
+        session = session_getter()
+        if session is None:
+            return 0, None
+        status, data = self.client.request(label, method, path, token=session[0], **kwargs)
+        return status, data
+
+    # Student traffic
+
+    def student_dashboard(self):
+        session = self._student()
+        if session:
+            self.client.request('/api/students/:id/dashboard', 'GET',
+                                f'/api/students/{session[1]}/dashboard', token=session[0])
+
+    def student_page(self):
+        """ One of the individual pages a student opens from the dashboard """
+        session = self._student()
+        if not session:
+            return
+        suffix = self.rng.choice(['', '/academic-records', '/academic-summary', '/documents',
+                                 '/transfer-certificate', '/schemes'])
+        self.client.request(f'/api/students/:id{suffix}', 'GET',
+                            f'/api/students/{session[1]}{suffix}', token=session[0])
+
+    def student_transfer_certificate(self):
+        session = self._student()
+        if not session:
+            return
+        token, student_id = session
+        status, data = self.client.request(
+            '/api/students/:id/transfer-certificate', 'POST',
+            f'/api/students/{student_id}/transfer-certificate', token=token,
+            json_body={"destinationSchool": "Benchmark School", "reason": "Load test",
+                       "transferDate": "2025-06-01"}
+        )
+        if status == 200 and data:
+            tc_id = data['transferCertificate']['tc_id']
+            self.client.request('/api/students/:id/transfer-certificate/:tc_id', 'DELETE',
+                                f'/api/students/{student_id}/transfer-certificate/{tc_id}', token=token)
+
+    def student_document(self):
+        session = self._student()
+        if not session:
+            return
+        token, student_id = session
+        # Random content so most uploads create a new blob rather than a deduplicated reference
+        content = b'%PDF-1.4\n' + os.urandom(self.args.upload_bytes)
+        status, data = self.client.upload(
+            '/api/students/:id/documents/upload', f'/api/students/{student_id}/documents/upload',
+            token, 'benchmark.pdf', content, {"documentType": "Benchmark"}
+        )
+        if status != 200 or not data:
+            return
+        document = data['document']
+        file_path = urllib.parse.urlsplit(document['file_url']).path
+        label = '/uploads/:content_hash/:filename' if document.get('content_hash') else '/uploads/:filename'
+        self.client.request(label, 'GET', file_path)
+        self.client.request('/api/students/:id/documents/:document_id', 'DELETE',
+                            f"/api/students/{student_id}/documents/{document['document_id']}", token=token)
+
+    # Admin traffic
+
+    def admin_students(self):
+        """ First page and a couple of follow-up pages of the student list """
+        path = f'/api/admin/students?limit={self.args.page_size}'
+        for _ in range(self.rng.randint(1, 3)):
+            status, data = self.call('/api/admin/students', 'GET', path, self._admin)
+            if status != 200 or not data or not data.get('nextCursor'):
+                return
+            path = f"/api/admin/students?limit={self.args.page_size}&cursor={data['nextCursor']}"
+
+    def admin_transfer_certificates(self):
+        status_filter = self.rng.choice(['', '&status=pending', '&status=approved'])
+        self.call('/api/admin/transfer-certificates', 'GET',
+                  f'/api/admin/transfer-certificates?limit={self.args.page_size}{status_filter}', self._admin)
+
+    def admin_student(self):
+        student_id = self._student_id()
+        suffix = self.rng.choice(['', '/comprehensive'])
+        self.call(f'/api/admin/students/:id{suffix}', 'GET', f'/api/admin/students/{student_id}{suffix}',
+                  self._admin)
+
+    def admin_comprehensive_batch(self):
+        ids = [self._student_id() for _ in range(20)]
+        self.call('/api/admin/students/comprehensive', 'POST', '/api/admin/students/comprehensive',
+                  self._admin, json_body={"studentIds": ids})
+
+    def admin_overview(self):
+        path = self.rng.choice(['/api/admin/dashboard/summary', '/api/admin/schools'])
+        self.call(path, 'GET', path, self._admin)
+
+    def admin_export(self):
+        self.call('/tables/:table_name', 'GET', '/tables/schools?format=ndjson', self._admin)
+
+    def admin_update_student(self):
+        student_id = self._student_id()
+        self.call('/api/admin/students/:id', 'PUT', f'/api/admin/students/{student_id}', self._admin,
+                  json_body={"name": f"Bench Student {student_id}", "dob": None, "contact_info": None})
+
+    def admin_decide_transfer_certificate(self):
+        status, data = self.call('/api/admin/transfer-certificates', 'GET',
+                                 '/api/admin/transfer-certificates?limit=20&status=pending', self._admin)
+        if status != 200 or not data or not data.get('transferCertificates'):
+            return
+        tc = self.rng.choice(data['transferCertificates'])
+        self.call('/api/admin/transfer-certificates/:id', 'PATCH',
+                  f"/api/admin/transfer-certificates/{tc['tc_id']}", self._admin,
+                  json_body={"status": self.rng.choice(['approved', 'rejected']),
+                             "comments": "Benchmark decision", "processed_by": None})
+
+    def admin_bulk_import(self):
+        student_id = self._student_id()
+        records = [{"student_id": student_id, "school_standard": "12th", "subject": subject,
+                    "marks": self.rng.randint(40, 100), "academic_year": "2024-2025"}
+                   for subject in ('Mathematics', 'Science', 'English')]
+        self.call('/api/admin/academic-records/bulk-import', 'POST',
+                  '/api/admin/academic-records/bulk-import', self._admin, json_body={"records": records})
+
+
+# (scenario, weight) per role; write scenarios only run with --writes
+READ_MIX = {
+    'student': [('student_dashboard', 5), ('student_page', 10)],
+    'admin': [('admin_students', 4), ('admin_transfer_certificates', 4), ('admin_student', 3),
+              ('admin_comprehensive_batch', 1), ('admin_overview', 2), ('admin_export', 0.2)],
+}
+WRITE_MIX = {
+    'student': [('student_transfer_certificate', 1), ('student_document', 1)],
+    'admin': [('admin_update_student', 0.5), ('admin_decide_transfer_certificate', 0.5),
+              ('admin_bulk_import', 0.5)],
+}
+
+
+def build_mix(args):
+    scenarios = []
+    for role, share in (('student', args.student_share), ('admin', 1 - args.student_share)):
+        entries = READ_MIX[role] + (WRITE_MIX[role] if args.writes else [])
+        total = sum(weight for _, weight in entries)
+        scenarios.extend((name, share * weight / total) for name, weight in entries)
+    return scenarios
+
+
+def run(args):
+    recorder = Recorder()
+    sessions = Sessions(args)
+    scenarios = build_mix(args)
+    names = [name for name, _ in scenarios]
+    weights = [weight for _, weight in scenarios]
+    warmup_until = time.monotonic() + args.warmup
+    deadline = warmup_until + args.duration
+
+    def worker_loop(index):
+        rng = random.Random(args.seed + index)
+        client = Client(args.base_url, recorder, args.compressed)
+        worker = Worker(args, sessions, client, rng)
+        try:
+            while time.monotonic() < deadline:
+                if recorder.paused and time.monotonic() >= warmup_until:
+                    recorder.start()
+                getattr(worker, rng.choices(names, weights)[0])()
+        finally:
+            client.close()
+
+    recorder.pause()  # Warm-up requests are not recorded
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker_loop, range(args.concurrency)))
+    recorder.stop()
+
+    return {
+        "meta": {
+            "base_url": args.base_url,
+            "duration_seconds": args.duration,
+            "warmup_seconds": args.warmup,
+            "concurrency": args.concurrency,
+            "student_share": args.student_share,
+            "writes": args.writes,
+            "compressed": args.compressed,
+            "seed": args.seed,
+            "mix": {name: round(weight, 4) for name, weight in scenarios},
+            "started_at": recorder.started_at,
+            "python": platform.python_version(),
+            "host": platform.node(),
+        },
+        **recorder.summary(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the OnePass backend")
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--duration', type=float, default=60, help="seconds of recorded load")
+    parser.add_argument('--warmup', type=float, default=5, help="seconds of unrecorded load first")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--student-share', type=float, default=0.7, help="fraction of actions by students")
+    parser.add_argument('--writes', action='store_true', help="include uploads, TC applications and admin writes")
+    parser.add_argument('--compressed', action='store_true', help="send Accept-Encoding: gzip")
+    parser.add_argument('--students', type=int, default=100_000, help="student ids the generator created")
+    parser.add_argument('--student-pool', type=int, default=500, help="distinct students that log in")
+    parser.add_argument('--admin-user', default='bench_admin')
+    parser.add_argument('--password', default=PASSWORD)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--upload-bytes', type=int, default=64 * 1024)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    Recorder.print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Saved {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+""" Latency recording and reporting shared by the load driver and the comparison tool """
+import datetime
+import math
+import threading
+import time
+
+
+def percentile(sorted_values, fraction):
+    """ Nearest-rank percentile of an already sorted list """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def is_error(status):
+    # 0 means the request never got a response; 304 is a successful revalidation
+    return status == 0 or status >= 400
+
+
+class Recorder:
+    """ Thread-safe per-label collection of latencies, statuses and response sizes """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}  # label -> [latencies], [statuses], bytes
+        self.paused = False
+        self.started_at = None
+        self._started = None
+        self._stopped = None
+
+    def pause(self):
+        self.paused = True
+
+    def start(self):
+        with self._lock:
+            if self.paused:
+                self.paused = False
+                self._started = time.perf_counter()
+                self.started_at = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+
+    def stop(self):
+        self._stopped = time.perf_counter()
+
+    def record(self, label, seconds, status, size):
+        if self.paused:
+            return
+        with self._lock:
+            entry = self._samples.get(label)
+            if entry is None:
+                entry = self._samples[label] = [[], [], 0]
+            entry[0].append(seconds)
+            entry[1].append(status)
+            entry[2] += size
+
+    def summary(self):
+        elapsed = (self._stopped or time.perf_counter()) - (self._started or time.perf_counter())
+        elapsed = max(elapsed, 1e-9)
+        endpoints = {}
+        all_latencies = []
+        total_errors = 0
+        with self._lock:
+            samples = {label: (list(l), list(s), b) for label, (l, s, b) in self._samples.items()}
+
+        for label, (latencies, statuses, size) in sorted(samples.items()):
+            errors = sum(1 for status in statuses if is_error(status))
+            endpoints[label] = _describe(sorted(latencies), errors, elapsed)
+            endpoints[label]["bytes"] = size
+            endpoints[label]["status_counts"] = {
+                str(status): statuses.count(status) for status in sorted(set(statuses))
+            }
+            all_latencies.extend(latencies)
+            total_errors += errors
+
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "endpoints": endpoints,
+            "total": _describe(sorted(all_latencies), total_errors, elapsed),
+        }
+
+    @staticmethod
+    def print_report(report):
+        header = f"{'endpoint':58} {'count':>8} {'rps':>8} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8}"
+        print(header)
+        print('-' * len(header))
+        rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+        for label, stats in rows:
+            latency = stats["latency_ms"]
+            print(f"{label[:58]:58} {stats['count']:>8} {stats['rps']:>8.1f} "
+                  f"{stats['error_rate'] * 100:>6.2f} {latency['p50']:>8.2f} "
+                  f"{latency['p95']:>8.2f} {latency['p99']:>8.2f}")
+        print(f"(latencies in ms over {report['elapsed_seconds']}s)")
+
+
+def _describe(latencies, errors, elapsed):
+    count = len(latencies)
+    ms = [value * 1000 for value in latencies]
+    return {
+        "count": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 5) if count else 0.0,
+        "rps": round(count / elapsed, 2),
+        "latency_ms": {
+            "min": round(ms[0], 3) if ms else 0.0,
+            "mean": round(sum(ms) / count, 3) if count else 0.0,
+            "p50": round(percentile(ms, 0.50), 3),
+            "p95": round(percentile(ms, 0.95), 3),
+            "p99": round(percentile(ms, 0.99), 3),
+            "max": round(ms[-1], 3) if ms else 0.0,
+        },
+    }
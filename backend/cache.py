@@ -0,0 +1,226 @@
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # Optional: only needed for a shared cache across workers
+    redis = None
+
+log = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """ Thread-safe in-process cache whose entries expire after ``ttl`` seconds """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a load that raced with a write is not cached
+        self._generation = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+
+    def get_or_load(self, key, loader):
+        """ Return the cached value for ``key``, calling ``loader()`` on a miss """
+        value = self.get(key)
+        if value is None:
+            with self._lock:
+                generation = self._generation
+            value = loader()
+            with self._lock:
+                if self._generation == generation:
+                    self._entries[key] = (value, time.monotonic() + self.ttl)
+        return value
+
+    def invalidate(self, key=None):
+        """ Drop one entry, or every entry when no key is given """
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+_MISSING = object()
+
+
+class LRUCache:
+    """ Thread-safe in-process cache bounded to ``max_entries``, evicting least recently used """
+
+    def __init__(self, max_entries, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    """ Shared cache backend so every worker process sees the same entries and invalidations """
+
+    def __init__(self, url, ttl=None, prefix='onepass:'):
+        if redis is None:
+            raise RuntimeError("The redis package is required for a shared cache backend")
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.evictions = 0  # Redis evicts on its own maxmemory policy
+
+    def _key(self, key):
+        return self.prefix + ':'.join(str(part) for part in key)
+
+    def get(self, key, default=None):
+        raw = self._client.get(self._key(key))
+        return default if raw is None else pickle.loads(raw)
+
+    def set(self, key, value):
+        self._client.set(self._key(key), pickle.dumps(value), ex=int(self.ttl) if self.ttl else None)
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*(self._key(key) for key in keys))
+
+    def clear(self):
+        for name in self._client.scan_iter(match=self.prefix + '*'):
+            self._client.delete(name)
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(match=self.prefix + '*'))
+
+
+class StudentCache:
+    """ Read-through cache of per-student resources keyed by (student_id, resource).
+
+    Reads go through get_or_load(); every write path must call invalidate()
+    for the resources it changes. Hit and miss counters are kept per resource.
+    """
+
+    RESOURCES = ('profile', 'academic_records', 'academic_summary', 'schemes', 'documents',
+                 'transfer_certificates')
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._hits = {resource: 0 for resource in self.RESOURCES}
+        self._misses = {resource: 0 for resource in self.RESOURCES}
+        self._invalidations = 0
+        # student_id -> [generation, loads in flight], kept only while a load runs.
+        # invalidate() bumps the generation so a load that raced a write is not cached.
+        self._loading = {}
+
+    @classmethod
+    def from_env(cls):
+        ttl = float(os.environ.get('STUDENT_CACHE_TTL', 300))
+        redis_url = os.environ.get('STUDENT_CACHE_REDIS_URL')
+        if redis_url:
+            try:
+                return cls(RedisCache(redis_url, ttl=ttl, prefix='onepass:student:'))
+            except RuntimeError as e:
+                log.warning("%s; falling back to an in-process student cache", e)
+        return cls(LRUCache(int(os.environ.get('STUDENT_CACHE_SIZE', 2048)), ttl=ttl))
+
+    def get_or_load(self, student_id, resource, loader):
+        """ Return the cached value, or call ``loader()`` and cache it (None is never cached) """
+        value = self.backend.get((student_id, resource), _MISSING)
+        if value is not _MISSING:
+            with self._lock:
+                self._hits[resource] += 1
+            return value
+
+        with self._lock:
+            self._misses[resource] += 1
+            state = self._loading.setdefault(student_id, [0, 0])
+            state[1] += 1
+            generation = state[0]
+        value = None
+        try:
+            value = loader()
+        finally:
+            # Check and store under the lock invalidate() bumps the generation under,
+            # so an invalidation either marks this load stale or deletes what it stored
+            with self._lock:
+                if value is not None and state[0] == generation:
+                    self.backend.set((student_id, resource), value)
+                state[1] -= 1
+                if not state[1]:
+                    del self._loading[student_id]
+        return value
+
+    def invalidate(self, student_id, *resources):
+        """ Drop the given resources for a student, or all of them when none are named """
+        keys = [(student_id, resource) for resource in (resources or self.RESOURCES)]
+        with self._lock:
+            state = self._loading.get(student_id)
+            if state is not None:
+                state[0] += 1
+            self._invalidations += 1
+        self.backend.delete(*keys)
+
+    def stats(self):
+        with self._lock:
+            hits = dict(self._hits)
+            misses = dict(self._misses)
+            invalidations = self._invalidations
+        total_hits = sum(hits.values())
+        total_lookups = total_hits + sum(misses.values())
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "evictions": self.backend.evictions,
+            "invalidations": invalidations,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(total_hits / total_lookups, 4) if total_lookups else 0.0,
+        }
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import zlib
+
+from flask import request
+
+# Bodies smaller than this are sent as-is; compressing them costs more than it saves
+MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+
+COMPRESSIBLE_TYPES = {'application/json'}
+
+# zlib wbits: 31 writes a gzip container, 15 the zlib stream HTTP calls "deflate"
+_ENCODINGS = (('gzip', 31), ('deflate', 15))
+
+
+def _compress(data, wbits):
+    compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, wbits)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _negotiate():
+    accepted = request.accept_encodings
+    for name, wbits in _ENCODINGS:
+        if accepted[name]:
+            return name, wbits
+    return None, None
+
+
+def weak_etag(data):
+    """ Weak validator for a JSON body; weak because the encoding may differ per client """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _process(response):
+    if (request.method not in ('GET', 'HEAD') or response.status_code != 200
+            or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_TYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    data = response.get_data()
+
+    if not response.headers.get('ETag'):
+        response.set_etag(weak_etag(data), weak=True)
+        # Private data behind a token: let the browser keep it, but revalidate every time
+        if 'Cache-Control' not in response.headers:
+            response.headers['Cache-Control'] = 'private, no-cache'
+
+    etag, _ = response.get_etag()
+    if etag and request.if_none_match.contains_weak(etag):
+        response.status_code = 304
+        response.set_data(b'')
+        response.headers.pop('Content-Length', None)
+        response.headers.pop('Content-Type', None)
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if len(data) < MIN_SIZE:
+        return response
+    encoding, wbits = _negotiate()
+    if encoding is None:
+        return response
+
+    response.set_data(_compress(data, wbits))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    """ Weak ETags with If-None-Match -> 304, then gzip/deflate by Accept-Encoding, for JSON responses """
+    app.after_request(_process)
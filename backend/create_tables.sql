@@ -39,6 +39,7 @@ CREATE TABLE IF NOT EXISTS academic_records (
     grade VARCHAR(2) NOT NULL,
     academic_year VARCHAR(9) NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_academic_records_student_subject_year (student_id, school_standard, subject, academic_year),
     FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE
 );
 
@@ -49,9 +50,19 @@ CREATE TABLE IF NOT EXISTS documents (
     document_type VARCHAR(50) NOT NULL,
     file_name VARCHAR(255) NOT NULL,
     file_path VARCHAR(255) NOT NULL,
+    content_hash CHAR(64),
     upload_date DATE NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE,
+    INDEX idx_documents_content_hash (content_hash)
+);
+
+-- Create document_blobs table (reference counts for content-addressed uploads)
+CREATE TABLE IF NOT EXISTS document_blobs (
+    content_hash CHAR(64) PRIMARY KEY,
+    size BIGINT NOT NULL,
+    ref_count INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Create transfer_certificates table
@@ -1,3 +1,6 @@
+-- NOTE: this recreates the table from scratch, dropping its data and the indexes added by
+-- migrations; run `python migrate.py` afterwards. Schema changes belong in backend/migrations.
+
 -- Drop existing table if it exists
 DROP TABLE IF EXISTS transfer_certificates;
 
@@ -0,0 +1,194 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def config_from_env():
+    """ Read the MySQL connection settings from the environment """
+    return {
+        "host": os.environ.get("DB_HOST", "localhost"),
+        "port": _env_int("DB_PORT", 3306),
+        "user": os.environ.get("DB_USER", "root"),
+        "password": os.environ.get("DB_PASSWORD", ""),
+        "database": os.environ.get("DB_NAME", "schools"),
+    }
+
+
+class ConnectionPool:
+    """ Bounded pool of MySQL connections.
+
+    Connections are opened lazily up to ``size``. A caller that finds the pool
+    exhausted waits up to ``timeout`` seconds for one to be returned and then
+    gets a PoolError, which the routes already handle as a mysql Error.
+    Connections idle for longer than ``ping_interval`` seconds are pinged
+    before being handed out so a dropped server connection is replaced
+    instead of failing the request.
+    """
+
+    def __init__(self, config, size=10, timeout=5.0, ping_interval=30.0):
+        self.config = config
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+
+        self._idle = deque()  # (connection, last_used) pairs, most recent last
+        self._cond = threading.Condition()
+        self._opened = 0
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        # Instrumentation hooks (see metrics.instrument_pool)
+        self.wrap_connection = None
+        self.wait_observer = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            config_from_env(),
+            size=_env_int("DB_POOL_SIZE", 10),
+            timeout=_env_float("DB_POOL_TIMEOUT", 5.0),
+            ping_interval=_env_float("DB_POOL_PING_INTERVAL", 30.0),
+        )
+
+    def _connect(self):
+        connection = mysql.connector.connect(**self.config)
+        return self.wrap_connection(connection) if self.wrap_connection else connection
+
+    def acquire(self):
+        """ Check a connection out of the pool, waiting if it is exhausted """
+        started = time.perf_counter()
+        deadline = started + self.timeout
+        connection = None
+        last_used = 0.0
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                    break
+                if self._opened < self.size:
+                    # Reserve a slot; the connect happens outside the lock
+                    self._opened += 1
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolError(
+                        f"Timed out after {self.timeout}s waiting for a database connection"
+                    )
+                self._cond.wait(remaining)
+
+            waited = time.perf_counter() - started
+            self._checkouts += 1
+            self._wait_total += waited
+            if waited > self._wait_max:
+                self._wait_max = waited
+
+        if self.wait_observer is not None:
+            self.wait_observer(waited)
+
+        try:
+            if connection is None:
+                connection = self._connect()
+            elif time.monotonic() - last_used > self.ping_interval:
+                # Health check on borrow; reconnects in place if the server dropped us
+                connection.ping(reconnect=True, attempts=1, delay=0)
+        except Error:
+            self._forget(connection)
+            raise
+        return connection
+
+    def release(self, connection):
+        """ Return a connection to the pool, discarding it if it is unusable """
+        try:
+            if connection.unread_result:
+                connection.consume_results()
+            # Never hand the next caller an open transaction (or its snapshot);
+            # connections whose work was committed skip the round trip
+            if connection.in_transaction:
+                connection.rollback()
+        except Error:
+            self._forget(connection)
+            return
+
+        with self._cond:
+            self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def discard(self, connection):
+        """ Close a checked-out connection instead of returning it to the pool """
+        self._forget(connection)
+
+    def _forget(self, connection):
+        if connection is not None:
+            try:
+                connection.close()
+            except Error:
+                pass
+        with self._cond:
+            self._opened -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close_all(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._opened -= len(idle)
+        for connection, _ in idle:
+            try:
+                connection.close()
+            except Error:
+                pass
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "size": self.size,
+                "open": self._opened,
+                "idle": idle,
+                "in_use": self._opened - idle,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "wait_seconds_total": round(self._wait_total, 6),
+                "wait_seconds_max": round(self._wait_max, 6),
+                "wait_seconds_avg": round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0,
+            }
+
+
+pool = ConnectionPool.from_env()
+
+
+def get_connection():
+    """ Check out a pooled connection; use as ``with get_connection() as connection:`` """
+    return pool.connection()
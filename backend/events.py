@@ -0,0 +1,283 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from mysql.connector import Error
+
+import schema
+from db import get_connection
+
+log = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = float(os.environ.get('SSE_HEARTBEAT_INTERVAL', 15))
+HISTORY_SIZE = int(os.environ.get('SSE_HISTORY_SIZE', 1000))
+MAX_STREAM_SECONDS = float(os.environ.get('SSE_MAX_STREAM_SECONDS', 3600))
+POLL_INTERVAL = float(os.environ.get('SSE_POLL_INTERVAL', 1.0))
+# How long a gap in the event ids may be an uncommitted write before it counts as rolled back
+GAP_WAIT = float(os.environ.get('SSE_GAP_WAIT', 5))
+# Rows older than this are deleted from tc_events
+RETENTION_SECONDS = int(os.environ.get('SSE_EVENT_RETENTION', 24 * 3600))
+# Client reconnect delay announced at the start of each stream
+RETRY_MS = 3000
+POLL_BATCH = 500
+PRUNE_INTERVAL = 600
+
+
+class EventHub:
+    """ Fan-out of small JSON events to long-lived server-sent event streams.
+
+    Events arrive with increasing ids (see EventRelay), are formatted once and
+    kept in a ring buffer of the last ``history`` events. A stream only
+    remembers its position in that buffer and waits on the one shared
+    Condition, so an idle subscriber costs a parked waiter rather than a queue.
+
+    A client resuming from a Last-Event-ID older than the buffer, or a change
+    the relay could not deliver in order, gets a ``resync`` event telling it to
+    refetch, instead of silently skipping what it missed.
+    """
+
+    def __init__(self, history=HISTORY_SIZE):
+        self._events = deque(maxlen=history)
+        # Newest id seen, and the newest id no longer in the buffer
+        self._head = 0
+        self._floor = 0
+        # Bumped by resync(); streams that saw an older value send a resync event
+        self._generation = 0
+        self._condition = threading.Condition()
+        self.subscribers = 0
+        self.published = 0
+
+    def reset(self, position):
+        """ Start (or restart) the buffer at ``position``; clients from before it resync """
+        with self._condition:
+            self._events.clear()
+            self._head = self._floor = max(position, self._head)
+            self._generation += 1
+            self._condition.notify_all()
+
+    def publish(self, event_id, name, data, topics):
+        """ Send ``data`` as event ``name`` to every stream subscribed to one of ``topics`` """
+        with self._condition:
+            if event_id <= self._head:
+                return
+            frame = f"id: {event_id}\nevent: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+            if len(self._events) == self._events.maxlen:
+                self._floor = self._events[0][0]
+            self._events.append((event_id, frozenset(topics), frame))
+            self._head = event_id
+            self.published += 1
+            self._condition.notify_all()
+
+    def resync(self):
+        """ Tell every stream to refetch, e.g. after a change that could not be delivered in order """
+        with self._condition:
+            self._generation += 1
+            self._condition.notify_all()
+
+    def _resync_frame(self, event_id):
+        return f"id: {event_id}\nevent: resync\ndata: {{}}\n\n"
+
+    def position(self, last_event_id):
+        """ ``(id to continue after, generation, whether events were missed)`` for a (re)connecting client """
+        with self._condition:
+            if not last_event_id:
+                return self._head, self._generation, False
+            try:
+                after = int(last_event_id)
+            except ValueError:
+                return self._head, self._generation, True
+            if after < self._floor:
+                return self._head, self._generation, True
+            # Ids are shared by every process; one ahead of this buffer was seen through another worker
+            return after, self._generation, False
+
+    def wait(self, after, generation, timeout):
+        """ ``(events after the id, new position, generation, missed)``, waiting up to ``timeout`` """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._head > after or self._generation != generation, timeout
+            )
+            if self._generation != generation or after < self._floor:
+                return [], max(after, self._head), self._generation, True
+            events = []
+            for event in reversed(self._events):
+                if event[0] <= after:
+                    break
+                events.append(event)
+            events.reverse()
+            return events, max(after, self._head), generation, False
+
+    def stream(self, topic, last_event_id=None, deadline=None):
+        """ SSE frames for one subscriber until ``deadline`` (epoch seconds) or disconnect """
+        after, generation, missed = self.position(last_event_id)
+        with self._condition:
+            self.subscribers += 1
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            if missed:
+                yield self._resync_frame(after)
+            last_write = time.monotonic()
+            while deadline is None or time.time() < deadline:
+                timeout = HEARTBEAT_INTERVAL
+                if deadline is not None:
+                    timeout = max(0.0, min(timeout, deadline - time.time()))
+                events, after, generation, missed = self.wait(after, generation, timeout)
+                if missed:
+                    yield self._resync_frame(after)
+                    last_write = time.monotonic()
+                    continue
+                frames = ''.join(frame for _, topics, frame in events if topic in topics)
+                if frames:
+                    yield frames
+                    last_write = time.monotonic()
+                elif time.monotonic() - last_write >= HEARTBEAT_INTERVAL:
+                    # Comment line: keeps proxies from timing out the idle connection
+                    # and surfaces a closed client as a failed write
+                    yield ": keep-alive\n\n"
+                    last_write = time.monotonic()
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+
+    def stats(self):
+        with self._condition:
+            return {"subscribers": self.subscribers, "published": self.published,
+                    "buffered": len(self._events), "lastEventId": self._head}
+
+
+class EventRelay:
+    """ Feeds a hub from the ``tc_events`` outbox table, so every worker process sees every change.
+
+    Write routes insert their event in the same transaction as the change
+    (publish_tc), so an event exists exactly when its change was committed.
+    Each process polls the table by primary key and publishes rows in id order.
+
+    AUTO_INCREMENT ids are handed out before commit, so a later id can become
+    visible first. Rows after such a gap are held back until it fills, or for
+    GAP_WAIT seconds, after which it is taken for a rollback and skipped. A
+    skipped id that does show up later is not delivered out of order; the hub
+    tells every stream to resync instead.
+    """
+
+    def __init__(self, hub, poll_interval=POLL_INTERVAL, gap_wait=GAP_WAIT):
+        self.hub = hub
+        self.poll_interval = poll_interval
+        self.gap_wait = gap_wait
+        self.position = 0
+        # (first id, last id) -> when the gap was first seen, or when it was given up on
+        self._gaps = {}
+        self._skipped = {}
+        self._started = False
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+        self.stopping = threading.Event()
+
+    def start(self):
+        """ Begin relaying in a background thread; a no-op once started or before migration 0008 """
+        if self._started or not available():
+            return
+        with self._lock:
+            if self._started:
+                return
+            with get_connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute("SELECT COALESCE(MAX(event_id), 0) FROM tc_events")
+                self.position = cursor.fetchone()[0]
+                cursor.close()
+            self.hub.reset(self.position)
+            threading.Thread(target=self.run, name='tc-event-relay', daemon=True).start()
+            self._started = True
+
+    def run(self):
+        while not self.stopping.is_set():
+            try:
+                with get_connection() as connection:
+                    while self.poll(connection):
+                        pass
+                    self._prune(connection)
+            except Error as e:
+                # Nothing is lost: the next poll continues from the same position
+                log.warning("TC event relay poll failed: %s", e)
+            self.stopping.wait(self.poll_interval)
+
+    def poll(self, connection, now=None):
+        """ Publish the rows committed since the last poll; True if a full batch was read """
+        now = time.monotonic() if now is None else now
+        # End the previous read's snapshot so rows committed since are visible
+        connection.rollback()
+        cursor = connection.cursor()
+        cursor.execute(
+            """
+            SELECT event_id, name, student_id, payload FROM tc_events
+            WHERE event_id > %s ORDER BY event_id LIMIT %s
+            """,
+            (self.position, POLL_BATCH)
+        )
+        rows = cursor.fetchall()
+        for event_id, name, student_id, payload in rows:
+            if event_id > self.position + 1:
+                gap = (self.position + 1, event_id - 1)
+                first_seen = self._gaps.setdefault(gap, now)
+                if now - first_seen < self.gap_wait:
+                    break
+                del self._gaps[gap]
+                self._skipped[gap] = now
+            self.hub.publish(event_id, name, json.loads(payload), ('admin', f"student:{student_id}"))
+            self.position = event_id
+        # Gaps the position moved past were filled
+        self._gaps = {gap: seen for gap, seen in self._gaps.items() if gap[0] > self.position}
+        self._check_skipped(cursor, now)
+        cursor.close()
+        return len(rows) == POLL_BATCH and rows[-1][0] == self.position
+
+    def _check_skipped(self, cursor, now):
+        # A skipped id is forgotten once it is far older than any write transaction
+        self._skipped = {gap: at for gap, at in self._skipped.items() if now - at < self.gap_wait * 60}
+        if not self._skipped:
+            return
+        ranges = list(self._skipped)
+        cursor.execute(
+            "SELECT event_id FROM tc_events WHERE "
+            + " OR ".join(["event_id BETWEEN %s AND %s"] * len(ranges)) + " LIMIT 1",
+            [bound for gap in ranges for bound in gap]
+        )
+        late = cursor.fetchall()
+        if late:
+            log.warning("TC event %s committed after it was skipped; asking clients to resync", late[0][0])
+            self._skipped = {gap: at for gap, at in self._skipped.items()
+                             if not gap[0] <= late[0][0] <= gap[1]}
+            self.hub.resync()
+
+    def _prune(self, connection):
+        if time.monotonic() - self._pruned_at < PRUNE_INTERVAL:
+            return
+        self._pruned_at = time.monotonic()
+        cursor = connection.cursor()
+        cursor.execute(
+            "DELETE FROM tc_events WHERE created_at < NOW() - INTERVAL %s SECOND LIMIT 10000",
+            (RETENTION_SECONDS,)
+        )
+        connection.commit()
+        cursor.close()
+
+
+def available():
+    """ False until migration 0008 has created the tc_events outbox """
+    return schema.current().has_table('tc_events')
+
+
+# Transfer certificate changes; topics are 'admin' and 'student:<id>'
+tc_events = EventHub()
+tc_relay = EventRelay(tc_events)
+
+
+def publish_tc(cursor, name, student_id, certificate):
+    """ Record a TC change in the caller's transaction; streams in every process get it after commit """
+    if available():
+        cursor.execute(
+            "INSERT INTO tc_events (name, student_id, payload) VALUES (%s, %s, %s)",
+            (name, student_id, json.dumps(certificate, default=str))
+        )
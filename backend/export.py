@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+import logging
+
+from mysql.connector import Error
+
+import schema
+from db import pool
+
+log = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+DEFAULT_BATCH_SIZE = 1000
+
+def exportable_tables():
+    """ Allowlist of table names in the current database, from the startup schema probe """
+    return schema.current().tables
+
+
+def _csv_chunk(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def stream_table(table_name, fmt, dumps=json.dumps, batch_size=DEFAULT_BATCH_SIZE):
+    """ Yield the contents of ``table_name`` as JSON, NDJSON or CSV text chunks.
+
+    Rows come from an unbuffered cursor ``batch_size`` at a time, so memory
+    stays flat however large the table is. ``table_name`` must already have
+    been checked against exportable_tables(). ``dumps`` encodes one row and
+    must understand dates and decimals (the Flask app's JSON provider does).
+
+    A database error is re-raised, also after chunks have been sent. The
+    server then aborts the connection without the chunked response's final
+    chunk, so the client sees an incomplete transfer instead of what looks
+    like a complete but truncated file. Use start() to get errors that happen
+    before the first chunk while a proper error response can still be sent.
+    """
+    connection = pool.acquire()
+    try:
+        cursor = connection.cursor(buffered=False)
+        cursor.execute(f"SELECT * FROM `{table_name}`")
+        columns = cursor.column_names
+
+        if fmt == 'csv':
+            yield _csv_chunk([columns])
+        elif fmt == 'json':
+            yield '{' + dumps(table_name) + ': ['
+
+        first = True
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if fmt == 'csv':
+                yield _csv_chunk(rows)
+                continue
+            lines = [dumps(dict(zip(columns, row))) for row in rows]
+            if fmt == 'ndjson':
+                yield '\n'.join(lines) + '\n'
+            else:
+                yield (',' if not first else '') + ','.join(lines)
+            first = False
+
+        if fmt == 'json':
+            yield ']}'
+        cursor.close()
+    except GeneratorExit:
+        # Client went away mid-stream; dropping the connection is cheaper than
+        # draining the rest of the result set before it can be reused
+        pool.discard(connection)
+        connection = None
+        raise
+    except Error as e:
+        log.error("Error streaming table %s: %s", table_name, e)
+        pool.discard(connection)
+        connection = None
+        raise
+    finally:
+        if connection is not None:
+            pool.release(connection)
+
+
+def start(chunks):
+    """ Run a chunk generator up to its first chunk, so errors from running the query raise here.
+
+    Returns a generator over all the chunks; closing it closes ``chunks``.
+    """
+    first = next(chunks, None)
+
+    def resume():
+        if first is not None:
+            yield first
+        yield from chunks
+
+    return resume()
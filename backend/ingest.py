@@ -0,0 +1,260 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from mysql.connector import Error
+
+import summary
+from db import get_connection
+
+DEFAULT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+REQUIRED_FIELDS = ('student_id', 'school_standard', 'subject', 'marks', 'academic_year')
+
+# Rows are keyed on the unique key (student_id, school_standard, subject, academic_year),
+# so re-loading a term's marks updates in place instead of duplicating
+UPSERT_SQL = """
+    INSERT INTO academic_records
+        (student_id, school_standard, subject, marks, percentage, grade, academic_year)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        marks = VALUES(marks),
+        percentage = VALUES(percentage),
+        grade = VALUES(grade)
+"""
+
+
+class RowError(ValueError):
+    """ A single input row failed validation """
+
+
+def grade_for(marks):
+    """ Same thresholds as the GetGrade() helper in update_academic_records.sql """
+    if marks >= 90:
+        return 'A+'
+    if marks >= 80:
+        return 'A'
+    if marks >= 70:
+        return 'B+'
+    if marks >= 60:
+        return 'B'
+    return 'C'
+
+
+def _decimal(value, name):
+    try:
+        number = Decimal(str(value).strip())
+    except (InvalidOperation, ValueError):
+        raise RowError(f"{name} must be a number")
+    if not Decimal(0) <= number <= Decimal(100):
+        raise RowError(f"{name} must be between 0 and 100")
+    return number.quantize(Decimal('0.01'))
+
+
+def validate_row(raw):
+    """ Normalise one input mapping into an UPSERT_SQL parameter tuple """
+    if not isinstance(raw, dict):
+        raise RowError("row must be an object")
+    missing = [field for field in REQUIRED_FIELDS if raw.get(field) in (None, '')]
+    if missing:
+        raise RowError(f"missing {', '.join(missing)}")
+
+    try:
+        student_id = int(raw['student_id'])
+    except (TypeError, ValueError):
+        raise RowError("student_id must be an integer")
+
+    # Column widths from create_tables.sql; reject rather than silently truncate
+    school_standard = str(raw['school_standard']).strip()
+    if len(school_standard) > 20:
+        raise RowError("school_standard is longer than 20 characters")
+    subject = str(raw['subject']).strip()
+    if len(subject) > 50:
+        raise RowError("subject is longer than 50 characters")
+    academic_year = str(raw['academic_year']).strip()
+    if len(academic_year) > 9:
+        raise RowError("academic_year must look like 2024-2025")
+
+    marks = _decimal(raw['marks'], 'marks')
+    percentage = _decimal(raw['percentage'], 'percentage') if raw.get('percentage') not in (None, '') else marks
+    grade = str(raw['grade']).strip() if raw.get('grade') else grade_for(marks)
+    if len(grade) > 2:
+        raise RowError("grade is longer than 2 characters")
+
+    return (student_id, school_standard, subject, marks, percentage, grade, academic_year)
+
+
+def iter_csv(stream):
+    """ Yield rows from a CSV with a header line; ``stream`` may be text or binary """
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(stream)
+    try:
+        yield from reader
+    except csv.Error as e:
+        raise ValueError(f"CSV line {reader.line_num}: {e}")
+
+
+def iter_ndjson(stream):
+    """ Yield one JSON object per non-empty line """
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8')
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None  # reported as an invalid row with its line number
+
+
+def _batches(rows, batch_size):
+    batch = []
+    for line, raw in enumerate(rows, start=1):
+        batch.append((line, raw))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def new_report():
+    """ Empty ingest() report; ``"_students"`` and ``"_cohorts"`` collect what committed batches changed """
+    return {
+        "rowsRead": 0,
+        "rowsWritten": 0,
+        "affectedRows": 0,
+        "rejected": 0,
+        "batches": 0,
+        "summaryGroups": 0,
+        "errors": [],
+        "_students": set(),
+        "_cohorts": set(),
+    }
+
+
+def ingest(rows, batch_size=DEFAULT_BATCH_SIZE, report=None):
+    """ Validate and upsert an iterable of row mappings in batches.
+
+    Each batch is written with one executemany() in its own transaction,
+    together with the academic_summary rows it changes; a batch that fails is
+    rolled back and reported without stopping the rest.
+    Returns the report (a fresh new_report() unless one is passed in), with the
+    affected student ids under ``"_students"`` and ``(school_standard,
+    academic_year)`` pairs under ``"_cohorts"`` so callers can invalidate
+    caches. An unreadable input line or a lost connection raises part way;
+    pass your own report to still see what the committed batches changed.
+    """
+    report = new_report() if report is None else report
+    students = report["_students"]
+    cohorts = report["_cohorts"]
+
+    def reject(line, message):
+        report["rejected"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": line, "error": message})
+
+    with get_connection() as connection:
+        cursor = connection.cursor()
+
+        for batch in _batches(rows, batch_size):
+            report["rowsRead"] += len(batch)
+            valid = []
+            for line, raw in batch:
+                try:
+                    valid.append((line, validate_row(raw)))
+                except RowError as e:
+                    reject(line, str(e))
+            if not valid:
+                continue
+
+            # Reject unknown students row by row instead of failing the batch on the foreign key
+            ids = sorted({params[0] for _, params in valid})
+            cursor.execute(
+                f"SELECT student_id FROM students WHERE student_id IN ({', '.join(['%s'] * len(ids))})",
+                ids
+            )
+            known = {row[0] for row in cursor.fetchall()}
+            params = []
+            for line, values in valid:
+                if values[0] in known:
+                    params.append(values)
+                else:
+                    reject(line, f"unknown student_id {values[0]}")
+            if not params:
+                continue
+
+            try:
+                cursor.executemany(UPSERT_SQL, params)
+                affected = cursor.rowcount
+                # Same transaction, so the rollup never disagrees with the records
+                groups = summary.refresh_groups(cursor, ((values[0], values[1], values[6]) for values in params))
+                connection.commit()
+            except Error as e:
+                connection.rollback()
+                for line, _ in valid:
+                    reject(line, f"batch failed: {str(e)}")
+                continue
+
+            report["batches"] += 1
+            report["rowsWritten"] += len(params)
+            report["affectedRows"] += max(affected, 0)
+            report["summaryGroups"] += groups
+            students.update(values[0] for values in params)
+            cohorts.update((values[1], values[6]) for values in params)
+
+        cursor.close()
+
+    return report
+
+
+def rows_from_file(stream, fmt):
+    """ Row iterator for an open file in one of 'csv', 'ndjson' or 'json' """
+    if fmt == 'csv':
+        return iter_csv(stream)
+    if fmt == 'ndjson':
+        return iter_ndjson(stream)
+    if fmt == 'json':
+        # A JSON document has to be parsed whole; use NDJSON for very large loads
+        if not isinstance(stream, io.TextIOBase):
+            stream = io.TextIOWrapper(stream, encoding='utf-8')
+        data = json.load(stream)
+        return data.get('records', []) if isinstance(data, dict) else data
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+def guess_format(filename):
+    name = (filename or '').lower()
+    if name.endswith('.ndjson') or name.endswith('.jsonl'):
+        return 'ndjson'
+    if name.endswith('.json'):
+        return 'json'
+    return 'csv'
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bulk load academic records from CSV, NDJSON or JSON")
+    parser.add_argument('path', help="input file; '-' reads CSV from stdin")
+    parser.add_argument('--format', choices=('csv', 'ndjson', 'json'), help="defaults to the file extension")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    import sys
+
+    fmt = args.format or guess_format(args.path)
+    if args.path == '-':
+        result = ingest(rows_from_file(sys.stdin, fmt), batch_size=args.batch_size)
+    else:
+        with open(args.path, 'rb') as fh:
+            result = ingest(rows_from_file(fh, fmt), batch_size=args.batch_size)
+
+    result.pop('_students')
+    result.pop('_cohorts')
+    print(json.dumps(result, indent=2))
+    sys.exit(1 if result['rejected'] else 0)
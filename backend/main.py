@@ -1,14 +1,60 @@
-from flask import Flask, jsonify, request, abort, send_from_directory
-import mysql.connector
+from flask import Flask, Response, g, jsonify, request, abort, send_file, send_from_directory
 from mysql.connector import Error
 from flask_cors import CORS
+import atexit
 import datetime
+import logging
+import mimetypes
 import os
+import subprocess
 import sys
+import time
 from werkzeug.utils import secure_filename
 
+import analytics
+import auth
+from cache import TTLCache
+import compression
+from db import get_connection, pool
+import events
+from events import publish_tc
+import export
+from export import EXPORT_FORMATS, exportable_tables, stream_table
+import ingest
+from json_provider import FastJSONProvider, rows_payload
+import logging_config
+import metrics
+import processing
+from pagination import (PaginationError, decode_cursor, parse_date, parse_int, parse_order,
+                        parse_page_size, split_page)
+from storage import BlobStore, add_reference, drop_reference, is_content_hash
+import schema
+import search
+from search import search_index
+import student_data
+from student_data import student_cache
+
+# Structured logs go through a queue to a background writer thread
+logging_config.configure_logging()
+log = logging.getLogger('main')
+
 app = Flask(__name__)
+# Dates and Decimals from MySQL rows are encoded by the provider itself
+app.json = FastJSONProvider(app)
 CORS(app)  # Enable CORS for all routes
+logging_config.init_app(app)
+
+# Request, query and pool timings exposed in Prometheus format at /metrics.
+# after_request hooks run in reverse order, so this sees the final status set below.
+metrics.init_app(app)
+metrics.instrument_pool(pool)
+metrics.registry.register(metrics.Gauge(
+    'sse_subscribers', 'Open transfer certificate event streams',
+    lambda: events.tc_events.stats()['subscribers']
+))
+
+# JSON responses get weak ETags (304 when unchanged) and gzip/deflate above COMPRESS_MIN_SIZE
+compression.init_app(app)
 
 # Configure upload folder and allowed extensions
 # Use absolute path for the upload folder to ensure consistency
@@ -17,80 +63,128 @@ ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'doc', 'docx'}
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# Optional sendfile offload for document downloads: 'x-sendfile' (Apache
+# mod_xsendfile, lighttpd) or 'x-accel' (nginx, with UPLOADS_ACCEL_PREFIX
+# mapped to an internal location aliasing the uploads directory)
+app.config['UPLOADS_SENDFILE'] = os.environ.get('UPLOADS_SENDFILE', 'off')
+app.config['UPLOADS_ACCEL_PREFIX'] = os.environ.get('UPLOADS_ACCEL_PREFIX', '/protected-uploads/')
+app.config['USE_X_SENDFILE'] = app.config['UPLOADS_SENDFILE'] == 'x-sendfile'
+
 # Create upload directory if it doesn't exist
 if not os.path.exists(UPLOAD_FOLDER):
     try:
         os.makedirs(UPLOAD_FOLDER)
-        print(f"Created upload directory at: {UPLOAD_FOLDER}")
+        log.info("Created upload directory at %s", UPLOAD_FOLDER)
     except Exception as e:
-        print(f"Failed to create upload directory: {str(e)}")
+        log.critical("Failed to create upload directory: %s", e)
         sys.exit(1)  # Exit if crucial directory cannot be created
 
 # Check if upload directory is writable
 if not os.access(UPLOAD_FOLDER, os.W_OK):
-    print(f"WARNING: Upload directory {UPLOAD_FOLDER} is not writable")
+    log.warning("Upload directory %s is not writable", UPLOAD_FOLDER)
 
-print(f"Upload directory set to: {UPLOAD_FOLDER}")
+log.info("Upload directory set to %s", UPLOAD_FOLDER)
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+# Uploaded documents are stored once per distinct content under uploads/blobs
+blob_store = BlobStore(os.path.join(UPLOAD_FOLDER, 'blobs'))
 
+# Probe the database schema once at startup; routes consult schema.current()
+try:
+    schema.refresh()
+except Error as e:
+    log.warning("Schema probe failed (%s); retrying on first use", e)
 
-def create_connection():
-    """ Create a database connection to the MySQL database """
-    try:
-        connection = mysql.connector.connect(
-            host="localhost",  # or "127.0.0.1"
-            user="root",
-            password="krish1410",
-            database="schools"
-        )
-        if connection.is_connected():
-            return connection
-    except Error as e:
-        print("Error while connecting to MySQL", e)
-    return None
+# Uploads only queue their post-processing (type check, page count, text, thumbnail).
+# Run `python processing.py worker` to drain the queue, or set DOCUMENT_WORKERS to
+# have `python main.py` start that worker next to the development server.
+DOCUMENT_WORKERS = int(os.environ.get('DOCUMENT_WORKERS', 0))
+
+# Admin dashboard aggregates are cheap to serve stale for a few seconds;
+# TC writes drop the entry so status counts never lag behind an action
+dashboard_cache = TTLCache(ttl=float(os.environ.get('DASHBOARD_CACHE_TTL', 30)))
+
+# Upper bound on student ids per batch comprehensive-details request
+COMPREHENSIVE_BATCH_LIMIT = int(os.environ.get('COMPREHENSIVE_BATCH_LIMIT', 100))
+
+# First migration whose password columns can hold a salted hash
+PASSWORD_HASH_MIGRATION = 7
+
+# Upper bound on certificates decided by one bulk-decision request
+TC_BULK_LIMIT = int(os.environ.get('TC_BULK_LIMIT', 500))
+TC_DECISIONS = ('approved', 'rejected')
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
 @app.route('/')
 def index():
-    connection = create_connection()
-    if connection:
-        cursor = connection.cursor()
-        cursor.execute("SHOW TABLES")
-        tables = cursor.fetchall()
-        cursor.close()
-        connection.close()
+    try:
+        with get_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SHOW TABLES")
+            tables = cursor.fetchall()
+            cursor.close()
         tables_list = [table[0] for table in tables]
         return jsonify({"tables": tables_list})
-    else:
+    except Error as e:
+        log.error("Error while connecting to MySQL: %s", e)
         return jsonify({"message": "Failed to connect to MySQL database"}), 500
 
 
+# Connection pool health endpoint
+@app.route('/api/health/db', methods=['GET'])
+def database_health():
+    return jsonify({"pool": pool.stats()})
+
+
+# Student cache hit/miss counters
+@app.route('/api/health/cache', methods=['GET'])
+def cache_health():
+    return jsonify({"studentCache": student_cache.stats(), "cohortCache": analytics.cohort_cache.stats(),
+                    "searchIndex": search_index.stats()})
+
+
+# Schema descriptor the routes choose their statements from
+@app.route('/api/health/schema', methods=['GET'])
+def schema_health():
+    try:
+        return jsonify({"schema": schema.current().describe()})
+    except Error as e:
+        return jsonify({"message": str(e)}), 500
+
+
 @app.route('/tables/<table_name>', methods=['GET'])
+@auth.require_auth('admin')
 def get_table_contents(table_name):
-    connection = create_connection()
-    if connection:
-        cursor = connection.cursor(dictionary=True)
-        try:
-            cursor.execute(f"SELECT * FROM {table_name}")
-            rows = cursor.fetchall()
-            cursor.close()
-            connection.close()
-            return jsonify({table_name: rows})
-        except Error as e:
-            return jsonify({"message": str(e)}), 500
-    else:
-        return jsonify({"message": "Failed to connect to MySQL database"}), 500
+    fmt = request.args.get('format', 'json')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"message": f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+    try:
+        # The name is interpolated into SQL, so it must be a real table in this schema
+        if table_name not in exportable_tables():
+            return jsonify({"message": f"Unknown table: {table_name}"}), 404
+    except Error as e:
+        return jsonify({"message": str(e)}), 500
+
+    headers = {}
+    if fmt != 'json':
+        extension = 'ndjson' if fmt == 'ndjson' else 'csv'
+        headers['Content-Disposition'] = f'attachment; filename="{table_name}.{extension}"'
+
+    try:
+        # The query runs before the first chunk; fail with a JSON error while the status can still change
+        chunks = export.start(stream_table(table_name, fmt, dumps=app.json.dumps))
+    except Error as e:
+        return jsonify({"message": str(e)}), 500
+
+    return Response(chunks, mimetype=EXPORT_FORMATS[fmt], headers=headers)
 
 
 # Authentication endpoints
 @app.route('/api/auth/login', methods=['POST'])
 def login():
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
-
     data = request.get_json()
     username = data.get('username')
     password = data.get('password')
@@ -99,37 +193,42 @@ def login():
     if not all([username, password, user_type]):
         return jsonify({"message": "Missing required fields"}), 400
 
-    try:
-        cursor = connection.cursor(dictionary=True)
-
-        if user_type == 'student':
-            cursor.execute(
-                "SELECT * FROM students WHERE username = %s AND password = %s",
-                (username, password)
-            )
-        elif user_type == 'admin':
-            cursor.execute(
-                "SELECT * FROM admins WHERE username = %s AND password = %s",
-                (username, password)
-            )
-        else:
-            return jsonify({"message": "Invalid user type"}), 400
+    if user_type == 'student':
+        table, id_column = 'students', 'student_id'
+    elif user_type == 'admin':
+        table, id_column = 'admins', 'admin_id'
+    else:
+        return jsonify({"message": "Invalid user type"}), 400
 
-        user = cursor.fetchone()
-        cursor.close()
-        connection.close()
+    try:
+        with get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(f"SELECT * FROM {table} WHERE username = %s", (username,))
+            user = cursor.fetchone()
+
+            ok, needs_rehash = auth.check_password(user['password'], password) if user else (False, False)
+            # Hashes do not fit the varchar(100) password columns of older databases
+            # until migration 0007 widens them; keep the plaintext until then
+            if ok and needs_rehash and (schema.current().version or 0) >= PASSWORD_HASH_MIGRATION:
+                # Legacy plaintext password: replace it with a salted hash now that we know it
+                cursor.execute(
+                    f"UPDATE {table} SET password = %s WHERE {id_column} = %s",
+                    (auth.hash_password(password), user[id_column])
+                )
+                connection.commit()
+            cursor.close()
 
-        if user:
-            # In a production app, we would use proper JWT tokens here
+        if ok:
+            user_id = user[id_column]
             return jsonify({
                 "message": "Login successful",
                 "user": {
-                    "id": user.get('student_id') if user_type == 'student' else user.get('admin_id'),
+                    "id": user_id,
                     "name": user.get('name'),
                     "username": user.get('username'),
                     "userType": user_type
                 },
-                "token": "fake-jwt-token-" + user_type
+                **auth.token_pair(user_id, user_type)
             })
         else:
             return jsonify({"message": "Invalid credentials"}), 401
@@ -138,36 +237,40 @@ def login():
         return jsonify({"message": str(e)}), 500
 
 
+# Exchange a refresh token for a new token pair; the old refresh token is revoked
+@app.route('/api/auth/refresh', methods=['POST'])
+def refresh_token():
+    data = request.get_json(silent=True) or {}
+    try:
+        claims = auth.verify_token(data.get('refreshToken'), kind='refresh')
+    except auth.AuthError as e:
+        return jsonify({"message": str(e)}), 401
+
+    auth.revoke(claims)
+    return jsonify(auth.token_pair(claims['sub'], claims['role']))
+
+
+@app.route('/api/auth/logout', methods=['POST'])
+@auth.require_auth()
+def logout():
+    auth.revoke(g.auth)
+    data = request.get_json(silent=True) or {}
+    if data.get('refreshToken'):
+        try:
+            auth.revoke(auth.verify_token(data['refreshToken'], kind='refresh'))
+        except auth.AuthError:
+            pass  # Already expired or revoked
+    return jsonify({"message": "Logged out"})
+
+
 # Student profile endpoint
 @app.route('/api/students/<int:student_id>', methods=['GET'])
+@auth.require_auth('student', 'admin')
 def get_student_profile(student_id):
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
-
     try:
-        cursor = connection.cursor(dictionary=True)
-
-        # Join with schools table to get school name
-        cursor.execute(
-            """
-            SELECT s.*, sch.name as school_name 
-            FROM students s 
-            LEFT JOIN schools sch ON s.current_school_id = sch.school_id 
-            WHERE s.student_id = %s
-            """,
-            (student_id,)
-        )
-
-        profile = cursor.fetchone()
-        cursor.close()
-        connection.close()
+        profile = student_data.get_profile(student_id)
 
         if profile:
-            # Remove password from response
-            if 'password' in profile:
-                del profile['password']
-
             return jsonify({"profile": profile})
         else:
             return jsonify({"message": "Student not found"}), 404
@@ -178,160 +281,206 @@ def get_student_profile(student_id):
 
 # Academic records endpoint
 @app.route('/api/students/<int:student_id>/academic-records', methods=['GET'])
+@auth.require_auth('student', 'admin')
 def get_academic_records(student_id):
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
+    try:
+        records = student_data.get_academic_records(student_id)
+        return jsonify({"academicRecords": records})
+
+    except Error as e:
+        return jsonify({"message": str(e)}), 500
+
 
+# Academic summary endpoint: per standard/year averages, best and worst subject, grade counts
+@app.route('/api/students/<int:student_id>/academic-summary', methods=['GET'])
+@auth.require_auth('student', 'admin')
+def get_academic_summary(student_id):
     try:
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(
-            """
-            SELECT record_id, student_id, school_standard, subject, marks, percentage, grade 
-            FROM academic_records 
-            WHERE student_id = %s 
-            ORDER BY school_standard DESC, subject ASC
-            """,
-            (student_id,)
-        )
+        rows = student_data.get_academic_summary(student_id)
+        return jsonify({"academicSummary": rows})
 
-        records = cursor.fetchall()
-        cursor.close()
-        connection.close()
+    except Error as e:
+        log.error("Error getting academic summary: %s", e)
+        return jsonify({"message": str(e)}), 500
 
-        return jsonify({"academicRecords": records})
+
+# Student dashboard bundle: every section the dashboard renders in one round trip
+@app.route('/api/students/<int:student_id>/dashboard', methods=['GET'])
+@auth.require_auth('student', 'admin')
+def get_student_dashboard(student_id):
+    fields_param = request.args.get('fields')
+    if fields_param:
+        fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in student_data.DASHBOARD_SECTIONS]
+        if unknown:
+            return jsonify({
+                "message": f"Unknown fields: {', '.join(unknown)}. "
+                           f"Available: {', '.join(student_data.DASHBOARD_SECTIONS)}"
+            }), 400
+    else:
+        fields = list(student_data.DASHBOARD_SECTIONS)
+
+    try:
+        dashboard = student_data.load_dashboard(student_id, fields)
+
+        if 'profile' in dashboard and dashboard['profile'] is None:
+            return jsonify({"message": "Student not found"}), 404
+
+        return jsonify(dashboard)
 
     except Error as e:
+        log.error("Error building student dashboard: %s", e)
         return jsonify({"message": str(e)}), 500
 
 
+def document_url(document):
+    """ Public URL for a documents row; content-addressed rows are served from the blob store """
+    base = request.host_url.rstrip('/') + '/uploads/'
+    if document.get('content_hash'):
+        return base + document['content_hash'] + '/' + document['file_name']
+    return base + document['file_name']
+
+
+def processing_fields(document, job):
+    """ Status, detected type, page count and thumbnail URL from a document's processing job """
+    if job is None:
+        # Legacy flat uploads are never processed; new blobs may not be queued yet
+        status = 'pending' if document.get('content_hash') and processing.available() else 'unavailable'
+        return {"processing_status": status, "detected_type": None, "page_count": None, "thumbnail_url": None}
+
+    status = job['status']
+    if status == 'done' and not processing.type_matches(document['file_name'], job['detected_type']):
+        status = 'invalid'  # Content does not match the file extension
+    thumbnail_url = None
+    if job['has_thumbnail']:
+        thumbnail_url = request.host_url.rstrip('/') + '/previews/' + document['content_hash'] + '.png'
+    return {
+        "processing_status": status,
+        "detected_type": job['detected_type'],
+        "page_count": job['page_count'],
+        "thumbnail_url": thumbnail_url,
+    }
+
+
 # Documents endpoint
 @app.route('/api/students/<int:student_id>/documents', methods=['GET'])
+@auth.require_auth('student', 'admin')
 def get_documents(student_id):
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
-
     try:
-        cursor = connection.cursor(dictionary=True)
-        # Modified query to only select columns that exist in the table
-        cursor.execute(
-            "SELECT document_id, document_type, file_name, upload_date FROM documents WHERE student_id = %s ORDER BY upload_date DESC",
-            (student_id,)
-        )
-
-        documents = cursor.fetchall()
-        cursor.close()
-        connection.close()
-
-        print(f"Found {len(documents)} documents for student {student_id}")
+        documents = student_data.get_documents(student_id)
 
         if not documents:
             return jsonify({"documents": []}), 200  # Return empty array instead of 404
 
-        # Add file_url for frontend access
-        for document in documents:
-            # Construct URL based on file_name only
-            document['file_url'] = request.host_url.rstrip('/') + '/uploads/' + document['file_name']
+        # Processing status changes under the cache (workers may run in another process),
+        # so it is read fresh: one primary-key lookup per distinct blob
+        jobs = processing.statuses(
+            document['content_hash'] for document in documents if document.get('content_hash')
+        )
+
+        # Add file_url for frontend access (copies, so the cached rows stay host-independent)
+        documents = [
+            dict(document, file_url=document_url(document),
+                 **processing_fields(document, jobs.get(document.get('content_hash'))))
+            for document in documents
+        ]
 
-        print(f"Returning documents with URLs: {documents}")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Returning %d documents for student %s", len(documents), student_id,
+                      extra={"documents": documents})
         return jsonify({"documents": documents})
 
     except Error as e:
-        print(f"Error fetching documents: {str(e)}")
+        log.error("Error fetching documents: %s", e)
         return jsonify({"message": str(e)}), 500
 
 
 # Document upload endpoint
 @app.route('/api/students/<int:student_id>/documents/upload', methods=['POST'])
+@auth.require_auth('student', 'admin')
 def upload_document(student_id):
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
-
-    print(f"Processing document upload for student {student_id}")
-    
-    # Debug request information
-    print(f"Request files: {request.files}")
-    print(f"Request form: {request.form}")
+    # Debug request information; formatting these is not free, so only when asked for
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Document upload for student %s", student_id,
+                  extra={"files": str(request.files), "form": request.form.to_dict()})
     
     if 'file' not in request.files:
-        print("No file part in the request")
         return jsonify({"message": "No file part in request"}), 400
 
     file = request.files['file']
     
     if file.filename == '':
-        print("Empty filename submitted")
         return jsonify({"message": "No selected file"}), 400
         
     if not file:
-        print("File object is invalid")
         return jsonify({"message": "Invalid file"}), 400
 
-    print(f"Received file: {file.filename}, type: {file.content_type}")
-    
     if file and allowed_file(file.filename):
         try:
-            # Create a more unique filename to avoid overwriting
-            timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-            original_filename = secure_filename(file.filename)
-            filename = f"{timestamp}_{original_filename}"
-            
-            # Full path for storing the file
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            
-            print(f"Saving file to: {file_path}")
-            file.save(file_path)
+            filename = secure_filename(file.filename)
+
+            # Identical content is stored once; a re-upload only adds a reference
+            started = time.perf_counter()
+            content_hash, size = blob_store.digest(file.stream)
+            file_path = blob_store.relative_path(content_hash)
             
             document_type = request.form.get('documentType')
             now = datetime.datetime.now()
             upload_date = now.strftime("%Y-%m-%d")
 
-            # Check if the documents table has a file_path column
-            cursor = connection.cursor()
-            try:
-                # Try inserting with file_path
-                cursor.execute(
-                    "INSERT INTO documents (student_id, document_type, file_name, file_path, upload_date) VALUES (%s, %s, %s, %s, %s)",
-                    (student_id, document_type, filename, f"uploads/{filename}", upload_date)
-                )
-            except Error as column_error:
-                # If file_path column doesn't exist, try without it
-                if "Unknown column 'file_path'" in str(column_error):
-                    print("file_path column not found, trying without it")
+            with get_connection() as connection:
+                cursor = connection.cursor()
+                # Locks the blob's row: a delete of its last reference either committed
+                # (and took the file with it) or waits for us, so the check below holds
+                add_reference(cursor, content_hash, size)
+                created = blob_store.ensure(file.stream, content_hash)
+                metrics.observe_upload(size, time.perf_counter() - started)
+                log.debug("Stored blob %s (%d bytes, %s)", content_hash, size, 'new' if created else 'deduplicated')
+                # Type check and previews happen in the background; a known blob keeps its job
+                processing.enqueue(cursor, content_hash)
+
+                # Older databases have no documents.file_path column
+                if schema.current().has_column('documents', 'file_path'):
                     cursor.execute(
-                        "INSERT INTO documents (student_id, document_type, file_name, upload_date) VALUES (%s, %s, %s, %s)",
-                        (student_id, document_type, filename, upload_date)
+                        "INSERT INTO documents (student_id, document_type, file_name, file_path, content_hash, upload_date) VALUES (%s, %s, %s, %s, %s, %s)",
+                        (student_id, document_type, filename, file_path, content_hash, upload_date)
                     )
                 else:
-                    # Re-raise if it's a different error
-                    raise column_error
+                    cursor.execute(
+                        "INSERT INTO documents (student_id, document_type, file_name, content_hash, upload_date) VALUES (%s, %s, %s, %s, %s)",
+                        (student_id, document_type, filename, content_hash, upload_date)
+                    )
 
-            connection.commit()
-            document_id = cursor.lastrowid
-            cursor.close()
-            connection.close()
+                connection.commit()
+                document_id = cursor.lastrowid
+                cursor.close()
 
-            print(f"Document uploaded successfully, ID: {document_id}")
+            student_cache.invalidate(student_id, 'documents')
+
+            log.info("Document %s uploaded for student %s", document_id, student_id)
             
+            document = {
+                "document_id": document_id,
+                "student_id": student_id,
+                "document_type": document_type,
+                "file_name": filename,
+                "content_hash": content_hash,
+                "upload_date": upload_date
+            }
+            document['file_url'] = document_url(document)
+            # A re-uploaded blob may already have its previews
+            document.update(processing_fields(document, processing.statuses([content_hash]).get(content_hash)))
+
             return jsonify({
                 "message": "Document uploaded successfully",
-                "document": {
-                    "document_id": document_id,
-                    "student_id": student_id,
-                    "document_type": document_type,
-                    "file_name": filename,
-                    "upload_date": upload_date
-                }
+                "document": document
             })
 
         except Exception as e:
-            print(f"Error during file upload: {str(e)}")
+            log.exception("Error during file upload")
             return jsonify({"message": f"Upload failed: {str(e)}"}), 500
     else:
         allowed_extensions = ', '.join(ALLOWED_EXTENSIONS)
-        print(f"File type not allowed. Allowed types: {allowed_extensions}")
         return jsonify({
             "message": f"File type not allowed. Allowed types: {allowed_extensions}"
         }), 400
@@ -339,66 +488,135 @@ def upload_document(student_id):
 
 # Document deletion endpoint
 @app.route('/api/students/<int:student_id>/documents/<int:document_id>', methods=['DELETE'])
+@auth.require_auth('student', 'admin')
 def delete_document(student_id, document_id):
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
-
-    print(f"Processing document deletion for student {student_id}, document {document_id}")
-    
     try:
-        # First, get the document to retrieve the file name
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(
-            "SELECT * FROM documents WHERE document_id = %s AND student_id = %s",
-            (document_id, student_id)
-        )
-        document = cursor.fetchone()
-        
-        if not document:
-            return jsonify({"message": "Document not found or does not belong to this student"}), 404
-        
-        # Delete the document record from the database
-        cursor.execute(
-            "DELETE FROM documents WHERE document_id = %s AND student_id = %s",
-            (document_id, student_id)
-        )
-        connection.commit()
-        cursor.close()
-        
-        # Try to delete the file from the filesystem if it exists
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], document['file_name'])
-        try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"Deleted file: {file_path}")
-            else:
-                print(f"File not found: {file_path}")
-        except Exception as file_error:
-            # Log error but don't fail the request - database record is already deleted
-            print(f"Error deleting file: {str(file_error)}")
+        with get_connection() as connection:
+            # First, get the document to retrieve the file name
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(
+                "SELECT * FROM documents WHERE document_id = %s AND student_id = %s",
+                (document_id, student_id)
+            )
+            document = cursor.fetchone()
+            
+            if not document:
+                cursor.close()
+                return jsonify({"message": "Document not found or does not belong to this student"}), 404
+            
+            # Delete the document record from the database
+            cursor.execute(
+                "DELETE FROM documents WHERE document_id = %s AND student_id = %s",
+                (document_id, student_id)
+            )
+            content_hash = document.get('content_hash')
+            detached = []
+            if content_hash:
+                unreferenced = drop_reference(cursor, content_hash)
+                if unreferenced:
+                    processing.forget(cursor, content_hash)
+                    # Still under the row lock: an upload of the same content waits, then writes it again
+                    detached = blob_store.detach(content_hash)
+            try:
+                connection.commit()
+            except Error:
+                blob_store.restore(detached)
+                raise
+            cursor.close()
+
+        student_cache.invalidate(student_id, 'documents')
+
+        if content_hash:
+            # Shared blobs stay on disk until their last document is gone
+            blob_store.purge(detached)
+            if detached:
+                log.debug("Deleted blob %s", content_hash)
+        else:
+            # Legacy flat upload: try to delete the file from the filesystem if it exists
+            file_path = os.path.join(app.config['UPLOAD_FOLDER'], document['file_name'])
+            try:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                    log.debug("Deleted file %s", file_path)
+                else:
+                    log.warning("File not found: %s", file_path)
+            except Exception as file_error:
+                # Log error but don't fail the request - database record is already deleted
+                log.warning("Error deleting file %s: %s", file_path, file_error)
         
-        print(f"Document {document_id} deleted successfully")
+        log.info("Document %s deleted for student %s", document_id, student_id)
         return jsonify({"message": "Document deleted successfully"})
 
     except Error as e:
-        print(f"Database error deleting document: {str(e)}")
+        log.error("Database error deleting document: %s", e)
         return jsonify({"message": str(e)}), 500
 
 
 # Serve static files (uploaded documents)
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # Legacy flat uploads can be replaced in place, so clients must revalidate
+    response = send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    response.cache_control.no_cache = True
+    return response
+
+
+# Serve content-addressed documents; the file name is only used for the download name and type
+@app.route('/uploads/<content_hash>/<filename>')
+def uploaded_blob(content_hash, filename):
+    if not is_content_hash(content_hash) or not blob_store.exists(content_hash):
+        abort(404)
+
+    download_name = secure_filename(filename) or content_hash
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    if app.config['UPLOADS_SENDFILE'] == 'x-accel':
+        # nginx serves the bytes (including Range requests) from an internal location
+        response = Response(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = (
+            app.config['UPLOADS_ACCEL_PREFIX'].rstrip('/') + '/' + blob_store.relative_path(content_hash)
+        )
+        response.headers['Content-Disposition'] = f'inline; filename="{download_name}"'
+        response.set_etag(content_hash)
+        response.make_conditional(request)
+    else:
+        # Handles If-None-Match (304) and Range (206); with USE_X_SENDFILE the
+        # front server streams the file and no worker is tied up
+        response = send_file(
+            blob_store.path_for(content_hash),
+            mimetype=mimetype,
+            download_name=download_name,
+            conditional=True,
+            etag=content_hash
+        )
+
+    # The URL names the content, so it can never change
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
+
+# Serve document thumbnails written by the processing worker
+@app.route('/previews/<content_hash>.png')
+def document_preview(content_hash):
+    if not is_content_hash(content_hash):
+        abort(404)
+    path = blob_store.preview_path(content_hash, processing.THUMBNAIL_SUFFIX)
+    if not os.path.exists(path):
+        abort(404)
+    response = send_file(path, mimetype='image/png', conditional=True, etag=content_hash + '-thumb')
+    # Derived from immutable content; regenerating produces the same image
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
 
 
 # Transfer certificate endpoints
 @app.route('/api/students/<int:student_id>/transfer-certificate', methods=['POST'])
+@auth.require_auth('student', 'admin')
 def apply_transfer_certificate(student_id):
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
-
     data = request.get_json()
     destination_school = data.get('destinationSchool')
     reason = data.get('reason')
@@ -408,28 +626,21 @@ def apply_transfer_certificate(student_id):
         return jsonify({"message": "Missing required fields"}), 400
 
     try:
-        cursor = connection.cursor()
         now = datetime.datetime.now()
         application_date = now.strftime("%Y-%m-%d")
 
-        cursor.execute(
-            """
-            INSERT INTO transfer_certificates 
-            (student_id, application_date, destination_school, reason, transfer_date, status) 
-            VALUES (%s, %s, %s, %s, %s, 'pending')
-            """,
-            (student_id, application_date, destination_school, reason, transfer_date)
-        )
-
-        connection.commit()
-        tc_id = cursor.lastrowid
-        cursor.close()
-        connection.close()
-
-        return jsonify({
-            "message": "Transfer certificate application submitted successfully",
-            "transferCertificate": {
-                "tc_id": tc_id,
+        with get_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                INSERT INTO transfer_certificates 
+                (student_id, application_date, destination_school, reason, transfer_date, status) 
+                VALUES (%s, %s, %s, %s, %s, 'pending')
+                """,
+                (student_id, application_date, destination_school, reason, transfer_date)
+            )
+            certificate = {
+                "tc_id": cursor.lastrowid,
                 "student_id": student_id,
                 "application_date": application_date,
                 "destination_school": destination_school,
@@ -437,6 +648,18 @@ def apply_transfer_certificate(student_id):
                 "transfer_date": transfer_date,
                 "status": "pending"
             }
+            publish_tc(cursor, 'tc.created', student_id, certificate)
+
+            connection.commit()
+            cursor.close()
+
+        dashboard_cache.invalidate()
+        student_cache.invalidate(student_id, 'transfer_certificates')
+        search_index.refresh_destination(destination_school)
+
+        return jsonify({
+            "message": "Transfer certificate application submitted successfully",
+            "transferCertificate": certificate
         })
 
     except Error as e:
@@ -444,153 +667,201 @@ def apply_transfer_certificate(student_id):
 
 
 @app.route('/api/students/<int:student_id>/transfer-certificate', methods=['GET'])
+@auth.require_auth('student', 'admin')
 def get_transfer_certificate(student_id):
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
-
     try:
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(
-            """
-            SELECT tc.*, s.name as student_name 
-            FROM transfer_certificates tc
-            JOIN students s ON tc.student_id = s.student_id
-            WHERE tc.student_id = %s
-            ORDER BY application_date DESC
-            """,
-            (student_id,)
-        )
+        certificates = student_data.get_transfer_certificates(student_id)
+        return jsonify({"transferCertificates": certificates})
 
-        certificates = cursor.fetchall()
-        cursor.close()
-        connection.close()
+    except Error as e:
+        return jsonify({"message": str(e)}), 500
 
-        return jsonify({"transferCertificates": certificates})
 
+def tc_event_stream(topic):
+    """ text/event-stream of TC changes for a topic, resuming after Last-Event-ID """
+    # End the stream when the token in the URL expires, so a reconnect has to present a fresh one
+    deadline = min(g.auth['exp'], time.time() + events.MAX_STREAM_SECONDS)
+    # EventSource sends Last-Event-ID on its own reconnects; a client opening a new one passes it in the URL
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    if not events.available():
+        # Without the outbox no event would ever arrive; don't hold a heartbeat-only stream open
+        return jsonify({"message": "TC events are unavailable until migration 0008 is applied"}), 503
+    try:
+        # The first stream in a process starts its relay from the tc_events table
+        events.tc_relay.start()
     except Error as e:
+        log.error("Error starting the TC event relay: %s", e)
         return jsonify({"message": str(e)}), 500
+    return Response(
+        events.tc_events.stream(topic, last_event_id, deadline),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+# Push channel for a student's TC status changes (EventSource cannot send headers, hence ?token=)
+@app.route('/api/students/<int:student_id>/transfer-certificate/events', methods=['GET'])
+@auth.require_auth('student', 'admin', query_token=True)
+def transfer_certificate_events(student_id):
+    return tc_event_stream(f"student:{student_id}")
 
 
 @app.route('/api/students/<int:student_id>/transfer-certificate/<int:tc_id>', methods=['DELETE'])
+@auth.require_auth('student', 'admin')
 def delete_transfer_certificate(student_id, tc_id):
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
-
-    print(f"Processing transfer certificate deletion for student {student_id}, certificate {tc_id}")
-    
     try:
-        # First, check if the certificate exists and belongs to the student
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(
-            "SELECT * FROM transfer_certificates WHERE tc_id = %s AND student_id = %s",
-            (tc_id, student_id)
-        )
-        certificate = cursor.fetchone()
-        
-        if not certificate:
-            return jsonify({"message": "Transfer certificate not found or does not belong to this student"}), 404
-        
-        # Only allow deletion of pending applications
-        if certificate['status'] != 'pending':
-            return jsonify({"message": "Only pending applications can be deleted"}), 400
-        
-        # Delete the certificate record from the database
-        cursor.execute(
-            "DELETE FROM transfer_certificates WHERE tc_id = %s AND student_id = %s",
-            (tc_id, student_id)
-        )
-        connection.commit()
-        cursor.close()
-        connection.close()
+        with get_connection() as connection:
+            # First, check if the certificate exists and belongs to the student
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(
+                "SELECT * FROM transfer_certificates WHERE tc_id = %s AND student_id = %s",
+                (tc_id, student_id)
+            )
+            certificate = cursor.fetchone()
+            
+            if not certificate:
+                cursor.close()
+                return jsonify({"message": "Transfer certificate not found or does not belong to this student"}), 404
+            
+            # Only allow deletion of pending applications
+            if certificate['status'] != 'pending':
+                cursor.close()
+                return jsonify({"message": "Only pending applications can be deleted"}), 400
+            
+            # Delete the certificate record from the database
+            cursor.execute(
+                "DELETE FROM transfer_certificates WHERE tc_id = %s AND student_id = %s",
+                (tc_id, student_id)
+            )
+            publish_tc(cursor, 'tc.deleted', student_id, {"tc_id": tc_id, "student_id": student_id})
+            connection.commit()
+            cursor.close()
+
+        dashboard_cache.invalidate()
+        student_cache.invalidate(student_id, 'transfer_certificates')
+        search_index.refresh_destination(certificate['destination_school'])
         
-        print(f"Transfer certificate {tc_id} deleted successfully")
+        log.info("Transfer certificate %s deleted by student %s", tc_id, student_id)
         return jsonify({"message": "Transfer certificate deleted successfully"})
 
     except Error as e:
-        print(f"Database error deleting transfer certificate: {str(e)}")
+        log.error("Database error deleting transfer certificate: %s", e)
         return jsonify({"message": str(e)}), 500
 
 
 # Scheme history endpoint
 @app.route('/api/students/<int:student_id>/schemes', methods=['GET'])
+@auth.require_auth('student', 'admin')
 def get_scheme_history(student_id):
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
-
     try:
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(
-            """
-            SELECT sh.*, s.name as scheme_name
-            FROM scheme_history sh
-            JOIN schemes s ON sh.scheme_id = s.scheme_id
-            WHERE sh.student_id = %s
-            ORDER BY start_date DESC
-            """,
-            (student_id,)
-        )
-
-        schemes = cursor.fetchall()
-        cursor.close()
-        connection.close()
-
+        schemes = student_data.get_schemes(student_id)
         return jsonify({"schemes": schemes})
 
     except Error as e:
         return jsonify({"message": str(e)}), 500
 
 
+def student_page_query(page_size, order, school_id=None, cursor_values=None):
+    """ ``(sql, params)`` for one keyset page of the admin student list, plus one look-ahead row """
+    conditions = []
+    params = []
+    if school_id is not None:
+        conditions.append("s.current_school_id = %s")
+        params.append(school_id)
+    if cursor_values:
+        # Keyset: continue strictly after the last student_id of the previous page
+        conditions.append("s.student_id > %s" if order == 'asc' else "s.student_id < %s")
+        params.append(cursor_values.get('id'))
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f"""
+        SELECT s.student_id, s.name, s.dob, s.current_school_id, s.contact_info, sch.name as school_name
+        FROM students s
+        LEFT JOIN schools sch ON s.current_school_id = sch.school_id
+        {where}
+        ORDER BY s.student_id {order.upper()}
+        LIMIT %s
+    """
+    return sql, (*params, page_size + 1)
+
+
 # Admin endpoints for students list
 @app.route('/api/admin/students', methods=['GET'])
+@auth.require_auth('admin')
 def get_all_students():
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
+    try:
+        page_size = parse_page_size(request.args.get('limit'))
+        order = parse_order(request.args.get('order'), 'asc')
+        school_id = parse_int(request.args.get('school_id'), 'school_id')
+        cursor_values = decode_cursor(request.args.get('cursor'), ('id',))
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+
+    sql, params = student_page_query(page_size, order, school_id, cursor_values)
 
     try:
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(
-            """
-            SELECT s.student_id, s.name, s.dob, s.current_school_id, s.contact_info, sch.name as school_name
-            FROM students s
-            LEFT JOIN schools sch ON s.current_school_id = sch.school_id
-            ORDER BY s.student_id
-            """
+        with get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(sql, params)
+
+            students = cursor.fetchall()
+            cursor.close()
+
+        students, next_cursor = split_page(
+            students, page_size, lambda row: {"id": row['student_id']}
         )
+        return jsonify({"students": rows_payload(students), "nextCursor": next_cursor, "pageSize": page_size})
 
-        students = cursor.fetchall()
-        cursor.close()
-        connection.close()
+    except Error as e:
+        return jsonify({"message": str(e)}), 500
 
-        return jsonify({"students": students})
 
+# Admin typeahead over student names/usernames/contacts, schools and TC destination schools
+@app.route('/api/admin/search', methods=['GET'])
+@auth.require_auth('admin')
+def admin_search():
+    query = (request.args.get('q') or '').strip()
+    try:
+        limit = parse_int(request.args.get('limit'), 'limit') or search.DEFAULT_LIMIT
+        if limit < 1:
+            raise PaginationError("limit must be positive")
+        types = [value for value in (request.args.get('types') or '').split(',') if value]
+        unknown = set(types) - set(search.SEARCH_TYPES)
+        if unknown:
+            raise PaginationError(f"types must be among: {', '.join(search.SEARCH_TYPES)}")
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+
+    if not query:
+        return jsonify({"query": query, "results": []})
+    try:
+        started = time.perf_counter()
+        results = search_index.search(query, min(limit, search.MAX_LIMIT), set(types) or None)
+        return jsonify({"query": query, "results": results,
+                        "tookMs": round((time.perf_counter() - started) * 1000, 3)})
     except Error as e:
+        log.error("Error building search index: %s", e)
         return jsonify({"message": str(e)}), 500
 
 
 # Admin endpoint to get a single student's details
 @app.route('/api/admin/students/<int:student_id>', methods=['GET'])
+@auth.require_auth('admin')
 def get_student_details(student_id):
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
-        
     try:
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(
-            """
-            SELECT s.*, sch.name as school_name 
-            FROM students s 
-            LEFT JOIN schools sch ON s.current_school_id = sch.school_id 
-            WHERE s.student_id = %s
-            """, 
-            (student_id,)
-        )
-        student = cursor.fetchone()
-        cursor.close()
+        with get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(
+                """
+                SELECT s.*, sch.name as school_name 
+                FROM students s 
+                LEFT JOIN schools sch ON s.current_school_id = sch.school_id 
+                WHERE s.student_id = %s
+                """, 
+                (student_id,)
+            )
+            student = cursor.fetchone()
+            cursor.close()
         
         if not student:
             return jsonify({"message": "Student not found"}), 404
@@ -602,16 +873,13 @@ def get_student_details(student_id):
         return jsonify({"student": student})
         
     except Error as e:
-        print(f"Error getting student details: {str(e)}")
+        log.error("Error getting student details: %s", e)
         return jsonify({"message": str(e)}), 500
 
 # Admin endpoint to update student information
 @app.route('/api/admin/students/<int:student_id>', methods=['PUT'])
+@auth.require_auth('admin')
 def update_student(student_id):
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
-        
     data = request.get_json()
     name = data.get('name')
     dob = data.get('dob')
@@ -621,19 +889,24 @@ def update_student(student_id):
         return jsonify({"message": "Name is required"}), 400
         
     try:
-        cursor = connection.cursor()
-        cursor.execute(
-            """
-            UPDATE students 
-            SET name = %s, dob = %s, contact_info = %s
-            WHERE student_id = %s
-            """, 
-            (name, dob, contact_info, student_id)
-        )
-        
-        connection.commit()
-        cursor.close()
-        connection.close()
+        with get_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                UPDATE students 
+                SET name = %s, dob = %s, contact_info = %s
+                WHERE student_id = %s
+                """, 
+                (name, dob, contact_info, student_id)
+            )
+            
+            connection.commit()
+            cursor.close()
+
+        # Cached TC lists carry the student's name as student_name
+        student_cache.invalidate(student_id, 'profile', 'transfer_certificates')
+        dashboard_cache.invalidate()
+        search_index.refresh_student(student_id)
         
         return jsonify({
             "message": "Student updated successfully",
@@ -647,44 +920,137 @@ def update_student(student_id):
         })
         
     except Error as e:
-        print(f"Error updating student: {str(e)}")
+        log.error("Error updating student: %s", e)
         return jsonify({"message": str(e)}), 500
 
 
+# Admin endpoint to bulk load academic records (upserts on student, standard, subject, year)
+@app.route('/api/admin/academic-records/bulk-import', methods=['POST'])
+@auth.require_auth('admin')
+def bulk_import_academic_records():
+    try:
+        batch_size = parse_int(request.args.get('batch_size'), 'batch_size') or ingest.DEFAULT_BATCH_SIZE
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+    batch_size = max(1, min(batch_size, 5000))
+
+    # JSON {"records": [...]}, a multipart CSV/NDJSON file, or a raw text/csv or NDJSON body
+    if 'file' in request.files:
+        upload = request.files['file']
+        rows = ingest.rows_from_file(upload.stream, ingest.guess_format(upload.filename))
+    elif request.mimetype == 'text/csv':
+        rows = ingest.iter_csv(request.stream)
+    elif request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        rows = ingest.iter_ndjson(request.stream)
+    else:
+        data = request.get_json(silent=True) or {}
+        rows = data.get('records')
+        if not isinstance(rows, list):
+            return jsonify({"message": "records must be a list"}), 400
+
+    report = ingest.new_report()
+    try:
+        ingest.ingest(rows, batch_size=batch_size, report=report)
+    except ValueError as e:
+        # Batches before the unreadable line are already committed; re-running the file is safe
+        return jsonify({"message": f"Could not parse upload: {str(e)}"}), 400
+    except Error as e:
+        log.error("Error importing academic records: %s", e)
+        return jsonify({"message": str(e)}), 500
+    finally:
+        # Also after a failure part way: the batches before it are committed
+        for student_id in report.pop('_students'):
+            student_cache.invalidate(student_id, 'academic_records', 'academic_summary')
+        for standard, academic_year in report.pop('_cohorts'):
+            analytics.cohort_cache.invalidate(standard, academic_year)
+
+    return jsonify({"message": "Academic records imported", "report": report})
+
+
+def transfer_certificate_page_query(page_size, order, status=None, school_id=None,
+                                    date_from=None, date_to=None, cursor_values=None):
+    """ ``(sql, params)`` for one keyset page of the admin TC list, plus one look-ahead row """
+    conditions = []
+    params = []
+    if status:
+        conditions.append("tc.status = %s")
+        params.append(status)
+    if school_id is not None:
+        conditions.append("s.current_school_id = %s")
+        params.append(school_id)
+    if date_from:
+        conditions.append("tc.application_date >= %s")
+        params.append(date_from)
+    if date_to:
+        conditions.append("tc.application_date <= %s")
+        params.append(date_to)
+    if cursor_values:
+        # Keyset on (application_date, tc_id); tc_id breaks ties within a day
+        op = '<' if order == 'desc' else '>'
+        conditions.append(
+            f"(tc.application_date {op} %s OR (tc.application_date = %s AND tc.tc_id {op} %s))"
+        )
+        params.extend([cursor_values.get('date'), cursor_values.get('date'), cursor_values.get('id')])
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f"""
+        SELECT tc.*, s.name as student_name
+        FROM transfer_certificates tc
+        JOIN students s ON tc.student_id = s.student_id
+        {where}
+        ORDER BY tc.application_date {order.upper()}, tc.tc_id {order.upper()}
+        LIMIT %s
+    """
+    return sql, (*params, page_size + 1)
+
+
 # Admin endpoints for transfer certificate approval
 @app.route('/api/admin/transfer-certificates', methods=['GET'])
+@auth.require_auth('admin')
 def get_transfer_certificates():
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
+    try:
+        page_size = parse_page_size(request.args.get('limit'))
+        order = parse_order(request.args.get('order'), 'desc')
+        school_id = parse_int(request.args.get('school_id'), 'school_id')
+        date_from = parse_date(request.args.get('date_from'), 'date_from')
+        date_to = parse_date(request.args.get('date_to'), 'date_to')
+        cursor_values = decode_cursor(request.args.get('cursor'), ('date', 'id'))
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+
+    status = request.args.get('status')
+    if status and status not in ('pending', 'approved', 'rejected'):
+        return jsonify({"message": "status must be pending, approved or rejected"}), 400
+
+    sql, params = transfer_certificate_page_query(
+        page_size, order, status, school_id, date_from, date_to, cursor_values
+    )
 
     try:
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(
-            """
-            SELECT tc.*, s.name as student_name 
-            FROM transfer_certificates tc
-            JOIN students s ON tc.student_id = s.student_id
-            ORDER BY application_date DESC
-            """
-        )
+        with get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(sql, params)
 
-        certificates = cursor.fetchall()
-        cursor.close()
-        connection.close()
+            certificates = cursor.fetchall()
+            cursor.close()
 
-        return jsonify({"transferCertificates": certificates})
+        certificates, next_cursor = split_page(
+            certificates, page_size,
+            lambda row: {"date": row['application_date'].isoformat(), "id": row['tc_id']}
+        )
+        return jsonify({
+            "transferCertificates": rows_payload(certificates),
+            "nextCursor": next_cursor,
+            "pageSize": page_size
+        })
 
     except Error as e:
         return jsonify({"message": str(e)}), 500
 
 
 @app.route('/api/admin/transfer-certificates/<int:tc_id>', methods=['PATCH'])
+@auth.require_auth('admin')
 def update_transfer_certificate(tc_id):
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
-
     data = request.get_json()
     status = data.get('status')
     comments = data.get('comments')
@@ -694,185 +1060,442 @@ def update_transfer_certificate(tc_id):
         return jsonify({"message": "Status is required"}), 400
 
     try:
-        cursor = connection.cursor()
         now = datetime.datetime.now()
         processed_date = now.strftime("%Y-%m-%d")
 
-        cursor.execute(
-            """
-            UPDATE transfer_certificates 
-            SET status = %s, comments = %s, processed_by = %s, processed_date = %s
-            WHERE tc_id = %s
-            """,
-            (status, comments, processed_by, processed_date, tc_id)
-        )
-
-        connection.commit()
-        cursor.close()
-        connection.close()
+        with get_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                UPDATE transfer_certificates 
+                SET status = %s, comments = %s, processed_by = %s, processed_date = %s
+                WHERE tc_id = %s
+                """,
+                (status, comments, processed_by, processed_date, tc_id)
+            )
 
-        return jsonify({
-            "message": "Transfer certificate updated successfully",
-            "transferCertificate": {
+            certificate = {
                 "tc_id": tc_id,
                 "status": status,
                 "comments": comments,
                 "processed_by": processed_by,
                 "processed_date": processed_date
             }
+            # Look up the owner so their cached TC list can be dropped
+            cursor.execute("SELECT student_id FROM transfer_certificates WHERE tc_id = %s", (tc_id,))
+            owner = cursor.fetchone()
+            if owner:
+                publish_tc(cursor, 'tc.updated', owner[0], {**certificate, "student_id": owner[0]})
+
+            connection.commit()
+            cursor.close()
+
+        dashboard_cache.invalidate()
+        if owner:
+            student_cache.invalidate(owner[0], 'transfer_certificates')
+
+        return jsonify({
+            "message": "Transfer certificate updated successfully",
+            "transferCertificate": certificate
+        })
+
+    except Error as e:
+        return jsonify({"message": str(e)}), 500
+
+
+# Push channel for every TC change, for the admin list
+@app.route('/api/admin/transfer-certificates/events', methods=['GET'])
+@auth.require_auth('admin', query_token=True)
+def admin_transfer_certificate_events():
+    return tc_event_stream('admin')
+
+
+@app.route('/api/admin/transfer-certificates/bulk-decision', methods=['POST'])
+@auth.require_auth('admin')
+def bulk_decide_transfer_certificates():
+    data = request.get_json(silent=True) or {}
+    tc_ids = data.get('tcIds')
+    status = data.get('status')
+    comments = data.get('comments')
+    processed_by = data.get('processed_by')
+
+    if status not in TC_DECISIONS:
+        return jsonify({"message": f"status must be one of: {', '.join(TC_DECISIONS)}"}), 400
+    if not isinstance(tc_ids, list) or not tc_ids:
+        return jsonify({"message": "tcIds must be a non-empty list"}), 400
+    try:
+        # De-duplicate while keeping the caller's order
+        tc_ids = list(dict.fromkeys(int(tc_id) for tc_id in tc_ids))
+    except (TypeError, ValueError):
+        return jsonify({"message": "tcIds must contain integers"}), 400
+    if len(tc_ids) > TC_BULK_LIMIT:
+        return jsonify({
+            "message": f"At most {TC_BULK_LIMIT} transfer certificates can be decided at once"
+        }), 400
+
+    try:
+        processed_date = datetime.datetime.now().strftime("%Y-%m-%d")
+        placeholders = ', '.join(['%s'] * len(tc_ids))
+
+        with get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                # Lock the rows so a concurrent single PATCH cannot decide one in between
+                cursor.execute(
+                    f"""
+                    SELECT tc_id, student_id, status FROM transfer_certificates
+                    WHERE tc_id IN ({placeholders})
+                    FOR UPDATE
+                    """,
+                    tc_ids
+                )
+                current = {row['tc_id']: row for row in cursor.fetchall()}
+                pending = [tc_id for tc_id in tc_ids
+                           if tc_id in current and current[tc_id]['status'] == 'pending']
+
+                if pending:
+                    cursor.execute(
+                        f"""
+                        UPDATE transfer_certificates
+                        SET status = %s, comments = %s, processed_by = %s, processed_date = %s
+                        WHERE tc_id IN ({', '.join(['%s'] * len(pending))}) AND status = 'pending'
+                        """,
+                        [status, comments, processed_by, processed_date, *pending]
+                    )
+                for tc_id in pending:
+                    owner = current[tc_id]['student_id']
+                    publish_tc(cursor, 'tc.updated', owner, {
+                        "tc_id": tc_id, "student_id": owner, "status": status, "comments": comments,
+                        "processed_by": processed_by, "processed_date": processed_date
+                    })
+                connection.commit()
+            except Error:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        results = []
+        for tc_id in tc_ids:
+            row = current.get(tc_id)
+            if row is None:
+                results.append({"tc_id": tc_id, "result": "not_found"})
+            elif row['status'] != 'pending':
+                results.append({"tc_id": tc_id, "result": "skipped", "status": row['status']})
+            else:
+                results.append({"tc_id": tc_id, "result": "updated", "status": status})
+
+        if pending:
+            dashboard_cache.invalidate()
+            for owner in {current[tc_id]['student_id'] for tc_id in pending}:
+                student_cache.invalidate(owner, 'transfer_certificates')
+        log.info("Bulk decision %s: %d of %d transfer certificates updated by %s",
+                 status, len(pending), len(tc_ids), processed_by)
+
+        return jsonify({
+            "message": f"{len(pending)} transfer certificate(s) {status}",
+            "status": status,
+            "processed_date": processed_date,
+            "updated": len(pending),
+            "skipped": sum(1 for result in results if result["result"] == "skipped"),
+            "notFound": sum(1 for result in results if result["result"] == "not_found"),
+            "results": results
         })
 
     except Error as e:
+        log.error("Database error in bulk transfer certificate decision: %s", e)
         return jsonify({"message": str(e)}), 500
 
 
 @app.route('/api/admin/transfer-certificates/<int:tc_id>', methods=['DELETE'])
+@auth.require_auth('admin')
 def admin_delete_transfer_certificate(tc_id):
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
+    try:
+        with get_connection() as connection:
+            # First, check if the certificate exists
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(
+                "SELECT * FROM transfer_certificates WHERE tc_id = %s",
+                (tc_id,)
+            )
+            certificate = cursor.fetchone()
+            
+            if not certificate:
+                cursor.close()
+                return jsonify({"message": "Transfer certificate not found"}), 404
+            
+            # Delete the certificate record from the database
+            cursor.execute(
+                "DELETE FROM transfer_certificates WHERE tc_id = %s",
+                (tc_id,)
+            )
+            publish_tc(cursor, 'tc.deleted', certificate['student_id'],
+                       {"tc_id": tc_id, "student_id": certificate['student_id']})
+            connection.commit()
+            cursor.close()
 
-    print(f"Admin deleting transfer certificate with ID: {tc_id}")
-    
+        dashboard_cache.invalidate()
+        student_cache.invalidate(certificate['student_id'], 'transfer_certificates')
+        search_index.refresh_destination(certificate['destination_school'])
+        
+        log.info("Transfer certificate %s deleted by admin", tc_id)
+        return jsonify({"message": "Transfer certificate deleted successfully"})
+
+    except Error as e:
+        log.error("Database error deleting transfer certificate: %s", e)
+        return jsonify({"message": str(e)}), 500
+
+
+# Schools endpoint
+@app.route('/api/admin/schools', methods=['GET'])
+@auth.require_auth('admin')
+def get_all_schools():
     try:
-        # First, check if the certificate exists
+        with get_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM schools ORDER BY name")
+
+            schools = cursor.fetchall()
+            cursor.close()
+
+        return jsonify({"schools": schools})
+
+    except Error as e:
+        return jsonify({"message": str(e)}), 500
+
+
+def load_dashboard_summary():
+    """ Compute the admin dashboard counts with aggregate queries """
+    with get_connection() as connection:
         cursor = connection.cursor(dictionary=True)
+
+        cursor.execute("SELECT COUNT(*) AS total FROM students")
+        total_students = cursor.fetchone()['total']
+
+        cursor.execute("SELECT COUNT(*) AS total FROM schools")
+        total_schools = cursor.fetchone()['total']
+
         cursor.execute(
-            "SELECT * FROM transfer_certificates WHERE tc_id = %s",
-            (tc_id,)
+            "SELECT status, COUNT(*) AS total FROM transfer_certificates GROUP BY status"
         )
-        certificate = cursor.fetchone()
-        
-        if not certificate:
-            return jsonify({"message": "Transfer certificate not found"}), 404
-        
-        # Delete the certificate record from the database
+        tc_by_status = {"pending": 0, "approved": 0, "rejected": 0}
+        for row in cursor.fetchall():
+            tc_by_status[row['status']] = row['total']
+
         cursor.execute(
-            "DELETE FROM transfer_certificates WHERE tc_id = %s",
-            (tc_id,)
+            """
+            SELECT s.current_school_id AS school_id, sch.name AS school_name, COUNT(*) AS student_count
+            FROM students s
+            LEFT JOIN schools sch ON s.current_school_id = sch.school_id
+            GROUP BY s.current_school_id, sch.name
+            ORDER BY student_count DESC
+            """
+        )
+        students_by_school = cursor.fetchall()
+
+        cursor.execute(
+            """
+            SELECT tc.tc_id, tc.student_id, s.name AS student_name, tc.destination_school,
+                   tc.application_date, tc.status
+            FROM transfer_certificates tc
+            JOIN students s ON tc.student_id = s.student_id
+            ORDER BY tc.application_date DESC, tc.tc_id DESC
+            LIMIT 5
+            """
         )
-        connection.commit()
+        recent_certificates = cursor.fetchall()
         cursor.close()
-        connection.close()
-        
-        print(f"Transfer certificate {tc_id} deleted successfully by admin")
-        return jsonify({"message": "Transfer certificate deleted successfully"})
+
+    return {
+        "totalStudents": total_students,
+        "totalSchools": total_schools,
+        "totalTransferCertificates": sum(tc_by_status.values()),
+        "transferCertificatesByStatus": tc_by_status,
+        "studentsBySchool": students_by_school,
+        "recentTransferCertificates": recent_certificates,
+        "generatedAt": datetime.datetime.now().isoformat(timespec='seconds')
+    }
+
+
+# Admin dashboard summary endpoint
+@app.route('/api/admin/dashboard/summary', methods=['GET'])
+@auth.require_auth('admin')
+def get_dashboard_summary():
+    try:
+        summary = dashboard_cache.get_or_load('summary', load_dashboard_summary)
+        return jsonify({"summary": summary})
 
     except Error as e:
-        print(f"Database error deleting transfer certificate: {str(e)}")
+        log.error("Error building dashboard summary: %s", e)
         return jsonify({"message": str(e)}), 500
 
 
-# Schools endpoint
-@app.route('/api/admin/schools', methods=['GET'])
-def get_all_schools():
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
+def cohort_params():
+    """ ``(standard, academic_year, school_id)`` from the query string """
+    standard = request.args.get('standard')
+    academic_year = request.args.get('academic_year')
+    if not standard or not academic_year:
+        raise PaginationError("standard and academic_year are required")
+    return standard, academic_year, parse_int(request.args.get('school_id'), 'school_id')
 
+
+# Admin cohort analytics: subject averages, percentiles and grade distributions
+@app.route('/api/admin/analytics/cohort', methods=['GET'])
+@auth.require_auth('admin')
+def get_cohort_analytics():
     try:
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM schools ORDER BY name")
+        standard, academic_year, school_id = cohort_params()
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
 
-        schools = cursor.fetchall()
-        cursor.close()
-        connection.close()
+    try:
+        cohort = analytics.cohort_cache.get(standard, academic_year, school_id)
+        return jsonify({"cohort": cohort.summary()})
+    except analytics.AnalyticsUnavailable as e:
+        return jsonify({"message": str(e)}), 503
+    except Error as e:
+        log.error("Error computing cohort analytics: %s", e)
+        return jsonify({"message": str(e)}), 500
 
-        return jsonify({"schools": schools})
 
+# Admin cohort ranking by average percentage, one page at a time
+@app.route('/api/admin/analytics/rankings', methods=['GET'])
+@auth.require_auth('admin')
+def get_cohort_rankings():
+    try:
+        standard, academic_year, school_id = cohort_params()
+        page_size = parse_page_size(request.args.get('limit'))
+        offset = parse_int(request.args.get('offset'), 'offset') or 0
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+    offset = max(offset, 0)
+
+    try:
+        cohort = analytics.cohort_cache.get(standard, academic_year, school_id)
+        ranking = cohort.ranking(offset, page_size)
+
+        # Names for this page only
+        if ranking:
+            with get_connection() as connection:
+                cursor = connection.cursor()
+                ids = [entry['student_id'] for entry in ranking]
+                cursor.execute(
+                    f"SELECT student_id, name FROM students WHERE student_id IN ({', '.join(['%s'] * len(ids))})",
+                    ids
+                )
+                names = dict(cursor.fetchall())
+                cursor.close()
+            for entry in ranking:
+                entry['name'] = names.get(entry['student_id'])
+
+        next_offset = offset + page_size if offset + page_size < len(cohort) else None
+        return jsonify({"rankings": rows_payload(ranking), "total": len(cohort), "nextOffset": next_offset,
+                        "computedAt": cohort.computed_at})
+    except analytics.AnalyticsUnavailable as e:
+        return jsonify({"message": str(e)}), 503
     except Error as e:
+        log.error("Error computing cohort rankings: %s", e)
+        return jsonify({"message": str(e)}), 500
+
+
+# Admin view of one student's standing in their standard and in their school
+@app.route('/api/admin/analytics/students/<int:student_id>', methods=['GET'])
+@auth.require_auth('admin')
+def get_student_rank(student_id):
+    try:
+        standard, academic_year, _ = cohort_params()
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+
+    try:
+        standard_cohort = analytics.cohort_cache.get(standard, academic_year)
+        standing = standard_cohort.student(student_id)
+        if standing is None:
+            return jsonify({"message": "Student has no records for this standard and year"}), 404
+
+        school_id = standard_cohort.school_of(student_id)
+        school_standing = None
+        if school_id is not None:
+            school_cohort = analytics.cohort_cache.get(standard, academic_year, school_id)
+            school_entry = school_cohort.student(student_id)
+            if school_entry is not None:
+                school_standing = {**school_entry, "cohortSize": len(school_cohort)}
+
+        return jsonify({
+            "standard": {**standing, "cohortSize": len(standard_cohort)},
+            "school": school_standing,
+        })
+    except analytics.AnalyticsUnavailable as e:
+        return jsonify({"message": str(e)}), 503
+    except Error as e:
+        log.error("Error computing student rank: %s", e)
+        return jsonify({"message": str(e)}), 500
+
+
+# Admin endpoint to get comprehensive details for many students at once
+@app.route('/api/admin/students/comprehensive', methods=['POST'])
+@auth.require_auth('admin')
+def get_students_comprehensive_batch():
+    data = request.get_json(silent=True) or {}
+    student_ids = data.get('studentIds')
+
+    if not isinstance(student_ids, list) or not student_ids:
+        return jsonify({"message": "studentIds must be a non-empty list"}), 400
+    try:
+        # De-duplicate while keeping the caller's order
+        student_ids = list(dict.fromkeys(int(student_id) for student_id in student_ids))
+    except (TypeError, ValueError):
+        return jsonify({"message": "studentIds must contain integers"}), 400
+    if len(student_ids) > COMPREHENSIVE_BATCH_LIMIT:
+        return jsonify({
+            "message": f"At most {COMPREHENSIVE_BATCH_LIMIT} students can be requested at once"
+        }), 400
+
+    try:
+        details = student_data.fetch_comprehensive_batch(student_ids)
+        missing = [student_id for student_id in student_ids if student_id not in details]
+
+        return jsonify({"students": {str(student_id): entry for student_id, entry in details.items()},
+                        "missing": missing})
+
+    except Error as e:
+        log.error("Error getting comprehensive details batch: %s", e)
         return jsonify({"message": str(e)}), 500
 
 
 # Admin endpoint to get a single student's comprehensive details
 @app.route('/api/admin/students/<int:student_id>/comprehensive', methods=['GET'])
+@auth.require_auth('admin')
 def get_student_comprehensive_details(student_id):
-    connection = create_connection()
-    if not connection:
-        return jsonify({"message": "Database connection error"}), 500
-        
     try:
-        cursor = connection.cursor(dictionary=True)
-        
-        # Get student profile
-        cursor.execute(
-            """
-            SELECT s.*, sch.name as school_name 
-            FROM students s 
-            LEFT JOIN schools sch ON s.current_school_id = sch.school_id 
-            WHERE s.student_id = %s
-            """, 
-            (student_id,)
-        )
-        student = cursor.fetchone()
-        
-        if not student:
+        details = student_data.fetch_comprehensive_batch([student_id]).get(student_id)
+
+        if not details:
             return jsonify({"message": "Student not found"}), 404
-            
-        # Remove password from response for security
-        if 'password' in student:
-            del student['password']
-        
-        # Get academic records for the student
-        academic_records = []
-        try:
-            cursor.execute(
-                """
-                SELECT record_id, student_id, school_standard, subject, marks, percentage, grade, 
-                       COALESCE(academic_year, '2024-2025') as academic_year
-                FROM academic_records
-                WHERE student_id = %s
-                ORDER BY school_standard DESC, subject ASC
-                """,
-                (student_id,)
-            )
-            academic_records = cursor.fetchall()
-            print(f"Found {len(academic_records)} academic records for student {student_id}")
-        except Error as e:
-            print(f"Error fetching academic records: {str(e)}")
-            # Continue with empty academic records instead of failing the whole request
-        
-        # Get schemes for the student
-        schemes = []
-        try:
-            cursor.execute(
-                """
-                SELECT sh.history_id, sh.student_id, sh.scheme_id, sh.start_date, sh.end_date, 
-                       sh.benefits, sh.details, s.name, s.description
-                FROM scheme_history sh
-                JOIN schemes s ON sh.scheme_id = s.scheme_id
-                WHERE sh.student_id = %s
-                ORDER BY sh.start_date DESC
-                """,
-                (student_id,)
-            )
-            schemes = cursor.fetchall()
-            print(f"Found {len(schemes)} schemes for student {student_id}")
-        except Error as e:
-            print(f"Error fetching schemes: {str(e)}")
-            # Continue with empty schemes instead of failing the whole request
-        
-        cursor.close()
-        connection.close()
-        
-        # Return the data, ensuring each item is serializable
-        result = {
-            "student": {k: (v.isoformat() if isinstance(v, datetime.date) else v) 
-                       for k, v in student.items()},
-            "academicRecords": [{k: (v.isoformat() if isinstance(v, datetime.date) else v) 
-                                for k, v in record.items()} 
-                               for record in academic_records],
-            "schemes": [{k: (v.isoformat() if isinstance(v, datetime.date) else v) 
-                        for k, v in scheme.items()} 
-                       for scheme in schemes]
-        }
-        
-        return jsonify(result)
-        
+
+        return jsonify(details)
+
     except Error as e:
-        print(f"Error getting comprehensive student details: {str(e)}")
+        log.error("Error getting comprehensive student details: %s", e)
         return jsonify({"message": str(e)}), 500
 
 
+def start_document_worker(processes):
+    """ Run `processing.py worker` as a child of the development server.
+
+    A separate script rather than a Dispatcher thread in here: its pool uses
+    spawn, and spawned children re-import the main script, which would set up
+    this whole app (and start another dispatcher) in every one of them.
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'processing.py')
+    worker = subprocess.Popen([sys.executable, script, 'worker', '--processes', str(processes)])
+    atexit.register(worker.terminate)
+    log.info("Started document worker (pid %d, %d processes)", worker.pid, processes)
+    return worker
+
+
 if __name__ == '__main__':
+    # With the reloader the script runs twice; only the outer, long-lived process starts the worker
+    if DOCUMENT_WORKERS > 0 and os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+        start_document_worker(DOCUMENT_WORKERS)
     app.run(debug=True)
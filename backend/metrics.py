@@ -0,0 +1,264 @@
+import bisect
+import functools
+import re
+import threading
+import time
+
+from flask import Response, g, request
+
+# Default latency buckets (seconds), as used by the Prometheus client libraries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+THROUGHPUT_BUCKETS = (1e4, 1e5, 1e6, 5e6, 1e7, 5e7, 1e8, 5e8, 1e9)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge:
+    """ Gauge set directly, or computed at scrape time from ``function`` """
+
+    def __init__(self, name, help_text, function=None):
+        self.name = name
+        self.help = help_text
+        self.function = function
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self._value -= amount
+
+    def render(self):
+        value = self.function() if self.function else self._value
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_number(value)}"]
+
+
+class Histogram:
+    """ Fixed-bucket histogram; observe() is a bisect and three additions under a lock """
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count)
+                        for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            label_text = _labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {_number(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request, by route template',
+    ('route', 'method', 'status')
+))
+requests_in_flight = registry.register(Gauge(
+    'http_requests_in_flight', 'Requests currently being handled'
+))
+query_duration = registry.register(Histogram(
+    'db_query_duration_seconds', 'Time spent in cursor.execute/executemany, by statement',
+    ('statement',), DB_BUCKETS
+))
+pool_wait = registry.register(Histogram(
+    'db_pool_wait_seconds', 'Time spent waiting to check out a pooled connection', (), DB_BUCKETS
+))
+upload_bytes = registry.register(Counter(
+    'document_upload_bytes_total', 'Bytes received in document uploads'
+))
+upload_throughput = registry.register(Histogram(
+    'document_upload_bytes_per_second', 'Per-upload storage throughput', (), THROUGHPUT_BUCKETS
+))
+
+
+_VERB_RE = re.compile(r'^\s*(\w+)')
+_TABLE_RE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE)\s+`?(\w+)', re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=1024)
+def statement_label(sql):
+    """ Low-cardinality label such as ``select academic_records`` for a SQL string """
+    verb = _VERB_RE.match(sql)
+    table = _TABLE_RE.search(sql)
+    verb = verb.group(1).lower() if verb else 'unknown'
+    return f"{verb} {table.group(1)}" if table else verb
+
+
+class InstrumentedCursor:
+    """ Cursor proxy that times execute() and executemany() """
+
+    __slots__ = ('_cursor',)
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            query_duration.observe(time.perf_counter() - started, statement_label(operation))
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            query_duration.observe(time.perf_counter() - started, statement_label(operation))
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """ Connection proxy whose cursors are InstrumentedCursors """
+
+    __slots__ = ('_connection',)
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def instrument_pool(pool):
+    """ Time queries on connections the pool opens from now on, and checkout waits """
+    pool.wrap_connection = InstrumentedConnection
+    pool.wait_observer = pool_wait.observe
+    registry.register(Gauge(
+        'db_pool_connections_in_use', 'Pooled connections checked out',
+        lambda: pool.stats()['in_use']
+    ))
+    registry.register(Gauge(
+        'db_pool_connections_open', 'Pooled connections open', lambda: pool.stats()['open']
+    ))
+
+
+def observe_upload(size, seconds):
+    upload_bytes.inc(size)
+    if seconds > 0:
+        upload_throughput.observe(size / seconds)
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    requests_in_flight.inc()
+
+
+def _after_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        requests_in_flight.dec()
+        rule = request.url_rule
+        request_duration.observe(
+            time.perf_counter() - started,
+            rule.rule if rule is not None else '<unmatched>',
+            request.method,
+            response.status_code
+        )
+    return response
+
+
+def _teardown_request(exc):
+    # after_request is skipped if a response could not be built at all
+    if g.pop('metrics_started', None) is not None:
+        requests_in_flight.dec()
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
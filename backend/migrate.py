@@ -0,0 +1,298 @@
+import hashlib
+import logging
+import os
+import re
+import time
+
+from mysql.connector import Error
+
+import analytics
+import schema
+import student_data
+import summary
+from db import get_connection
+
+log = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+_FILENAME_RE = re.compile(r'^(\d{4})_([A-Za-z0-9_-]+)\.sql$')
+
+# Serialises runners so two backend deploys never apply the same migration twice
+LOCK_NAME = 'onepass_schema_migrations'
+LOCK_TIMEOUT = 30
+
+
+class MigrationError(Exception):
+    pass
+
+
+class Migration:
+    """ One ``NNNN_name.sql`` file from the migrations directory """
+
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, 'rb') as fh:
+            self.source = fh.read()
+        self.checksum = hashlib.sha256(self.source).hexdigest()
+
+    def statements(self):
+        return split_statements(self.source.decode('utf-8'))
+
+    def __repr__(self):
+        return f"Migration({self.version:04d}_{self.name})"
+
+
+def split_statements(sql):
+    """ Split a script on top-level semicolons, skipping comments and quoted text """
+    statements = []
+    current = []
+    i = 0
+    quote = None
+    length = len(sql)
+    while i < length:
+        ch = sql[i]
+        if quote:
+            current.append(ch)
+            if ch == '\\' and quote != '`' and i + 1 < length:
+                current.append(sql[i + 1])
+                i += 2
+                continue
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"', '`'):
+            quote = ch
+            current.append(ch)
+        elif sql.startswith('--', i) or ch == '#':
+            newline = sql.find('\n', i)
+            i = length if newline == -1 else newline
+            continue
+        elif sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            i = length if end == -1 else end + 2
+            continue
+        elif ch == ';':
+            statement = ''.join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+        else:
+            current.append(ch)
+        i += 1
+    statement = ''.join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """ Migrations on disk, ordered by version """
+    migrations = []
+    seen = {}
+    for filename in sorted(os.listdir(directory)):
+        match = _FILENAME_RE.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in seen:
+            raise MigrationError(f"Duplicate migration version {version:04d}: {seen[version]} and {filename}")
+        seen[version] = filename
+        migrations.append(Migration(version, match.group(2), os.path.join(directory, filename)))
+    return migrations
+
+
+def ensure_version_table(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            execution_ms INT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+
+def applied_migrations(cursor):
+    """ ``{version: checksum}`` for every recorded migration """
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    return {version: checksum for version, checksum in cursor.fetchall()}
+
+
+def plan(migrations, applied):
+    """ Pending migrations, refusing to continue if an applied file was edited """
+    changed = [m for m in migrations if m.version in applied and applied[m.version] != m.checksum]
+    if changed:
+        names = ', '.join(os.path.basename(m.path) for m in changed)
+        raise MigrationError(
+            f"Applied migrations were modified after running: {names}. Add a new migration instead."
+        )
+    return [m for m in migrations if m.version not in applied]
+
+
+def _run_statement(cursor, statement):
+    cursor.execute(statement)
+    if cursor.with_rows:
+        cursor.fetchall()
+
+
+def migrate(directory=MIGRATIONS_DIR, target=None):
+    """ Apply pending migrations in order (up to ``target`` if given); returns those applied.
+
+    MySQL commits DDL implicitly, so a migration is not atomic: each one is
+    recorded only after all of its statements succeed, and migrations are
+    written to be safely re-runnable after a partial failure.
+    """
+    migrations = load_migrations(directory)
+    applied_now = []
+
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            cursor.close()
+            raise MigrationError("Another migration run holds the lock")
+        try:
+            ensure_version_table(cursor)
+            for migration in plan(migrations, applied_migrations(cursor)):
+                if target is not None and migration.version > target:
+                    break
+                started = time.perf_counter()
+                for statement in migration.statements():
+                    try:
+                        _run_statement(cursor, statement)
+                    except Error as e:
+                        raise MigrationError(f"{os.path.basename(migration.path)} failed: {e}") from e
+                elapsed_ms = int((time.perf_counter() - started) * 1000)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum, execution_ms) VALUES (%s, %s, %s, %s)",
+                    (migration.version, migration.name, migration.checksum, elapsed_ms)
+                )
+                connection.commit()
+                applied_now.append(migration)
+                log.info("Applied %s in %d ms", os.path.basename(migration.path), elapsed_ms)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchall()
+            cursor.close()
+
+    if applied_now:
+        # Running servers notice via the version check in schema.current()
+        schema.refresh()
+    return applied_now
+
+
+def status(directory=MIGRATIONS_DIR):
+    """ ``(migration, state)`` pairs where state is applied, pending or modified """
+    migrations = load_migrations(directory)
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        ensure_version_table(cursor)
+        applied = applied_migrations(cursor)
+        cursor.close()
+
+    result = []
+    for migration in migrations:
+        if migration.version not in applied:
+            state = 'pending'
+        elif applied[migration.version] != migration.checksum:
+            state = 'modified'
+        else:
+            state = 'applied'
+        result.append((migration, state))
+    return result
+
+
+def explain_checks():
+    """ Route queries and the index each should use, as ``(label, sql, params, table, index)``.
+
+    The SQL is taken from the modules that run it, so a changed query is
+    checked as it now reads rather than as it once did.
+    """
+    # main builds the Flask app on import; only the check command needs its queries
+    import main
+
+    checks = [
+        ("GET /api/students/:id/academic-records", student_data.ACADEMIC_RECORDS_SQL,
+         (1,), 'academic_records', 'idx_academic_records_student_standard_subject'),
+        ("GET /api/admin/analytics/cohort", analytics.COHORT_SQL,
+         ('10th', '2024-2025'), 'ar', 'idx_academic_records_standard_year'),
+        ("GET /api/students/:id/transfer-certificates", student_data.TRANSFER_CERTIFICATES_SQL,
+         (1,), 'tc', 'idx_tc_student_application_date'),
+        ("GET /api/students/:id/schemes", student_data.SCHEMES_SQL,
+         (1,), 'sh', 'idx_scheme_history_student_start_date'),
+        ("GET /api/students/:id/documents", student_data.DOCUMENTS_SQL,
+         (1,), 'documents', 'idx_documents_student_upload_date'),
+        ("GET /api/admin/students", *main.student_page_query(50, 'asc'), 's', 'PRIMARY'),
+        ("GET /api/admin/transfer-certificates", *main.transfer_certificate_page_query(50, 'desc'),
+         'tc', 'idx_tc_application_date_id'),
+        ("GET /api/admin/transfer-certificates?status=",
+         *main.transfer_certificate_page_query(50, 'desc', status='pending'),
+         'tc', 'idx_tc_status_application_date_id'),
+    ]
+    summary_sql = summary.summary_query(summary.STUDENT_WHERE)
+    if summary_sql is not None:
+        checks.insert(1, ("GET /api/students/:id/academic-summary", summary_sql,
+                          (1,), 'academic_summary', 'PRIMARY'))
+    return checks
+
+
+def explain_check():
+    """ EXPLAIN each route query; returns ``(label, ok, detail)`` triples.
+
+    A check passes when the expected index is chosen and MySQL does not
+    need a filesort. On a near-empty database the optimizer may prefer a
+    table scan, so run this against realistic data (see the benchmark
+    generator) before trusting a failure.
+    """
+    results = []
+    with get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        for label, sql, params, table, expected in explain_checks():
+            cursor.execute("EXPLAIN " + sql, params)
+            rows = cursor.fetchall()
+            row = next((r for r in rows if r.get('table') == table), None)
+            if row is None:
+                results.append((label, False, f"no plan row for table {table}"))
+                continue
+            extra = row.get('Extra') or ''
+            filesort = any('Using filesort' in (r.get('Extra') or '') for r in rows)
+            ok = row.get('key') == expected and not filesort
+            detail = f"key={row.get('key')} expected={expected} type={row.get('type')} extra={extra or '-'}"
+            if filesort:
+                detail += " (filesort)"
+            results.append((label, ok, detail))
+        cursor.close()
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Apply and inspect schema migrations")
+    parser.add_argument('command', nargs='?', default='up', choices=('up', 'status', 'check'))
+    parser.add_argument('--target', type=int, help="apply migrations up to and including this version")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    try:
+        if args.command == 'up':
+            applied = migrate(target=args.target)
+            print(f"{len(applied)} migration(s) applied" if applied else "Schema is up to date")
+        elif args.command == 'status':
+            for migration, state in status():
+                print(f"{state:9} {os.path.basename(migration.path)}")
+        else:
+            failures = 0
+            for label, ok, detail in explain_check():
+                failures += 0 if ok else 1
+                print(f"{'OK  ' if ok else 'FAIL'} {label}: {detail}")
+            sys.exit(1 if failures else 0)
+    except (MigrationError, Error) as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
@@ -0,0 +1,43 @@
+-- Content-addressed document storage
+-- Each distinct uploaded file is stored once under uploads/blobs/<ab>/<cd>/<sha256>
+-- and counted here; documents rows point at it through content_hash.
+
+CREATE TABLE IF NOT EXISTS document_blobs (
+    content_hash CHAR(64) PRIMARY KEY,
+    size BIGINT NOT NULL,
+    ref_count INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Add documents.file_path if this database predates it
+SET @column_exists = 0;
+SELECT COUNT(*) INTO @column_exists
+FROM INFORMATION_SCHEMA.COLUMNS
+WHERE TABLE_SCHEMA = DATABASE()
+AND TABLE_NAME = 'documents'
+AND COLUMN_NAME = 'file_path';
+
+SET @add_column_sql = IF(@column_exists = 0,
+                         'ALTER TABLE documents ADD COLUMN file_path VARCHAR(255) NULL AFTER file_name',
+                         'SELECT "Column file_path already exists"');
+PREPARE stmt FROM @add_column_sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Add documents.content_hash, indexed so blob reference lookups stay cheap
+SET @column_exists = 0;
+SELECT COUNT(*) INTO @column_exists
+FROM INFORMATION_SCHEMA.COLUMNS
+WHERE TABLE_SCHEMA = DATABASE()
+AND TABLE_NAME = 'documents'
+AND COLUMN_NAME = 'content_hash';
+
+SET @add_column_sql = IF(@column_exists = 0,
+                         'ALTER TABLE documents ADD COLUMN content_hash CHAR(64) NULL, ADD INDEX idx_documents_content_hash (content_hash)',
+                         'SELECT "Column content_hash already exists"');
+PREPARE stmt FROM @add_column_sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Existing flat uploads can then be moved into the blob store with:
+--   python storage.py migrate
@@ -0,0 +1,30 @@
+-- One academic record per (student, standard, subject, year)
+-- Bulk ingestion (ingest.py / POST /api/admin/academic-records/bulk-import) upserts
+-- against this key, so re-loading a term's marks updates rows instead of duplicating them.
+
+-- Older rows may have no academic_year; give them the same defaults as deduplicate_academic_records.sql
+UPDATE academic_records SET academic_year = '2024-2025' WHERE school_standard = '10th' AND (academic_year IS NULL OR academic_year = '');
+UPDATE academic_records SET academic_year = '2023-2024' WHERE school_standard = '9th' AND (academic_year IS NULL OR academic_year = '');
+
+-- Keep only the latest record for each key before the unique index can be built
+DELETE ar FROM academic_records ar
+JOIN academic_records newer ON
+    ar.student_id = newer.student_id AND
+    ar.school_standard = newer.school_standard AND
+    ar.subject = newer.subject AND
+    ar.academic_year = newer.academic_year AND
+    ar.record_id < newer.record_id;
+
+SET @index_exists = 0;
+SELECT COUNT(*) INTO @index_exists
+FROM INFORMATION_SCHEMA.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE()
+AND TABLE_NAME = 'academic_records'
+AND INDEX_NAME = 'uq_academic_records_student_subject_year';
+
+SET @add_index_sql = IF(@index_exists = 0,
+                        'ALTER TABLE academic_records ADD UNIQUE KEY uq_academic_records_student_subject_year (student_id, school_standard, subject, academic_year)',
+                        'SELECT "Index uq_academic_records_student_subject_year already exists"');
+PREPARE stmt FROM @add_index_sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
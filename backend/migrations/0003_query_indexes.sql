@@ -0,0 +1,94 @@
+-- Composite indexes matching the WHERE + ORDER BY of the hot read queries, so they
+-- are served in index order instead of a filesort. `python migrate.py check` EXPLAINs
+-- each route query against these.
+-- Every index is guarded so a partially applied run can simply be repeated.
+
+-- Student academic records: WHERE student_id ORDER BY school_standard DESC, subject
+SET @index_exists = 0;
+SELECT COUNT(*) INTO @index_exists
+FROM INFORMATION_SCHEMA.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE()
+AND TABLE_NAME = 'academic_records'
+AND INDEX_NAME = 'idx_academic_records_student_standard_subject';
+
+SET @add_index_sql = IF(@index_exists = 0,
+                        'ALTER TABLE academic_records ADD INDEX idx_academic_records_student_standard_subject (student_id, school_standard DESC, subject)',
+                        'SELECT "Index idx_academic_records_student_standard_subject already exists"');
+PREPARE stmt FROM @add_index_sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Student transfer certificates: WHERE student_id ORDER BY application_date DESC
+SET @index_exists = 0;
+SELECT COUNT(*) INTO @index_exists
+FROM INFORMATION_SCHEMA.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE()
+AND TABLE_NAME = 'transfer_certificates'
+AND INDEX_NAME = 'idx_tc_student_application_date';
+
+SET @add_index_sql = IF(@index_exists = 0,
+                        'ALTER TABLE transfer_certificates ADD INDEX idx_tc_student_application_date (student_id, application_date)',
+                        'SELECT "Index idx_tc_student_application_date already exists"');
+PREPARE stmt FROM @add_index_sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Admin transfer certificate list: keyset ORDER BY application_date, tc_id
+SET @index_exists = 0;
+SELECT COUNT(*) INTO @index_exists
+FROM INFORMATION_SCHEMA.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE()
+AND TABLE_NAME = 'transfer_certificates'
+AND INDEX_NAME = 'idx_tc_application_date_id';
+
+SET @add_index_sql = IF(@index_exists = 0,
+                        'ALTER TABLE transfer_certificates ADD INDEX idx_tc_application_date_id (application_date, tc_id)',
+                        'SELECT "Index idx_tc_application_date_id already exists"');
+PREPARE stmt FROM @add_index_sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Admin transfer certificate list filtered by status
+SET @index_exists = 0;
+SELECT COUNT(*) INTO @index_exists
+FROM INFORMATION_SCHEMA.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE()
+AND TABLE_NAME = 'transfer_certificates'
+AND INDEX_NAME = 'idx_tc_status_application_date_id';
+
+SET @add_index_sql = IF(@index_exists = 0,
+                        'ALTER TABLE transfer_certificates ADD INDEX idx_tc_status_application_date_id (status, application_date, tc_id)',
+                        'SELECT "Index idx_tc_status_application_date_id already exists"');
+PREPARE stmt FROM @add_index_sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Student schemes: WHERE student_id ORDER BY start_date DESC
+SET @index_exists = 0;
+SELECT COUNT(*) INTO @index_exists
+FROM INFORMATION_SCHEMA.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE()
+AND TABLE_NAME = 'scheme_history'
+AND INDEX_NAME = 'idx_scheme_history_student_start_date';
+
+SET @add_index_sql = IF(@index_exists = 0,
+                        'ALTER TABLE scheme_history ADD INDEX idx_scheme_history_student_start_date (student_id, start_date)',
+                        'SELECT "Index idx_scheme_history_student_start_date already exists"');
+PREPARE stmt FROM @add_index_sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Student documents: WHERE student_id ORDER BY upload_date DESC
+SET @index_exists = 0;
+SELECT COUNT(*) INTO @index_exists
+FROM INFORMATION_SCHEMA.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE()
+AND TABLE_NAME = 'documents'
+AND INDEX_NAME = 'idx_documents_student_upload_date';
+
+SET @add_index_sql = IF(@index_exists = 0,
+                        'ALTER TABLE documents ADD INDEX idx_documents_student_upload_date (student_id, upload_date)',
+                        'SELECT "Index idx_documents_student_upload_date already exists"');
+PREPARE stmt FROM @add_index_sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
@@ -0,0 +1,49 @@
+-- Per (student, standard, year) rollup of academic_records
+-- Kept current by summary.refresh_groups() inside every academic-record write
+-- transaction; `python summary.py rebuild` recomputes it from scratch.
+
+CREATE TABLE IF NOT EXISTS academic_summary (
+    student_id INT NOT NULL,
+    school_standard VARCHAR(20) NOT NULL,
+    academic_year VARCHAR(9) NOT NULL,
+    subject_count INT NOT NULL,
+    average_marks DECIMAL(5,2) NOT NULL,
+    average_percentage DECIMAL(5,2) NOT NULL,
+    best_subject VARCHAR(50) NOT NULL,
+    best_percentage DECIMAL(5,2) NOT NULL,
+    worst_subject VARCHAR(50) NOT NULL,
+    worst_percentage DECIMAL(5,2) NOT NULL,
+    grade_a_plus INT NOT NULL DEFAULT 0,
+    grade_a INT NOT NULL DEFAULT 0,
+    grade_b_plus INT NOT NULL DEFAULT 0,
+    grade_b INT NOT NULL DEFAULT 0,
+    grade_c INT NOT NULL DEFAULT 0,
+    grade_other INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (student_id, school_standard, academic_year),
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE
+);
+
+-- Backfill; the same aggregate as summary.SUMMARY_SELECT
+REPLACE INTO academic_summary
+    (student_id, school_standard, academic_year, subject_count, average_marks, average_percentage,
+     best_subject, best_percentage, worst_subject, worst_percentage,
+     grade_a_plus, grade_a, grade_b_plus, grade_b, grade_c, grade_other)
+SELECT
+    student_id, school_standard, academic_year,
+    COUNT(*),
+    ROUND(AVG(marks), 2),
+    ROUND(AVG(percentage), 2),
+    SUBSTRING_INDEX(GROUP_CONCAT(subject ORDER BY percentage DESC, subject SEPARATOR '\n'), '\n', 1),
+    MAX(percentage),
+    SUBSTRING_INDEX(GROUP_CONCAT(subject ORDER BY percentage ASC, subject SEPARATOR '\n'), '\n', 1),
+    MIN(percentage),
+    COUNT(CASE WHEN grade = 'A+' THEN 1 END),
+    COUNT(CASE WHEN grade = 'A' THEN 1 END),
+    COUNT(CASE WHEN grade = 'B+' THEN 1 END),
+    COUNT(CASE WHEN grade = 'B' THEN 1 END),
+    COUNT(CASE WHEN grade = 'C' THEN 1 END),
+    COUNT(CASE WHEN grade IS NULL OR grade NOT IN ('A+', 'A', 'B+', 'B', 'C') THEN 1 END)
+FROM academic_records
+WHERE academic_year IS NOT NULL
+GROUP BY student_id, school_standard, academic_year;
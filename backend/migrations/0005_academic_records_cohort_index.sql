@@ -0,0 +1,15 @@
+-- Covering index for cohort analytics (analytics.load_marks): every record of one
+-- standard and academic year, read without touching the table rows.
+SET @index_exists = 0;
+SELECT COUNT(*) INTO @index_exists
+FROM INFORMATION_SCHEMA.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE()
+AND TABLE_NAME = 'academic_records'
+AND INDEX_NAME = 'idx_academic_records_standard_year';
+
+SET @add_index_sql = IF(@index_exists = 0,
+                        'ALTER TABLE academic_records ADD INDEX idx_academic_records_standard_year (school_standard, academic_year, student_id, subject, percentage)',
+                        'SELECT "Index idx_academic_records_standard_year already exists"');
+PREPARE stmt FROM @add_index_sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
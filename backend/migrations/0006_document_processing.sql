@@ -0,0 +1,23 @@
+-- Post-processing queue for uploaded blobs, drained by `python processing.py worker`
+-- One row per distinct content: deduplicated uploads share the job and its previews.
+-- Thumbnails and extracted text are written next to the blob (<hash>.thumb.png, <hash>.txt).
+
+CREATE TABLE IF NOT EXISTS document_processing (
+    content_hash CHAR(64) PRIMARY KEY,
+    status ENUM('pending', 'processing', 'done', 'failed') NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    detected_type VARCHAR(100) NULL,
+    page_count INT NULL,
+    has_text BOOLEAN NOT NULL DEFAULT FALSE,
+    has_thumbnail BOOLEAN NOT NULL DEFAULT FALSE,
+    error VARCHAR(255) NULL,
+    locked_by VARCHAR(100) NULL,
+    locked_at DATETIME NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_document_processing_status_created (status, created_at)
+);
+
+-- Queue every blob uploaded before this migration
+INSERT IGNORE INTO document_processing (content_hash)
+SELECT content_hash FROM document_blobs;
@@ -0,0 +1,7 @@
+-- Room for salted password hashes (werkzeug's pbkdf2 hashes are about 102 characters,
+-- scrypt ones longer). onepass_db.sql created both columns as varchar(100), which
+-- rejects or truncates the hash written when a plaintext password is upgraded at login.
+-- Login only writes hashes once this migration is applied.
+
+ALTER TABLE students MODIFY password VARCHAR(255) NOT NULL;
+ALTER TABLE admins MODIFY password VARCHAR(255) NOT NULL;
@@ -0,0 +1,14 @@
+-- Outbox of transfer certificate changes for the server-sent event streams.
+-- Write routes insert a row in the same transaction as the change; every backend
+-- process polls the table by event_id and pushes new rows to its open streams,
+-- so a stream sees changes made through any worker. Rows are pruned after
+-- SSE_EVENT_RETENTION seconds.
+
+CREATE TABLE IF NOT EXISTS tc_events (
+    event_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(32) NOT NULL,
+    student_id INT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_tc_events_created (created_at)
+);
@@ -0,0 +1,90 @@
+import base64
+import datetime
+import json
+import os
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('ADMIN_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.environ.get('ADMIN_MAX_PAGE_SIZE', 500))
+
+
+class PaginationError(ValueError):
+    """ Raised for a malformed cursor, page size or filter value """
+
+
+def encode_cursor(values):
+    """ Pack the keyset position of the last row into an opaque URL-safe token """
+    raw = json.dumps(values, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, fields):
+    """ Unpack a cursor whose keyset values must include every one of ``fields`` (``'id'``, ``'date'``) """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+    if not isinstance(values, dict):
+        raise PaginationError("Invalid cursor")
+    # A missing or mistyped value would compare against NULL and quietly end the listing
+    for field in fields:
+        if not _valid_cursor_value(field, values.get(field)):
+            raise PaginationError("Invalid cursor")
+    return values
+
+
+def _valid_cursor_value(field, value):
+    if field == 'date':
+        try:
+            datetime.date.fromisoformat(value)
+        except (TypeError, ValueError):
+            return False
+        return True
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_page_size(value):
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    if size < 1:
+        raise PaginationError("limit must be positive")
+    return min(size, MAX_PAGE_SIZE)
+
+
+def parse_order(value, default):
+    order = (value or default).lower()
+    if order not in ('asc', 'desc'):
+        raise PaginationError("order must be 'asc' or 'desc'")
+    return order
+
+
+def parse_int(value, name):
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise PaginationError(f"{name} must be an integer")
+
+
+def parse_date(value, name):
+    if value in (None, ''):
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise PaginationError(f"{name} must be a date in YYYY-MM-DD format")
+
+
+def split_page(rows, page_size, cursor_for):
+    """ Trim the look-ahead row fetched with LIMIT page_size + 1 and build the next cursor """
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(cursor_for(rows[-1]))
@@ -0,0 +1,411 @@
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from mysql.connector import Error
+
+import schema
+from db import get_connection
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # Optional: PDF text extraction and exact page counts
+    PdfReader = None
+
+try:
+    from PIL import Image
+except ImportError:  # Optional: image thumbnails
+    Image = None
+
+log = logging.getLogger(__name__)
+
+THUMBNAIL_SUFFIX = '.thumb.png'
+TEXT_SUFFIX = '.txt'
+THUMBNAIL_SIZE = int(os.environ.get('DOCUMENT_THUMBNAIL_SIZE', 320))
+# A job claimed longer ago than this is assumed lost with its worker and handed out again
+LEASE_SECONDS = int(os.environ.get('DOCUMENT_PROCESSING_LEASE', 300))
+MAX_ATTEMPTS = 3
+TEXT_PAGES = 5
+MAX_TEXT_BYTES = 200_000
+PDFTOPPM = shutil.which('pdftoppm')  # poppler-utils; renders PDF thumbnails
+
+# Leading bytes of each accepted upload type
+MAGIC_NUMBERS = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/msword'),
+    # .docx is a zip container
+    (b'PK\x03\x04', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+)
+
+EXTENSION_TYPES = {
+    'pdf': 'application/pdf',
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'doc': 'application/msword',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+
+
+def sniff(head):
+    """ MIME type from a file's first bytes, or None if it is not an accepted type """
+    for magic, mimetype in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return mimetype
+    return None
+
+
+def type_matches(file_name, detected_type):
+    extension = file_name.rsplit('.', 1)[-1].lower() if '.' in file_name else ''
+    return EXTENSION_TYPES.get(extension) == detected_type
+
+
+# Work done in the pool's child processes. Everything here must be picklable
+# and must not touch the database: results go back to the dispatcher.
+
+def _replace_atomically(target, write):
+    """ Call ``write(tmp_path)`` and move the result into place """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.preview-')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def _write_bytes(data):
+    def write(tmp_path):
+        with open(tmp_path, 'wb') as fh:
+            fh.write(data)
+    return write
+
+
+def _pdf_details(path):
+    """ ``(page_count, text)``; text is None without pypdf or for an unreadable PDF """
+    if PdfReader is not None:
+        try:
+            reader = PdfReader(path)
+            text = '\n'.join((page.extract_text() or '') for page in reader.pages[:TEXT_PAGES])
+            return len(reader.pages), text
+        except Exception as e:  # pypdf raises many different errors on malformed files
+            log.info("pypdf could not read %s: %s", path, e)
+    # Rough count of page objects; good enough for display
+    with open(path, 'rb') as fh:
+        return len(re.findall(rb'/Type\s*/Page(?![s\w])', fh.read())) or None, None
+
+
+def _pdf_thumbnail(path, target):
+    if PDFTOPPM is None:
+        return False
+
+    def render(tmp_path):
+        # pdftoppm appends .png to the output prefix it is given
+        try:
+            subprocess.run(
+                [PDFTOPPM, '-png', '-singlefile', '-f', '1', '-l', '1', '-scale-to', str(THUMBNAIL_SIZE),
+                 path, tmp_path],
+                check=True, capture_output=True, timeout=60
+            )
+            os.replace(tmp_path + '.png', tmp_path)
+        finally:
+            if os.path.exists(tmp_path + '.png'):
+                os.unlink(tmp_path + '.png')
+
+    try:
+        _replace_atomically(target, render)
+    except (subprocess.SubprocessError, OSError) as e:
+        log.info("No thumbnail for %s: %s", path, e)
+        return False
+    return True
+
+
+def _image_thumbnail(path, target):
+    if Image is None:
+        return False
+
+    def render(tmp_path):
+        with Image.open(path) as image:
+            image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            if image.mode not in ('RGB', 'RGBA', 'L'):
+                image = image.convert('RGB')
+            image.save(tmp_path, format='PNG')
+
+    try:
+        _replace_atomically(target, render)
+    except OSError as e:  # Pillow's error for unreadable images too
+        log.info("No thumbnail for %s: %s", path, e)
+        return False
+    return True
+
+
+def process_file(path):
+    """ Inspect one blob and write its previews next to it; runs in a worker process """
+    with open(path, 'rb') as fh:
+        detected_type = sniff(fh.read(16))
+    result = {"detected_type": detected_type, "page_count": None, "has_text": False, "has_thumbnail": False}
+
+    if detected_type == 'application/pdf':
+        page_count, text = _pdf_details(path)
+        result["page_count"] = page_count
+        if text and text.strip():
+            encoded = text.encode('utf-8')[:MAX_TEXT_BYTES]
+            _replace_atomically(path + TEXT_SUFFIX, _write_bytes(encoded))
+            result["has_text"] = True
+        result["has_thumbnail"] = _pdf_thumbnail(path, path + THUMBNAIL_SUFFIX)
+    elif detected_type in ('image/png', 'image/jpeg'):
+        result["page_count"] = 1
+        result["has_thumbnail"] = _image_thumbnail(path, path + THUMBNAIL_SUFFIX)
+    return result
+
+
+# Queue operations, run by the web process and the dispatcher
+
+def available():
+    """ False until migration 0006 has created document_processing """
+    return schema.current().has_table('document_processing')
+
+
+def enqueue(cursor, content_hash):
+    """ Queue a blob for processing in the caller's transaction; a no-op if it already has a job """
+    if available():
+        cursor.execute("INSERT IGNORE INTO document_processing (content_hash) VALUES (%s)", (content_hash,))
+
+
+def forget(cursor, content_hash):
+    """ Drop the job of a blob that is being deleted """
+    if available():
+        cursor.execute("DELETE FROM document_processing WHERE content_hash = %s", (content_hash,))
+
+
+def statuses(content_hashes):
+    """ ``{content_hash: row}`` for the given blobs, read by primary key """
+    content_hashes = sorted(set(content_hashes))
+    if not content_hashes or not available():
+        return {}
+    with get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(
+            f"""
+            SELECT content_hash, status, detected_type, page_count, has_text, has_thumbnail
+            FROM document_processing
+            WHERE content_hash IN ({', '.join(['%s'] * len(content_hashes))})
+            """,
+            content_hashes
+        )
+        rows = {row['content_hash']: row for row in cursor.fetchall()}
+        cursor.close()
+    return rows
+
+
+def claim(connection, worker_id, limit):
+    """ Lease up to ``limit`` pending (or abandoned) jobs to this worker """
+    cursor = connection.cursor()
+    # A job whose lease ran out on its last attempt probably crashes the worker; stop retrying it
+    cursor.execute(
+        """
+        UPDATE document_processing
+        SET status = 'failed', error = 'worker did not finish', locked_by = NULL, locked_at = NULL
+        WHERE status = 'processing' AND locked_at < NOW() - INTERVAL %s SECOND AND attempts >= %s
+        """,
+        (LEASE_SECONDS, MAX_ATTEMPTS)
+    )
+    # SKIP LOCKED lets several dispatchers claim concurrently without waiting on each other
+    cursor.execute(
+        """
+        SELECT content_hash FROM document_processing
+        WHERE status = 'pending'
+           OR (status = 'processing' AND locked_at < NOW() - INTERVAL %s SECOND)
+        ORDER BY created_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+        """,
+        (LEASE_SECONDS, limit)
+    )
+    hashes = [row[0] for row in cursor.fetchall()]
+    if hashes:
+        cursor.execute(
+            f"""
+            UPDATE document_processing
+            SET status = 'processing', locked_by = %s, locked_at = NOW(), attempts = attempts + 1
+            WHERE content_hash IN ({', '.join(['%s'] * len(hashes))})
+            """,
+            [worker_id, *hashes]
+        )
+    connection.commit()
+    cursor.close()
+    return hashes
+
+
+# complete() and fail() only touch a job still leased to ``worker_id``: once a lease
+# has expired and the job was handed to another worker, the late result is dropped.
+# Both return False in that case.
+
+def complete(cursor, worker_id, content_hash, result):
+    cursor.execute(
+        """
+        UPDATE document_processing
+        SET status = 'done', detected_type = %s, page_count = %s, has_text = %s, has_thumbnail = %s,
+            error = NULL, locked_by = NULL, locked_at = NULL
+        WHERE content_hash = %s AND locked_by = %s AND status = 'processing'
+        """,
+        (result["detected_type"], result["page_count"], result["has_text"], result["has_thumbnail"],
+         content_hash, worker_id)
+    )
+    return cursor.rowcount > 0
+
+
+def fail(cursor, worker_id, content_hash, message, retry=True):
+    """ Record an error; the job goes back to pending until it has used MAX_ATTEMPTS """
+    cursor.execute(
+        """
+        UPDATE document_processing
+        SET status = IF(%s AND attempts < %s, 'pending', 'failed'), error = %s,
+            locked_by = NULL, locked_at = NULL
+        WHERE content_hash = %s AND locked_by = %s AND status = 'processing'
+        """,
+        (retry, MAX_ATTEMPTS, message[:255], content_hash, worker_id)
+    )
+    return cursor.rowcount > 0
+
+
+class Dispatcher:
+    """ Claims jobs from the table and runs them on a process pool.
+
+    Any number of dispatchers (on any host) can drain the same table; each
+    only records results for the jobs it still holds the lease on. No pooled
+    connection is held while the pool works: jobs are leased on one checkout
+    and each result is recorded on a short one of its own.
+    """
+
+    def __init__(self, blob_store, processes=None, poll_interval=2.0):
+        self.blob_store = blob_store
+        self.processes = processes or os.cpu_count() or 1
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+
+    def run_once(self, pool):
+        """ Process one claimed batch; returns the number of jobs handled """
+        with get_connection() as connection:
+            hashes = claim(connection, self.worker_id, self.processes * 2)
+        if not hashes:
+            return 0
+
+        futures = {}
+        missing = []
+        for content_hash in hashes:
+            path = self.blob_store.path_for(content_hash)
+            if os.path.exists(path):
+                futures[content_hash] = pool.submit(process_file, path)
+            else:
+                missing.append(content_hash)
+
+        for content_hash in missing:
+            self._record(content_hash, fail, "blob file is missing", retry=False)
+        # Record each job as it finishes, so finished work is visible while the rest still runs
+        pending = {future: content_hash for content_hash, future in futures.items()}
+        for future in as_completed(pending):
+            content_hash = pending[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                log.warning("Processing %s failed: %s", content_hash, e)
+                self._record(content_hash, fail, f"{type(e).__name__}: {e}")
+            else:
+                self._record(content_hash, complete, result)
+        log.info("Processed %d documents (%d missing)", len(hashes), len(missing))
+        return len(hashes)
+
+    def _record(self, content_hash, outcome, *args, **kwargs):
+        with get_connection() as connection:
+            cursor = connection.cursor()
+            recorded = outcome(cursor, self.worker_id, content_hash, *args, **kwargs)
+            connection.commit()
+            cursor.close()
+        if not recorded:
+            log.warning("Lease on %s expired before it finished; result dropped", content_hash)
+
+    def run(self, once=False):
+        # spawn, not fork: children must not inherit the parent's pooled MySQL connections
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.processes, mp_context=context) as pool:
+            while not self.stopping.is_set():
+                try:
+                    handled = self.run_once(pool)
+                except Error as e:
+                    log.error("Document processing queue error: %s", e)
+                    handled = 0
+                if once and not handled:
+                    break
+                if not handled:
+                    self.stopping.wait(self.poll_interval)
+
+
+def queue_status():
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT status, COUNT(*) FROM document_processing GROUP BY status")
+        counts = dict(cursor.fetchall())
+        cursor.close()
+    return counts
+
+
+def requeue(failed_only=True):
+    """ Put failed (or all) jobs back in the queue with fresh attempts """
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            "UPDATE document_processing SET status = 'pending', attempts = 0, error = NULL"
+            + (" WHERE status = 'failed'" if failed_only else "")
+        )
+        count = cursor.rowcount
+        connection.commit()
+        cursor.close()
+    return count
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    from storage import BlobStore
+
+    parser = argparse.ArgumentParser(description="Document post-processing queue")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    worker = subcommands.add_parser('worker', help="drain the queue")
+    worker.add_argument('--processes', type=int, help="worker processes (default: CPU count)")
+    worker.add_argument('--once', action='store_true', help="exit when the queue is empty")
+    subcommands.add_parser('status', help="jobs per status")
+    requeue_parser = subcommands.add_parser('requeue', help="retry failed jobs")
+    requeue_parser.add_argument('--all', action='store_true', help="reprocess every blob")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    schema.refresh()
+    if not available():
+        print("document_processing does not exist; run python migrate.py first")
+        sys.exit(1)
+
+    if args.command == 'worker':
+        upload_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+        dispatcher = Dispatcher(BlobStore(os.path.join(upload_folder, 'blobs')), args.processes)
+        try:
+            dispatcher.run(once=args.once)
+        except KeyboardInterrupt:
+            pass
+    elif args.command == 'status':
+        for status, count in sorted(queue_status().items()):
+            print(f"{status:12} {count}")
+    else:
+        print(f"Requeued {requeue(failed_only=not args.all)} jobs")
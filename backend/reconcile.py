@@ -0,0 +1,457 @@
+import datetime
+import heapq
+import itertools
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+
+from db import get_connection
+from storage import PREVIEW_SUFFIXES, TRASH_PREFIX, BlobStore, is_content_hash
+
+log = logging.getLogger(__name__)
+
+UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+QUARANTINE_DIR = 'quarantine'
+DEFAULT_CHECKPOINT = os.path.join(UPLOAD_FOLDER, '.reconcile-checkpoint.json')
+
+DEFAULT_BATCH = 1000
+# Files newer than this may belong to an upload or delete that is still in flight
+DEFAULT_MIN_AGE = 3600
+# Progress is saved this often, so an interrupted pass resumes close to where it stopped
+CHECKPOINT_INTERVAL = 1000
+# Legacy file names held in memory at once while sorting the uploads directory
+SORT_RUN_SIZE = 10000
+
+# In-progress writes from BlobStore and processing.py, and blobs a delete is removing; never reconciled
+TEMP_PREFIXES = ('.upload-', '.preview-', TRASH_PREFIX)
+
+# Blob hashes on disk and in the database first, then flat pre-blob-store uploads
+PHASES = ('blobs', 'legacy')
+
+
+def merge_sorted(on_disk, in_db):
+    """ Full outer join of two key-ordered ``(key, value)`` streams.
+
+    Yields ``(key, disk value or None, database value or None)``; only the
+    current item of each stream is held in memory.
+    """
+    on_disk, in_db = iter(on_disk), iter(in_db)
+    disk_item = next(on_disk, None)
+    db_item = next(in_db, None)
+    while disk_item is not None or db_item is not None:
+        if db_item is None or (disk_item is not None and disk_item[0] < db_item[0]):
+            yield disk_item[0], disk_item[1], None
+            disk_item = next(on_disk, None)
+        elif disk_item is None or db_item[0] < disk_item[0]:
+            yield db_item[0], None, db_item[1]
+            db_item = next(in_db, None)
+        else:
+            yield disk_item[0], disk_item[1], db_item[1]
+            disk_item = next(on_disk, None)
+            db_item = next(in_db, None)
+
+
+def external_sorted(names, run_size=SORT_RUN_SIZE):
+    """ Sort strings that may not fit in memory: sorted runs are spilled to temp files and merged """
+    runs = []
+    try:
+        while True:
+            chunk = sorted(itertools.islice(names, run_size))
+            if not chunk:
+                break
+            if len(chunk) < run_size and not runs:
+                # Everything fitted in one run; no need to touch the disk
+                yield from chunk
+                return
+            fd, run_path = tempfile.mkstemp(prefix='reconcile-run-', suffix='.jsonl')
+            runs.append(run_path)
+            with os.fdopen(fd, 'w', encoding='utf-8') as run:
+                run.writelines(json.dumps(name) + '\n' for name in chunk)
+
+        files = [open(run_path, encoding='utf-8') for run_path in runs]
+        try:
+            yield from heapq.merge(*((json.loads(line) for line in fh) for fh in files))
+        finally:
+            for fh in files:
+                fh.close()
+    finally:
+        for run_path in runs:
+            os.unlink(run_path)
+
+
+def _sorted_shards(path):
+    """ Two-hex-digit shard directories below ``path``, in order """
+    try:
+        names = [entry.name for entry in os.scandir(path)
+                 if entry.is_dir(follow_symlinks=False) and len(entry.name) == 2]
+    except FileNotFoundError:
+        return []
+    return sorted(name for name in names if re.fullmatch('[0-9a-f]{2}', name))
+
+
+def _blob_key(name):
+    """ Content hash a file in a shard directory belongs to (the blob or one of its previews) """
+    for suffix in ('',) + PREVIEW_SUFFIXES:
+        if name.endswith(suffix) and is_content_hash(name[:len(name) - len(suffix)]):
+            return name[:len(name) - len(suffix)]
+    return None
+
+
+def iter_blob_files(store, after='', unexpected=None):
+    """ ``(content_hash, [relative paths])`` for every hash with files under the blob store.
+
+    Walking the ``ab/cd`` shards in order yields hashes in sorted order while
+    listing one leaf directory at a time. Temp files are skipped; anything
+    else that is not a blob or a preview is passed to ``unexpected``.
+    """
+    for first in _sorted_shards(store.root):
+        if first < after[:2]:
+            continue
+        for second in _sorted_shards(os.path.join(store.root, first)):
+            if first + second < after[:4]:
+                continue
+            groups = {}
+            for entry in os.scandir(os.path.join(store.root, first, second)):
+                if entry.name.startswith(TEMP_PREFIXES):
+                    continue
+                relative = '/'.join(['blobs', first, second, entry.name])
+                content_hash = _blob_key(entry.name) if entry.is_file(follow_symlinks=False) else None
+                if content_hash is None or content_hash[:4] != first + second:
+                    if unexpected:
+                        unexpected(relative)
+                    continue
+                groups.setdefault(content_hash, []).append(relative)
+            for content_hash in sorted(groups):
+                if content_hash > after:
+                    yield content_hash, sorted(groups[content_hash])
+
+
+def iter_blob_rows(cursor, after='', batch_size=DEFAULT_BATCH):
+    """ ``(content_hash, (ref_count, documents))`` for every hash the database knows, in order.
+
+    A hash is known through a document_blobs row, a documents row, or both;
+    ref_count is None when it has no document_blobs row. Keyset pages over the
+    two content_hash indexes, so only ``batch_size`` hashes are held at once.
+    """
+    while True:
+        cursor.execute(
+            """
+            SELECT content_hash FROM (
+                (SELECT content_hash FROM document_blobs
+                 WHERE content_hash > %s ORDER BY content_hash LIMIT %s)
+                UNION
+                (SELECT DISTINCT content_hash FROM documents
+                 WHERE content_hash > %s ORDER BY content_hash LIMIT %s)
+            ) known
+            ORDER BY content_hash
+            LIMIT %s
+            """,
+            (after, batch_size, after, batch_size, batch_size)
+        )
+        hashes = [row[0] for row in cursor.fetchall()]
+        if not hashes:
+            return
+        placeholders = ', '.join(['%s'] * len(hashes))
+        cursor.execute(
+            f"SELECT content_hash, ref_count FROM document_blobs WHERE content_hash IN ({placeholders})",
+            hashes
+        )
+        ref_counts = dict(cursor.fetchall())
+        cursor.execute(
+            f"""
+            SELECT content_hash, COUNT(*) FROM documents
+            WHERE content_hash IN ({placeholders})
+            GROUP BY content_hash
+            """,
+            hashes
+        )
+        documents = dict(cursor.fetchall())
+
+        for content_hash in hashes:
+            yield content_hash, (ref_counts.get(content_hash), documents.get(content_hash, 0))
+        if len(hashes) < batch_size:
+            return
+        after = hashes[-1]
+
+
+def iter_legacy_files(upload_folder, after=''):
+    """ ``(file name, [file name])`` for flat uploads directly in ``upload_folder``, sorted by name """
+    def names():
+        for entry in os.scandir(upload_folder):
+            if entry.name.startswith('.') or not entry.is_file(follow_symlinks=False):
+                continue
+            if entry.name > after:
+                yield entry.name
+
+    for name in external_sorted(names()):
+        yield name, [name]
+
+
+def iter_legacy_rows(cursor, after='', batch_size=DEFAULT_BATCH):
+    """ ``(file_name, [(document_id, student_id)])`` for documents not yet in the blob store.
+
+    Ordered by BINARY file_name so the database sorts exactly like Python
+    compares the names read from disk.
+    """
+    def rows():
+        last = None
+        while True:
+            if last is None:
+                condition, params = "BINARY file_name > %s", [after]
+            else:
+                condition, params = "(BINARY file_name, document_id) > (%s, %s)", list(last)
+            cursor.execute(
+                f"""
+                SELECT file_name, document_id, student_id FROM documents
+                WHERE content_hash IS NULL AND {condition}
+                ORDER BY BINARY file_name, document_id
+                LIMIT %s
+                """,
+                params + [batch_size]
+            )
+            page = cursor.fetchall()
+            yield from page
+            if len(page) < batch_size:
+                return
+            last = (page[-1][0], page[-1][1])
+
+    for file_name, group in itertools.groupby(rows(), key=lambda row: row[0]):
+        yield file_name, [(document_id, student_id) for _, document_id, student_id in group]
+
+
+class Reconciler:
+    """ Finds drift between the uploads directory and the documents tables.
+
+    Each phase merges a sorted walk of the files with a sorted keyset scan of
+    the rows, so memory stays flat however many documents there are. Findings:
+
+    - ``orphan_blob`` / ``orphan_file``: files no row refers to. Quarantined
+      (moved under ``uploads/quarantine/<pass>/``) when ``quarantine`` is set.
+    - ``missing_blob`` / ``missing_file``: rows whose file is gone. Only
+      reported; deleting rows is left to an admin.
+    - ``refcount_drift``: document_blobs.ref_count differs from the number
+      of documents using the blob; ``unreferenced_blob`` when that number is 0.
+    - ``unexpected``: files in the blob store that are neither blobs nor previews.
+
+    Progress is saved to a checkpoint file, so a pass can be spread over
+    several runs with ``limit``. A dry run changes nothing, not even the
+    checkpoint.
+    """
+
+    def __init__(self, upload_folder=UPLOAD_FOLDER, checkpoint_path=DEFAULT_CHECKPOINT,
+                 quarantine=False, dry_run=False, min_age=DEFAULT_MIN_AGE,
+                 batch_size=DEFAULT_BATCH, on_finding=None):
+        self.upload_folder = upload_folder
+        self.store = BlobStore(os.path.join(upload_folder, 'blobs'))
+        self.checkpoint_path = checkpoint_path
+        self.quarantine = quarantine
+        self.dry_run = dry_run
+        self.min_age = min_age
+        self.batch_size = batch_size
+        self.on_finding = on_finding
+
+    # Checkpoints
+
+    def new_state(self):
+        return {
+            "pass": datetime.datetime.now().strftime('%Y%m%d-%H%M%S'),
+            "phase": PHASES[0],
+            "after": '',
+            "counts": {},
+        }
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return self.new_state()
+
+    def save_checkpoint(self, state):
+        if self.dry_run:
+            return
+        directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.reconcile-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+            json.dump(state, fh)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def clear_checkpoint(self):
+        if self.dry_run:
+            return
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
+
+    # Running a pass
+
+    def run(self, limit=None, restart=False):
+        """ Reconcile up to ``limit`` keys (all if None); returns ``(state, complete)`` """
+        if restart:
+            self.clear_checkpoint()
+        state = self.new_state() if restart else self.load_checkpoint()
+        processed = 0
+        with get_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                while state['phase'] is not None:
+                    for key, on_disk, in_db in self._merge(cursor, state):
+                        self._reconcile(state, key, on_disk, in_db)
+                        state['after'] = key
+                        processed += 1
+                        if limit is not None and processed >= limit:
+                            self.save_checkpoint(state)
+                            return state, False
+                        if processed % CHECKPOINT_INTERVAL == 0:
+                            self.save_checkpoint(state)
+                    following = PHASES.index(state['phase']) + 1
+                    state['phase'] = PHASES[following] if following < len(PHASES) else None
+                    state['after'] = ''
+                    self.save_checkpoint(state)
+            finally:
+                # Reads only; keeps the pooled connection from holding a snapshot
+                connection.rollback()
+                cursor.close()
+        self.clear_checkpoint()
+        return state, True
+
+    def _merge(self, cursor, state):
+        after = state['after']
+        if state['phase'] == 'blobs':
+            def unexpected(relative):
+                self._report(state, 'unexpected', relative)
+            return merge_sorted(iter_blob_files(self.store, after, unexpected),
+                                iter_blob_rows(cursor, after, self.batch_size))
+        return merge_sorted(iter_legacy_files(self.upload_folder, after),
+                            iter_legacy_rows(cursor, after, self.batch_size))
+
+    def _reconcile(self, state, key, on_disk, in_db):
+        if state['phase'] == 'blobs':
+            if in_db is None:
+                self._orphan(state, 'orphan_blob', key, on_disk)
+                return
+            ref_count, documents = in_db
+            if self.store.exists(key):
+                if documents == 0:
+                    self._report(state, 'unreferenced_blob', f"{key} ref_count={ref_count}")
+                elif ref_count != documents:
+                    self._report(state, 'refcount_drift',
+                                 f"{key} ref_count={ref_count} documents={documents}")
+            elif documents or ref_count:
+                self._report(state, 'missing_blob',
+                             f"{key} ref_count={ref_count} documents={documents}")
+            return
+
+        if in_db is None:
+            self._orphan(state, 'orphan_file', key, on_disk)
+        elif on_disk is None:
+            for document_id, student_id in in_db:
+                self._report(state, 'missing_file', f"document {document_id} (student {student_id}) {key}")
+
+    def _orphan(self, state, kind, key, relatives):
+        paths = [os.path.join(self.upload_folder, relative) for relative in relatives]
+        try:
+            newest = max(os.path.getmtime(path) for path in paths)
+        except FileNotFoundError:
+            # Removed since the directory was listed
+            return
+        if time.time() - newest < self.min_age:
+            self._count(state, 'recent')
+            return
+
+        action = ''
+        if self.quarantine:
+            action = ' (would quarantine)' if self.dry_run else ' (quarantined)'
+            if kind == 'orphan_blob':
+                if not self._quarantine_blob(state, key, relatives):
+                    # A deduplicated upload claimed it after the scan read this hash
+                    return
+            elif not self.dry_run:
+                self._move_to_quarantine(state, relatives)
+        self._report(state, kind, ', '.join(relatives) + action)
+
+    def _quarantine_blob(self, state, content_hash, relatives):
+        """ Move an orphan blob aside unless it has been referenced since the scan; False if it has.
+
+        The scan's snapshot is stale by now, so this uses a transaction of its
+        own. Locking the document_blobs row (or the gap where it would go) makes
+        a concurrent upload of the same content wait in add_reference() until
+        the files are moved; it then finds the blob missing and writes it again.
+        """
+        with get_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(
+                    "SELECT ref_count FROM document_blobs WHERE content_hash = %s FOR UPDATE",
+                    (content_hash,)
+                )
+                referenced = cursor.fetchone() is not None
+                if not referenced:
+                    cursor.execute("SELECT 1 FROM documents WHERE content_hash = %s LIMIT 1", (content_hash,))
+                    referenced = cursor.fetchone() is not None
+                if not referenced and not self.dry_run:
+                    self._move_to_quarantine(state, relatives)
+            finally:
+                # Nothing was written; ending the transaction releases the lock
+                connection.rollback()
+                cursor.close()
+        return not referenced
+
+    def _move_to_quarantine(self, state, relatives):
+        """ Move files under quarantine/<pass>/, keeping their relative paths so they can be put back """
+        for relative in relatives:
+            target = os.path.join(self.upload_folder, QUARANTINE_DIR, state['pass'], relative)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(os.path.join(self.upload_folder, relative), target)
+            log.info("Quarantined %s", relative)
+
+    def _count(self, state, kind):
+        state['counts'][kind] = state['counts'].get(kind, 0) + 1
+
+    def _report(self, state, kind, detail):
+        self._count(state, kind)
+        if self.on_finding:
+            self.on_finding(kind, detail)
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    from mysql.connector import Error
+
+    parser = argparse.ArgumentParser(
+        description="Reconcile the uploads directory with the documents and document_blobs tables"
+    )
+    parser.add_argument('--quarantine', action='store_true',
+                        help="move orphan files to uploads/quarantine/ instead of only reporting them")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="report what would be done without moving files or saving a checkpoint")
+    parser.add_argument('--limit', type=int, help="stop after this many entries; the next run resumes")
+    parser.add_argument('--min-age', type=float, default=DEFAULT_MIN_AGE,
+                        help="seconds a file must be untouched before it counts as an orphan")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH, help="rows per database page")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help="checkpoint file")
+    parser.add_argument('--restart', action='store_true', help="discard the checkpoint and start a new pass")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(name)s: %(message)s')
+    reconciler = Reconciler(checkpoint_path=args.checkpoint, quarantine=args.quarantine,
+                            dry_run=args.dry_run, min_age=args.min_age, batch_size=args.batch_size,
+                            on_finding=lambda kind, detail: print(f"{kind:<15} {detail}"))
+    try:
+        state, complete = reconciler.run(args.limit, restart=args.restart)
+    except Error as e:
+        print(f"Reconcile failed: {e}")
+        sys.exit(1)
+
+    counts = ', '.join(f"{kind}={count}" for kind, count in sorted(state['counts'].items())) or 'no findings'
+    if complete:
+        print(f"Pass {state['pass']} complete: {counts}")
+    else:
+        print(f"Pass {state['pass']} paused in {state['phase']} after {state['after']!r}: {counts}")
+        print("Run again to continue")
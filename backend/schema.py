@@ -0,0 +1,128 @@
+import logging
+import os
+import threading
+import time
+
+from mysql.connector import Error
+
+from db import pool
+
+log = logging.getLogger(__name__)
+
+# How often a running server checks whether a migration has changed the schema
+RECHECK_INTERVAL = float(os.environ.get('SCHEMA_RECHECK_INTERVAL', 60))
+
+
+class Schema:
+    """ Snapshot of the tables and columns present in the connected database.
+
+    Older deployments are missing columns added over time (documents.file_path,
+    academic_records.academic_year, scheme_history.benefits/details), so routes
+    ask this descriptor which statement to run instead of trying one and
+    catching "Unknown column".
+    """
+
+    def __init__(self, columns, version=None):
+        self._columns = {table: frozenset(names) for table, names in columns.items()}
+        self.tables = frozenset(self._columns)
+        self.version = version
+
+    def has_table(self, table):
+        return table in self._columns
+
+    def has_column(self, table, column):
+        return column in self._columns.get(table, ())
+
+    def columns(self, table):
+        return self._columns.get(table, frozenset())
+
+    def describe(self):
+        return {
+            "migrationVersion": self.version,
+            "tables": {table: sorted(names) for table, names in sorted(self._columns.items())},
+        }
+
+
+def _migration_version(cursor, tables):
+    if 'schema_migrations' not in tables:
+        return None
+    cursor.execute("SELECT MAX(version) FROM schema_migrations")
+    return cursor.fetchone()[0]
+
+
+def probe():
+    """ Read INFORMATION_SCHEMA once and build a Schema """
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            """
+            SELECT table_name, column_name
+            FROM information_schema.columns
+            WHERE table_schema = DATABASE()
+            """
+        )
+        columns = {}
+        for table, column in cursor.fetchall():
+            columns.setdefault(table, set()).add(column)
+        version = _migration_version(cursor, columns)
+        cursor.close()
+    return Schema(columns, version)
+
+
+_lock = threading.Lock()
+_schema = None
+_checked_at = 0.0
+
+
+def refresh():
+    """ Re-probe the database now; migrate.py calls this after applying migrations """
+    global _schema, _checked_at
+    schema = probe()
+    with _lock:
+        _schema = schema
+        _checked_at = time.monotonic()
+    return schema
+
+
+def current():
+    """ The cached Schema, probed on first use.
+
+    Every RECHECK_INTERVAL seconds one caller starts a background check that
+    compares the recorded migration version with the database's and re-probes
+    if a migration has run since. Callers often hold a pooled connection, so
+    they never wait for that check (or a second connection); they keep the
+    current snapshot until the new one is in place.
+    """
+    global _checked_at
+    with _lock:
+        schema = _schema
+        due = schema is not None and time.monotonic() - _checked_at >= RECHECK_INTERVAL
+        if due:
+            _checked_at = time.monotonic()  # Other threads keep the old snapshot meanwhile
+    if schema is None:
+        return refresh()
+    if due:
+        threading.Thread(target=_recheck, args=(schema,), name='schema-recheck', daemon=True).start()
+    return schema
+
+
+def _recheck(schema):
+    """ Re-probe if a migration has changed the database since ``schema`` was taken """
+    try:
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            if schema.has_table('schema_migrations'):
+                version = _migration_version(cursor, schema.tables)
+            else:
+                # First migration run creates the version table
+                cursor.execute(
+                    "SELECT COUNT(*) FROM information_schema.tables "
+                    "WHERE table_schema = DATABASE() AND table_name = 'schema_migrations'"
+                )
+                version = -1 if cursor.fetchone()[0] else None
+            cursor.close()
+        if version != schema.version:
+            refresh()
+    except Error as e:
+        # Keep serving the current snapshot; the next interval retries
+        log.warning("Schema recheck failed: %s", e)
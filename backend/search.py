@@ -0,0 +1,307 @@
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from mysql.connector import Error
+
+from cache import LRUCache
+from db import get_connection
+
+log = logging.getLogger(__name__)
+
+SEARCH_TYPES = ('student', 'school', 'destination')
+DEFAULT_LIMIT = 10
+MAX_LIMIT = int(os.environ.get('SEARCH_MAX_RESULTS', 25))
+# Longer queries are cut; a typeahead never needs more and it bounds the lookup cost
+MAX_QUERY_LENGTH = 64
+# Share of the query's trigrams a result must contain
+MIN_SCORE = float(os.environ.get('SEARCH_MIN_SCORE', 0.5))
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    """ Lowercase words separated by single spaces """
+    return _NON_WORD.sub(' ', (text or '').lower()).strip()
+
+
+def trigrams(text):
+    """ Trigrams of each word, padded like pg_trgm so word starts weigh more ("  a", " ab", "abc", "bc ") """
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """ Inverted index from trigrams to entries, each entry a key plus a result payload.
+
+    Lookups count, per entry, how many of the query's trigrams it contains;
+    entries are ranked by the share of the query they cover, then by how
+    little else they contain, so "aay" prefers "Aayan" over "Aayushmaan Kumar".
+    Only entries sharing at least MIN_SCORE of the query can match, so only the
+    rarest postings are scanned to find candidates; the common ones (" 98" in
+    every phone number) are merely intersected with them.
+    Not thread-safe; SearchIndex serialises access.
+    """
+
+    def __init__(self):
+        self._postings = defaultdict(set)
+        self._entries = {}
+        self._sizes = {}
+        self._ids = {}
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, key, texts, payload):
+        self.remove(key)
+        grams = frozenset().union(*(trigrams(text) for text in texts))
+        if not grams:
+            return
+        entry_id = self._next_id
+        self._next_id += 1
+        self._ids[key] = entry_id
+        self._entries[entry_id] = (key, grams, payload)
+        self._sizes[entry_id] = len(grams)
+        for gram in grams:
+            self._postings[gram].add(entry_id)
+
+    def remove(self, key):
+        entry_id = self._ids.pop(key, None)
+        if entry_id is None:
+            return
+        _, grams, _ = self._entries.pop(entry_id)
+        del self._sizes[entry_id]
+        for gram in grams:
+            posting = self._postings[gram]
+            posting.discard(entry_id)
+            if not posting:
+                del self._postings[gram]
+
+    def search(self, query, limit, types=None):
+        grams = trigrams(query[:MAX_QUERY_LENGTH])
+        if not grams:
+            return []
+        needed = max(1, math.ceil(MIN_SCORE * len(grams)))
+        postings = sorted((self._postings.get(gram, frozenset()) for gram in grams), key=len)
+        # An entry missing from all of the rarest len - needed + 1 postings cannot reach `needed`
+        split = len(grams) - needed + 1
+        counts = Counter()
+        for posting in postings[:split]:
+            counts.update(posting)
+        for posting in postings[split:]:
+            counts.update(posting.intersection(counts))
+
+        # Walk down the match counts, keeping whole tie groups until `limit` results are certain
+        ranked = sorted(counts.items(), key=itemgetter(1), reverse=True)
+        results = []
+        position = 0
+        while position < len(ranked) and len(results) < limit:
+            shared = ranked[position][1]
+            if shared < needed:
+                break
+            end = position
+            while end < len(ranked) and ranked[end][1] == shared:
+                end += 1
+            tied = [entry_id for entry_id, _ in ranked[position:end]
+                    if types is None or self._entries[entry_id][0][0] in types]
+            # Equal matches: the entry with the fewest other trigrams is the closer one
+            tied.sort(key=self._sizes.__getitem__)
+            for entry_id in tied[:limit - len(results)]:
+                payload = dict(self._entries[entry_id][2])
+                payload["score"] = round(shared / len(grams) * 0.8 + shared / self._sizes[entry_id] * 0.2, 3)
+                results.append(payload)
+            position = end
+        return results
+
+
+def load_index():
+    """ A fresh index over students, schools and TC destination schools """
+    index = TrigramIndex()
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT student_id, name, username, contact_info FROM students")
+        for student_id, name, username, contact_info in cursor:
+            _add_student(index, student_id, name, username, contact_info)
+        cursor.execute("SELECT school_id, name FROM schools")
+        for school_id, name in cursor:
+            _add_school(index, school_id, name)
+        cursor.execute(
+            "SELECT destination_school, COUNT(*) FROM transfer_certificates GROUP BY destination_school"
+        )
+        for destination, count in cursor:
+            _set_destination(index, destination, count)
+        cursor.close()
+    return index
+
+
+def _add_student(index, student_id, name, username, contact_info):
+    index.add(('student', student_id), (name, username, contact_info), {
+        "type": "student", "id": student_id, "name": name, "username": username,
+    })
+
+
+def _add_school(index, school_id, name):
+    index.add(('school', school_id), (name,), {"type": "school", "id": school_id, "name": name})
+
+
+def _set_destination(index, destination, count):
+    # Grouped case-insensitively, as MySQL's collation groups and counts them
+    key = ('destination', destination.lower())
+    if count:
+        index.add(key, (destination,), {"type": "destination", "name": destination, "count": count})
+    else:
+        index.remove(key)
+
+
+class SearchIndex:
+    """ Process-wide search index, built on first use.
+
+    Write routes call refresh_student() / refresh_destination() after their
+    commit; each re-reads one row or count, so replaying it is harmless. Writes
+    from other processes (other workers, the CLIs) are picked up by a background
+    rebuild once the index is ``ttl`` seconds old; changes made while that rebuild
+    runs are replayed onto the new index before it replaces the old one.
+
+    Typeahead sends the same prefixes over and over, so results are also kept
+    in a small LRU keyed by the index generation, which every change bumps.
+    """
+
+    def __init__(self, ttl, cache_size):
+        self.ttl = ttl
+        self._results = LRUCache(cache_size)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._index = None
+        self._built_at = 0.0
+        self._build_ms = None
+        self._rebuilding = False
+        self._pending = []
+        self.searches = 0
+        self.cache_hits = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(float(os.environ.get('SEARCH_INDEX_TTL', 300)),
+                   int(os.environ.get('SEARCH_CACHE_SIZE', 1024)))
+
+    def search(self, query, limit=DEFAULT_LIMIT, types=None):
+        if self._index is None:
+            self.rebuild()
+        elif time.monotonic() - self._built_at > self.ttl and not self._rebuilding:
+            threading.Thread(target=self._rebuild_quietly, name='search-index', daemon=True).start()
+        key = (self._generation, normalize(query[:MAX_QUERY_LENGTH]), limit,
+               tuple(sorted(types)) if types else None)
+        results = self._results.get(key)
+        with self._lock:
+            self.searches += 1
+            if results is not None:
+                self.cache_hits += 1
+                return results
+            results = self._index.search(query, limit, types)
+        self._results.set(key, results)
+        return results
+
+    def rebuild(self):
+        # One build at a time; concurrent first searches wait for it instead of building too
+        with self._build_lock:
+            if self._index is not None and time.monotonic() - self._built_at <= self.ttl:
+                return
+            with self._lock:
+                self._rebuilding = True
+                self._pending = []
+            try:
+                started = time.perf_counter()
+                index = load_index()
+                with self._lock:
+                    for change in self._pending:
+                        change(index)
+                    self._index = index
+                    self._generation += 1
+                    self._built_at = time.monotonic()
+                    self._build_ms = round((time.perf_counter() - started) * 1000, 1)
+                log.info("Built search index: %d entries in %.1fms", len(index), self._build_ms)
+            finally:
+                with self._lock:
+                    self._rebuilding = False
+                    self._pending = []
+
+    def _rebuild_quietly(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            # Keep serving the current index; the next search past the TTL retries
+            log.warning("Search index rebuild failed: %s", e)
+
+    def _apply(self, change):
+        with self._lock:
+            if self._index is not None:
+                change(self._index)
+                self._generation += 1
+            if self._rebuilding:
+                self._pending.append(change)
+
+    def _expire(self, error):
+        # The write itself succeeded; rebuild on the next search rather than fail the request
+        log.warning("Search index refresh failed, scheduling a rebuild: %s", error)
+        with self._lock:
+            self._built_at = 0.0
+
+    def refresh_student(self, student_id):
+        """ Re-read one student after it was created or edited """
+        if self._index is None and not self._rebuilding:
+            return
+        try:
+            with get_connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(
+                    "SELECT name, username, contact_info FROM students WHERE student_id = %s", (student_id,)
+                )
+                row = cursor.fetchone()
+                cursor.close()
+        except Error as e:
+            self._expire(e)
+            return
+        if row is None:
+            self._apply(lambda index: index.remove(('student', student_id)))
+        else:
+            self._apply(lambda index: _add_student(index, student_id, *row))
+
+    def refresh_destination(self, destination):
+        """ Re-count the certificates naming a destination school after one was added or deleted """
+        if not destination or (self._index is None and not self._rebuilding):
+            return
+        try:
+            with get_connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(
+                    "SELECT COUNT(*) FROM transfer_certificates WHERE destination_school = %s", (destination,)
+                )
+                count = cursor.fetchone()[0]
+                cursor.close()
+        except Error as e:
+            self._expire(e)
+            return
+        self._apply(lambda index: _set_destination(index, destination, count))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._index) if self._index is not None else 0,
+                "ageSeconds": round(time.monotonic() - self._built_at, 1) if self._index is not None else None,
+                "buildMs": self._build_ms,
+                "searches": self.searches,
+                "cacheHits": self.cache_hits,
+            }
+
+
+search_index = SearchIndex.from_env()
@@ -0,0 +1,205 @@
+import hashlib
+import os
+import re
+import tempfile
+import uuid
+
+CHUNK_SIZE = 64 * 1024
+
+_HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# Derived files written next to a blob by processing.py; removed with the blob
+PREVIEW_SUFFIXES = ('.thumb.png', '.txt')
+# A blob being deleted is renamed to this prefix until the delete commits
+TRASH_PREFIX = '.trash-'
+
+
+def is_content_hash(value):
+    return bool(_HASH_RE.match(value or ''))
+
+
+class BlobStore:
+    """ Content-addressed file store for uploaded documents.
+
+    Each distinct file is stored once under its SHA-256, sharded two levels
+    deep by hash prefix (``ab/cd/abcd...``) so no directory grows unbounded.
+    Reference counts live in the ``document_blobs`` table; this class only
+    deals with the bytes on disk. Writers that share blobs (uploads, deletes)
+    must hold that table's row lock for the hash while they check, write or
+    remove the files: see add_reference() and drop_reference().
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, content_hash):
+        return os.path.join(self.root, content_hash[:2], content_hash[2:4], content_hash)
+
+    def relative_path(self, content_hash):
+        return '/'.join(['blobs', content_hash[:2], content_hash[2:4], content_hash])
+
+    def exists(self, content_hash):
+        return os.path.exists(self.path_for(content_hash))
+
+    def preview_path(self, content_hash, suffix):
+        """ Path of a derived file such as the ``.thumb.png`` thumbnail """
+        return self.path_for(content_hash) + suffix
+
+    def digest(self, stream):
+        """ ``(content_hash, size)`` of a seekable stream, which is rewound afterwards """
+        start = stream.tell()
+        content_hash, size = self._hash(stream)
+        stream.seek(start)
+        return content_hash, size
+
+    def ensure(self, stream, content_hash):
+        """ Write ``stream`` (whose digest() is ``content_hash``) unless the blob exists; True if written """
+        if self.exists(content_hash):
+            return False
+        self._write(stream, content_hash)
+        return True
+
+    def detach(self, content_hash):
+        """ Rename a blob and its previews out of the way; returns the moves for purge() or restore() """
+        moves = []
+        for suffix in ('',) + PREVIEW_SUFFIXES:
+            path = self.preview_path(content_hash, suffix)
+            trash = os.path.join(os.path.dirname(path), f"{TRASH_PREFIX}{uuid.uuid4().hex}")
+            try:
+                os.replace(path, trash)
+            except FileNotFoundError:
+                continue
+            moves.append((path, trash))
+        return moves
+
+    def restore(self, moves):
+        """ Undo detach(), e.g. when the delete's transaction failed to commit """
+        for path, trash in moves:
+            os.replace(trash, path)
+
+    def purge(self, moves):
+        """ Remove what detach() moved aside, once the delete has committed """
+        for _, trash in moves:
+            try:
+                os.remove(trash)
+            except FileNotFoundError:
+                pass
+
+    def _hash(self, stream):
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+        return digest.hexdigest(), size
+
+    def _write(self, stream, content_hash):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    tmp.write(chunk)
+            self._install(tmp_path, content_hash)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _install(self, tmp_path, content_hash):
+        final_path = self.path_for(content_hash)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        # Atomic rename: readers never see a partially written blob
+        os.replace(tmp_path, final_path)
+
+
+def add_reference(cursor, content_hash, size):
+    """ Count one more document pointing at a blob (call inside the document INSERT's transaction).
+
+    The upsert leaves the document_blobs row locked until the transaction
+    ends. Call BlobStore.ensure() after it, so the check for the file and its
+    write cannot interleave with a delete of the blob's last reference.
+    """
+    cursor.execute(
+        """
+        INSERT INTO document_blobs (content_hash, size, ref_count) VALUES (%s, %s, 1)
+        ON DUPLICATE KEY UPDATE ref_count = ref_count + 1
+        """,
+        (content_hash, size)
+    )
+
+
+def drop_reference(cursor, content_hash):
+    """ Count one fewer reference; returns True when the blob is now unreferenced.
+
+    The row lock taken here serialises against a concurrent add_reference().
+    When it returns True, detach the files before committing (so the lock is
+    still held) and purge them after the commit succeeds.
+    """
+    cursor.execute(
+        "SELECT ref_count FROM document_blobs WHERE content_hash = %s FOR UPDATE",
+        (content_hash,)
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return True
+    ref_count = row['ref_count'] if isinstance(row, dict) else row[0]
+    if ref_count <= 1:
+        cursor.execute("DELETE FROM document_blobs WHERE content_hash = %s", (content_hash,))
+        return True
+    cursor.execute(
+        "UPDATE document_blobs SET ref_count = ref_count - 1 WHERE content_hash = %s",
+        (content_hash,)
+    )
+    return False
+
+
+def migrate_legacy_uploads(upload_folder, store):
+    """ Move flat ``{timestamp}_{name}`` uploads into the blob store.
+
+    Every documents row without a content_hash whose file is still on disk is
+    hashed, stored once, and repointed at its blob; the flat copy is removed
+    after the row is committed. Returns (migrated, missing) counts.
+    """
+    from db import get_connection
+
+    migrated = 0
+    missing = 0
+    with get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT document_id, file_name FROM documents WHERE content_hash IS NULL ORDER BY document_id"
+        )
+        rows = cursor.fetchall()
+
+        for row in rows:
+            legacy_path = os.path.join(upload_folder, row['file_name'])
+            if not os.path.isfile(legacy_path):
+                missing += 1
+                continue
+            with open(legacy_path, 'rb') as fh:
+                content_hash, size = store.digest(fh)
+                add_reference(cursor, content_hash, size)
+                store.ensure(fh, content_hash)
+            cursor.execute(
+                "UPDATE documents SET content_hash = %s, file_path = %s WHERE document_id = %s",
+                (content_hash, store.relative_path(content_hash), row['document_id'])
+            )
+            connection.commit()
+            os.remove(legacy_path)
+            migrated += 1
+
+        cursor.close()
+    return migrated, missing
+
+
+if __name__ == '__main__':
+    import sys
+
+    if sys.argv[1:] != ['migrate']:
+        print("Usage: python storage.py migrate")
+        sys.exit(1)
+
+    upload_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+    migrated, missing = migrate_legacy_uploads(upload_folder, BlobStore(os.path.join(upload_folder, 'blobs')))
+    print(f"Migrated {migrated} documents into the blob store ({missing} rows had no file on disk)")
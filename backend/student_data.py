@@ -0,0 +1,243 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import schema
+import summary
+from cache import StudentCache
+from db import get_connection
+
+# Per-student read-through cache; write routes invalidate what they change
+student_cache = StudentCache.from_env()
+
+# Per-student route queries; migrate.py check EXPLAINs these same statements
+ACADEMIC_RECORDS_SQL = """
+    SELECT record_id, student_id, school_standard, subject, marks, percentage, grade
+    FROM academic_records
+    WHERE student_id = %s
+    ORDER BY school_standard DESC, subject ASC
+"""
+
+DOCUMENTS_SQL = """
+    SELECT document_id, document_type, file_name, content_hash, upload_date
+    FROM documents WHERE student_id = %s ORDER BY upload_date DESC
+"""
+
+TRANSFER_CERTIFICATES_SQL = """
+    SELECT tc.*, s.name as student_name
+    FROM transfer_certificates tc
+    JOIN students s ON tc.student_id = s.student_id
+    WHERE tc.student_id = %s
+    ORDER BY application_date DESC
+"""
+
+SCHEMES_SQL = """
+    SELECT sh.*, s.name as scheme_name
+    FROM scheme_history sh
+    JOIN schemes s ON sh.scheme_id = s.scheme_id
+    WHERE sh.student_id = %s
+    ORDER BY start_date DESC
+"""
+
+
+def fetch_profile(student_id):
+    """ Student row joined with the school name, without the password """
+    with get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+
+        # Join with schools table to get school name
+        cursor.execute(
+            """
+            SELECT s.*, sch.name as school_name
+            FROM students s
+            LEFT JOIN schools sch ON s.current_school_id = sch.school_id
+            WHERE s.student_id = %s
+            """,
+            (student_id,)
+        )
+
+        profile = cursor.fetchone()
+        cursor.close()
+
+    if profile and 'password' in profile:
+        # Remove password from response
+        del profile['password']
+    return profile
+
+
+def fetch_academic_records(student_id):
+    with get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(ACADEMIC_RECORDS_SQL, (student_id,))
+
+        records = cursor.fetchall()
+        cursor.close()
+    return records
+
+
+def fetch_documents(student_id):
+    with get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(DOCUMENTS_SQL, (student_id,))
+
+        documents = cursor.fetchall()
+        cursor.close()
+    return documents
+
+
+def fetch_transfer_certificates(student_id):
+    with get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(TRANSFER_CERTIFICATES_SQL, (student_id,))
+
+        certificates = cursor.fetchall()
+        cursor.close()
+    return certificates
+
+
+def fetch_schemes(student_id):
+    with get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(SCHEMES_SQL, (student_id,))
+
+        schemes = cursor.fetchall()
+        cursor.close()
+    return schemes
+
+
+# Cached accessors used by the student routes. Returned objects are shared
+# with the cache, so callers must copy before modifying them.
+
+def get_profile(student_id):
+    return student_cache.get_or_load(student_id, 'profile', lambda: fetch_profile(student_id))
+
+
+def get_academic_records(student_id):
+    return student_cache.get_or_load(
+        student_id, 'academic_records', lambda: fetch_academic_records(student_id)
+    )
+
+
+def get_academic_summary(student_id):
+    return student_cache.get_or_load(
+        student_id, 'academic_summary', lambda: summary.fetch_student_summary(student_id)
+    )
+
+
+def get_documents(student_id):
+    return student_cache.get_or_load(student_id, 'documents', lambda: fetch_documents(student_id))
+
+
+def get_transfer_certificates(student_id):
+    return student_cache.get_or_load(
+        student_id, 'transfer_certificates', lambda: fetch_transfer_certificates(student_id)
+    )
+
+
+def get_schemes(student_id):
+    return student_cache.get_or_load(student_id, 'schemes', lambda: fetch_schemes(student_id))
+
+
+# Dashboard sections, keyed by the name used in the response and in ?fields=
+DASHBOARD_SECTIONS = {
+    'profile': get_profile,
+    'academicRecords': get_academic_records,
+    'academicSummary': get_academic_summary,
+    'transferCertificates': get_transfer_certificates,
+    'schemes': get_schemes,
+}
+
+# Shared by all requests; each task checks out its own pooled connection
+_dashboard_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('DASHBOARD_WORKERS', 8)),
+    thread_name_prefix='dashboard'
+)
+
+
+def load_dashboard(student_id, fields):
+    """ Run the requested section loaders concurrently and collect their results """
+    futures = {
+        field: _dashboard_executor.submit(DASHBOARD_SECTIONS[field], student_id)
+        for field in fields
+    }
+    # result() re-raises a loader's database error in the request thread
+    return {field: future.result() for field, future in futures.items()}
+
+
+def fetch_comprehensive_batch(student_ids):
+    """ Profiles, academic records, their summaries and schemes for many students in four queries.
+
+    Returns ``{student_id: {"student", "academicRecords", "academicSummary", "schemes"}}``;
+    ids with no student row are left out.
+    """
+    if not student_ids:
+        return {}
+    # Older databases lack academic_year and the scheme_history detail columns
+    db_schema = schema.current()
+    if db_schema.has_column('academic_records', 'academic_year'):
+        academic_year = "COALESCE(academic_year, '2024-2025') as academic_year"
+    else:
+        academic_year = "'2024-2025' as academic_year"
+    scheme_details = ', '.join(
+        f"sh.{column}" if db_schema.has_column('scheme_history', column) else f"NULL as {column}"
+        for column in ('benefits', 'details')
+    )
+    placeholders = ', '.join(['%s'] * len(student_ids))
+    params = tuple(student_ids)
+
+    with get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+
+        cursor.execute(
+            f"""
+            SELECT s.*, sch.name as school_name
+            FROM students s
+            LEFT JOIN schools sch ON s.current_school_id = sch.school_id
+            WHERE s.student_id IN ({placeholders})
+            """,
+            params
+        )
+        result = {}
+        for student in cursor.fetchall():
+            student.pop('password', None)
+            result[student['student_id']] = {
+                "student": student, "academicRecords": [], "academicSummary": [], "schemes": []
+            }
+
+        cursor.execute(
+            f"""
+            SELECT record_id, student_id, school_standard, subject, marks, percentage, grade,
+                   {academic_year}
+            FROM academic_records
+            WHERE student_id IN ({placeholders})
+            ORDER BY student_id, school_standard DESC, subject ASC
+            """,
+            params
+        )
+        for record in cursor.fetchall():
+            if record['student_id'] in result:
+                result[record['student_id']]["academicRecords"].append(record)
+
+        summary_sql = summary.summary_query(f"student_id IN ({placeholders})")
+        if summary_sql:
+            cursor.execute(summary_sql, params)
+            for row in cursor.fetchall():
+                if row['student_id'] in result:
+                    result[row['student_id']]["academicSummary"].append(row)
+
+        cursor.execute(
+            f"""
+            SELECT sh.history_id, sh.student_id, sh.scheme_id, sh.start_date, sh.end_date,
+                   {scheme_details}, s.name, s.description
+            FROM scheme_history sh
+            JOIN schemes s ON sh.scheme_id = s.scheme_id
+            WHERE sh.student_id IN ({placeholders})
+            ORDER BY sh.student_id, sh.start_date DESC
+            """,
+            params
+        )
+        for scheme in cursor.fetchall():
+            if scheme['student_id'] in result:
+                result[scheme['student_id']]["schemes"].append(scheme)
+
+        cursor.close()
+    return result
@@ -0,0 +1,164 @@
+import logging
+
+from mysql.connector import Error
+
+import schema
+from db import get_connection
+
+log = logging.getLogger(__name__)
+
+SUMMARY_COLUMNS = (
+    'student_id', 'school_standard', 'academic_year', 'subject_count', 'average_marks',
+    'average_percentage', 'best_subject', 'best_percentage', 'worst_subject', 'worst_percentage',
+    'grade_a_plus', 'grade_a', 'grade_b_plus', 'grade_b', 'grade_c', 'grade_other',
+)
+
+# One academic_summary row per group of academic_records; {where} narrows it to
+# the groups being refreshed. Ties for best/worst subject go to the first by name.
+SUMMARY_SELECT = """
+    SELECT
+        student_id, school_standard, academic_year,
+        COUNT(*) AS subject_count,
+        ROUND(AVG(marks), 2) AS average_marks,
+        ROUND(AVG(percentage), 2) AS average_percentage,
+        SUBSTRING_INDEX(GROUP_CONCAT(subject ORDER BY percentage DESC, subject SEPARATOR '\\n'), '\\n', 1)
+            AS best_subject,
+        MAX(percentage) AS best_percentage,
+        SUBSTRING_INDEX(GROUP_CONCAT(subject ORDER BY percentage ASC, subject SEPARATOR '\\n'), '\\n', 1)
+            AS worst_subject,
+        MIN(percentage) AS worst_percentage,
+        COUNT(CASE WHEN grade = 'A+' THEN 1 END) AS grade_a_plus,
+        COUNT(CASE WHEN grade = 'A' THEN 1 END) AS grade_a,
+        COUNT(CASE WHEN grade = 'B+' THEN 1 END) AS grade_b_plus,
+        COUNT(CASE WHEN grade = 'B' THEN 1 END) AS grade_b,
+        COUNT(CASE WHEN grade = 'C' THEN 1 END) AS grade_c,
+        COUNT(CASE WHEN grade IS NULL OR grade NOT IN ('A+', 'A', 'B+', 'B', 'C') THEN 1 END) AS grade_other
+    FROM academic_records
+    WHERE academic_year IS NOT NULL AND {where}
+    GROUP BY student_id, school_standard, academic_year
+"""
+
+REPLACE_SQL = f"REPLACE INTO academic_summary ({', '.join(SUMMARY_COLUMNS)})" + SUMMARY_SELECT
+
+DEFAULT_REBUILD_BATCH = 1000
+
+# Filter used by the per-student summary route
+STUDENT_WHERE = "student_id = %s"
+
+
+def available():
+    """ False until migration 0004 has created academic_summary """
+    return schema.current().has_table('academic_summary')
+
+
+def refresh_groups(cursor, keys):
+    """ Recompute the summary rows for ``(student_id, school_standard, academic_year)`` keys.
+
+    Runs on the caller's cursor so it commits or rolls back together with the
+    academic_records write that changed those groups. Each group is a handful
+    of rows read through the unique key, so this stays cheap per batch.
+    """
+    keys = sorted(set(keys))
+    if not keys or not available():
+        return 0
+    placeholders = ', '.join(['(%s, %s, %s)'] * len(keys))
+    params = [value for key in keys for value in key]
+    # Groups whose records are all gone must disappear, so delete first and re-insert
+    cursor.execute(
+        f"DELETE FROM academic_summary WHERE (student_id, school_standard, academic_year) IN ({placeholders})",
+        params
+    )
+    cursor.execute(
+        REPLACE_SQL.format(where=f"(student_id, school_standard, academic_year) IN ({placeholders})"),
+        params
+    )
+    return len(keys)
+
+
+def summary_query(where):
+    """ SELECT for the summary rows matching ``where``, or None if they cannot be produced.
+
+    Reads academic_summary once it exists; before migration 0004 the same
+    rows are aggregated from academic_records on the fly.
+    """
+    order = " ORDER BY student_id, school_standard DESC, academic_year DESC"
+    if available():
+        return f"SELECT * FROM academic_summary WHERE {where}" + order
+    if schema.current().has_column('academic_records', 'academic_year'):
+        return SUMMARY_SELECT.format(where=where) + order
+    return None
+
+
+def fetch_student_summary(student_id):
+    """ Summary rows for one student, newest standard first; a primary-key range scan """
+    sql = summary_query(STUDENT_WHERE)
+    if sql is None:
+        return []
+    with get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(sql, (student_id,))
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+
+def rebuild(batch_size=DEFAULT_REBUILD_BATCH, student_id=None):
+    """ Recompute academic_summary from academic_records, ``batch_size`` students per transaction.
+
+    Returns ``(student ids scanned, summary rows written)``. Safe to run while the backend is
+    serving: each student range is replaced atomically.
+    """
+    if not available():
+        raise RuntimeError("academic_summary does not exist; run python migrate.py first")
+
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        if student_id is not None:
+            bounds = (student_id, student_id)
+        else:
+            cursor.execute("SELECT MIN(student_id), MAX(student_id) FROM students")
+            bounds = cursor.fetchone()
+        if bounds[0] is None:
+            cursor.close()
+            return 0, 0
+
+        low, high = bounds
+        students = 0
+        rows = 0
+        while low <= high:
+            upper = min(low + batch_size - 1, high)
+            try:
+                cursor.execute(
+                    "DELETE FROM academic_summary WHERE student_id BETWEEN %s AND %s", (low, upper)
+                )
+                cursor.execute(REPLACE_SQL.format(where="student_id BETWEEN %s AND %s"), (low, upper))
+                rows += max(cursor.rowcount, 0)
+                connection.commit()
+            except Error:
+                connection.rollback()
+                raise
+            students += upper - low + 1
+            log.debug("Rebuilt academic_summary for students %s-%s", low, upper)
+            low = upper + 1
+        cursor.close()
+    return students, rows
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Maintain the academic_summary rollup table")
+    parser.add_argument('command', choices=('rebuild',))
+    parser.add_argument('--student', type=int, help="only rebuild this student")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_REBUILD_BATCH,
+                        help="students per transaction")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(name)s: %(message)s')
+    try:
+        student_count, row_count = rebuild(args.batch_size, args.student)
+    except (RuntimeError, Error) as e:
+        print(f"Rebuild failed: {e}")
+        sys.exit(1)
+    print(f"Rebuilt {row_count} summary rows across {student_count} student ids")
@@ -0,0 +1,83 @@
+""" Stand-ins for pooled MySQL connections, for tests that never reach a server """
+import re
+from contextlib import contextmanager
+
+
+def squash(sql):
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+class FakeCursor:
+    """ Records statements; ``results`` maps a SQL prefix to the rows (or rowcount) it returns """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+        self.lastrowid = None
+        self._rows = []
+
+    def execute(self, sql, params=()):
+        sql = squash(sql)
+        self.connection.executed.append((sql, tuple(params)))
+        if sql.startswith("INSERT"):
+            self.lastrowid = len(self.connection.executed)
+        self._rows = []
+        self.rowcount = 0
+        for prefix, result in self.connection.results.items():
+            if sql.startswith(prefix):
+                result = result(sql, tuple(params)) if callable(result) else result
+                if isinstance(result, int):
+                    self.rowcount = result
+                else:
+                    self._rows = list(result)
+                    self.rowcount = len(self._rows)
+                break
+
+    def executemany(self, sql, seq_params):
+        seq_params = list(seq_params)
+        for params in seq_params:
+            self.execute(sql, params)
+        self.rowcount = len(seq_params)
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, results=None):
+        self.results = results or {}
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.checked_out = 0
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    @contextmanager
+    def checkout(self):
+        """ Drop-in for db.get_connection() """
+        self.checked_out += 1
+        try:
+            yield self
+        finally:
+            self.checked_out -= 1
+
+    def statements(self, prefix):
+        return [(sql, params) for sql, params in self.executed if sql.startswith(prefix)]
@@ -0,0 +1,78 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import analytics
+from analytics import Cohort, CohortCache
+from fakes import FakeConnection
+
+KEY = (None, '10th', '2024-2025')
+
+
+def cohort_from(monkeypatch, rows):
+    """ Cohort over ``(student_id, school_id, subject, percentage)`` rows, loaded as the route does """
+    connection = FakeConnection({"SELECT ar.student_id": rows})
+    monkeypatch.setattr(analytics, 'get_connection', connection.checkout)
+    return Cohort(KEY, *analytics.load_marks('10th', '2024-2025'))
+
+
+@pytest.fixture
+def cohort(monkeypatch):
+    return cohort_from(monkeypatch, [
+        (1, 5, 'Science', 90.0), (1, 5, 'Maths', 90.0),
+        (2, 5, 'Science', 70.0), (2, 5, 'Maths', 90.0),
+        (3, None, 'Maths', 80.0),
+        (4, 6, 'Science', 60.0), (4, 6, 'Maths', 80.0),
+    ])
+
+
+def test_tied_averages_share_a_competition_rank(cohort):
+    ranking = cohort.ranking()
+    assert [(entry["student_id"], entry["rank"]) for entry in ranking] == [(1, 1), (2, 2), (3, 2), (4, 4)]
+    assert [entry["percentileRank"] for entry in ranking] == [75.0, 25.0, 25.0, 0.0]
+    assert cohort.ranking(offset=1, limit=2)[0]["student_id"] == 2
+
+
+def test_students_without_a_school(cohort):
+    assert cohort.student(3)["school_id"] is None
+    assert cohort.school_of(3) is None
+    assert cohort.school_of(4) == 6
+    assert cohort.student(99) is None
+
+
+def test_subjects_are_sliced_and_sorted_by_name(cohort):
+    subjects = {entry["subject"]: entry for entry in cohort.subjects}
+    assert [entry["subject"] for entry in cohort.subjects] == ['Maths', 'Science']
+    assert subjects['Maths']["count"] == 4 and subjects['Maths']["average"] == 85.0
+    assert subjects['Science']["count"] == 3 and subjects['Science']["min"] == 60.0
+    assert cohort.overall["count"] == 4 and cohort.overall["records"] == 7
+
+
+def test_empty_cohort(monkeypatch):
+    cohort = cohort_from(monkeypatch, [])
+    assert len(cohort) == 0
+    assert cohort.overall is None and cohort.subjects == []
+    assert cohort.ranking() == []
+
+
+def test_invalidate_drops_school_and_standard_wide_cohorts(monkeypatch):
+    loads = []
+
+    def load_marks(standard, academic_year, school_id=None):
+        loads.append((school_id, standard, academic_year))
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, [], np.empty(0, dtype=np.float64)
+
+    monkeypatch.setattr(analytics, 'load_marks', load_marks)
+    cache = CohortCache(max_entries=8, ttl=None)
+    for school_id in (None, 5):
+        cache.get('10th', '2024-2025', school_id)
+        cache.get('10th', '2024-2025', school_id)
+    cache.get('9th', '2024-2025')
+    assert len(loads) == 3 and cache.hits == 2
+
+    cache.invalidate('10th', '2024-2025')
+    cache.get('10th', '2024-2025')
+    cache.get('10th', '2024-2025', 5)
+    cache.get('9th', '2024-2025')
+    assert loads[3:] == [(None, '10th', '2024-2025'), (5, '10th', '2024-2025')]
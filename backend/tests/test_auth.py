@@ -0,0 +1,135 @@
+import time
+
+import pytest
+from flask import Flask, g, jsonify
+
+import auth
+from fakes import FakeConnection
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+
+    @app.route('/students/<int:student_id>')
+    @auth.require_auth('student', 'admin')
+    def student(student_id):
+        return jsonify(g.auth)
+
+    @app.route('/admin')
+    @auth.require_auth('admin')
+    def admin():
+        return jsonify(g.auth)
+
+    @app.route('/events')
+    @auth.require_auth('admin', query_token=True)
+    def events():
+        return jsonify(g.auth)
+
+    return app
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_round_trip():
+    claims = auth.verify_token(auth.issue_token(7, 'student'))
+    assert (claims['sub'], claims['role'], claims['typ']) == (7, 'student', 'access')
+
+
+def test_tampered_payload_is_rejected():
+    token = auth.issue_token(7, 'student')
+    payload, signature = token.split('.')
+    forged = auth._b64encode(auth._b64decode(payload).replace(b'"student"', b'"admin"'))
+    with pytest.raises(auth.AuthError, match="signature"):
+        auth.verify_token(f"{forged}.{signature}")
+
+
+@pytest.mark.parametrize("token", [None, "", "abc", "a.b.c", "not-base64.!!!"])
+def test_malformed_tokens_are_rejected(token):
+    with pytest.raises(auth.AuthError):
+        auth.verify_token(token)
+
+
+def test_expired_token_is_rejected(monkeypatch):
+    token = auth.issue_token(7, 'student')
+    later = time.time() + auth.ACCESS_TOKEN_TTL + 1
+    monkeypatch.setattr(auth.time, 'time', lambda: later)
+    with pytest.raises(auth.AuthError, match="expired"):
+        auth.verify_token(token)
+
+
+def test_refresh_token_is_not_an_access_token():
+    with pytest.raises(auth.AuthError, match="type"):
+        auth.verify_token(auth.issue_token(7, 'student', 'refresh'))
+
+
+def test_revoked_token_is_rejected():
+    token = auth.issue_token(7, 'student')
+    auth.revoke(auth.verify_token(token))
+    with pytest.raises(auth.AuthError, match="revoked"):
+        auth.verify_token(token)
+
+
+def test_students_only_reach_their_own_routes(app):
+    client = app.test_client()
+    token = auth.issue_token(7, 'student')
+    assert client.get('/students/7', headers=bearer(token)).status_code == 200
+    assert client.get('/students/8', headers=bearer(token)).status_code == 403
+    assert client.get('/admin', headers=bearer(token)).status_code == 403
+
+
+def test_admins_reach_any_student(app):
+    client = app.test_client()
+    token = auth.issue_token(1, 'admin')
+    assert client.get('/students/8', headers=bearer(token)).status_code == 200
+    assert client.get('/admin', headers=bearer(token)).status_code == 200
+
+
+def test_missing_token(app):
+    assert app.test_client().get('/admin').status_code == 401
+
+
+def test_query_token_only_where_allowed(app):
+    client = app.test_client()
+    token = auth.issue_token(1, 'admin')
+    assert client.get(f'/events?token={token}').status_code == 200
+    assert client.get(f'/admin?token={token}').status_code == 401
+
+
+def test_check_password():
+    stored = auth.hash_password('secret')
+    assert auth.is_password_hash(stored)
+    assert auth.check_password(stored, 'secret') == (True, False)
+    assert auth.check_password(stored, 'wrong') == (False, False)
+    # Legacy plaintext matches and asks to be rehashed
+    assert auth.check_password('secret', 'secret') == (True, True)
+    assert auth.check_password('secret', 'wrong') == (False, False)
+    assert auth.check_password(None, 'secret') == (False, False)
+
+
+class FakeSchema:
+    def __init__(self, version):
+        self.version = version
+
+
+@pytest.mark.parametrize("version, rehashed", [(None, False), (6, False), (7, True)])
+def test_login_rehashes_plaintext_only_once_the_columns_are_wide_enough(monkeypatch, version, rehashed):
+    import main
+
+    user = {"student_id": 7, "name": "Student", "username": "student1", "password": "password123"}
+    connection = FakeConnection({"SELECT * FROM students": [user], "UPDATE students": 1})
+    monkeypatch.setattr(main, 'get_connection', connection.checkout)
+    monkeypatch.setattr(main.schema, 'current', lambda: FakeSchema(version))
+
+    response = main.app.test_client().post('/api/auth/login', json={
+        "username": "student1", "password": "password123", "userType": "student"
+    })
+
+    assert response.status_code == 200
+    assert auth.verify_token(response.get_json()['token'])['sub'] == 7
+    updates = connection.statements("UPDATE students SET password")
+    assert bool(updates) == rehashed
+    if rehashed:
+        assert auth.check_password(updates[0][1][0], 'password123') == (True, False)
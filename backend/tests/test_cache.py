@@ -0,0 +1,93 @@
+import pytest
+
+from cache import LRUCache, StudentCache, TTLCache
+
+
+@pytest.fixture
+def cache():
+    return StudentCache(LRUCache(16))
+
+
+def test_loaded_value_is_cached(cache):
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"name": "Asha"}
+
+    assert cache.get_or_load(1, 'profile', loader) == {"name": "Asha"}
+    assert cache.get_or_load(1, 'profile', loader) == {"name": "Asha"}
+    assert len(calls) == 1
+    assert cache.stats()["hits"]["profile"] == 1
+
+
+def test_load_that_raced_an_invalidation_is_not_cached(cache):
+    def loader():
+        # A write commits and invalidates while this load is reading the old row
+        cache.invalidate(1, 'profile')
+        return {"name": "old"}
+
+    assert cache.get_or_load(1, 'profile', loader) == {"name": "old"}
+    assert cache.backend.get((1, 'profile')) is None
+
+
+def test_invalidating_another_student_does_not_mark_a_load_stale(cache):
+    def loader():
+        cache.invalidate(2)
+        return {"name": "Asha"}
+
+    cache.get_or_load(1, 'profile', loader)
+    assert cache.backend.get((1, 'profile')) == {"name": "Asha"}
+
+
+def test_generation_map_only_holds_loads_in_flight(cache):
+    for student_id in range(100):
+        cache.get_or_load(student_id, 'profile', lambda: {"ok": True})
+        cache.invalidate(student_id)
+    assert cache._loading == {}
+
+
+def test_failed_load_is_forgotten(cache):
+    def loader():
+        raise RuntimeError("database down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load(1, 'profile', loader)
+    assert cache._loading == {}
+    assert cache.backend.get((1, 'profile')) is None
+
+
+def test_none_is_not_cached(cache):
+    assert cache.get_or_load(1, 'profile', lambda: None) is None
+    assert len(cache.backend) == 0
+
+
+def test_ttl_cache_drops_a_load_that_raced_an_invalidation():
+    cache = TTLCache(ttl=60)
+
+    def loader():
+        # A TC write commits and clears the dashboard while it is being computed
+        cache.invalidate()
+        return {"pending": 3}
+
+    assert cache.get_or_load('summary', loader) == {"pending": 3}
+    assert cache.get('summary') is None
+    assert cache.get_or_load('summary', lambda: {"pending": 4}) == {"pending": 4}
+    assert cache.get('summary') == {"pending": 4}
+
+
+def test_renaming_a_student_drops_cached_certificates(monkeypatch):
+    import auth
+    import main
+    from fakes import FakeConnection
+
+    invalidated = []
+    monkeypatch.setattr(main, 'get_connection', FakeConnection().checkout)
+    monkeypatch.setattr(main.student_cache, 'invalidate', lambda *args: invalidated.append(args))
+    monkeypatch.setattr(main.search_index, 'refresh_student', lambda student_id: None)
+    response = main.app.test_client().put(
+        '/api/admin/students/7', json={"name": "Asha Rao"},
+        headers={"Authorization": f"Bearer {auth.issue_token(1, 'admin')}"}
+    )
+    assert response.status_code == 200
+    assert invalidated == [(7, 'profile', 'transfer_certificates')]
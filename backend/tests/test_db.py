@@ -0,0 +1,109 @@
+import pytest
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+from db import ConnectionPool
+
+
+class StubConnection:
+    """ Just the mysql.connector connection surface the pool uses """
+
+    def __init__(self):
+        self.unread_result = False
+        self.in_transaction = False
+        self.pings = 0
+        self.rollbacks = 0
+        self.closed = False
+        self.broken = False
+
+    def ping(self, reconnect, attempts, delay):
+        self.pings += 1
+        if self.broken:
+            raise Error("Lost connection to MySQL server")
+
+    def consume_results(self):
+        self.unread_result = False
+
+    def rollback(self):
+        if self.broken:
+            raise Error("Lost connection to MySQL server")
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    pool = ConnectionPool({}, **kwargs)
+    pool._connect = StubConnection
+    return pool
+
+
+def test_idle_connection_is_reused_and_pinged_only_past_the_interval():
+    pool = make_pool(size=2, ping_interval=30.0)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as again:
+        assert again is first and again.pings == 0
+
+    pool.ping_interval = -1.0
+    with pool.connection() as stale:
+        assert stale is first and stale.pings == 1
+    assert pool.stats()["open"] == 1
+
+
+def test_broken_idle_connection_is_dropped_on_acquire():
+    pool = make_pool(size=1, ping_interval=-1.0)
+    with pool.connection() as connection:
+        pass
+    connection.broken = True
+    with pytest.raises(Error):
+        pool.acquire()
+    assert connection.closed
+    assert pool.stats()["open"] == 0
+    assert pool.acquire() is not connection
+
+
+def test_exhausted_pool_times_out_with_pool_error():
+    pool = make_pool(size=1, timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(PoolError):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+    pool.release(held)
+    assert pool.acquire() is held
+
+
+def test_release_resets_state_and_rolls_back_only_open_transactions():
+    pool = make_pool(size=1)
+    connection = pool.acquire()
+    pool.release(connection)
+    assert connection.rollbacks == 0
+
+    connection = pool.acquire()
+    connection.unread_result = True
+    connection.in_transaction = True
+    pool.release(connection)
+    assert connection.rollbacks == 1 and not connection.unread_result
+
+
+def test_unusable_connection_is_forgotten_on_release():
+    pool = make_pool(size=1)
+    connection = pool.acquire()
+    connection.in_transaction = True
+    connection.broken = True
+    pool.release(connection)
+    assert connection.closed
+    assert pool.stats()["open"] == 0
+    assert pool.stats()["discarded"] == 1
+
+
+def test_discard_frees_the_slot_for_a_new_connection():
+    pool = make_pool(size=1, timeout=0.05)
+    connection = pool.acquire()
+    pool.discard(connection)
+    assert connection.closed
+    replacement = pool.acquire()
+    assert replacement is not connection
+    assert pool.stats()["in_use"] == 1
@@ -0,0 +1,142 @@
+import json
+
+import pytest
+
+import events
+from fakes import FakeConnection
+
+
+def drain(hub, after, generation):
+    return hub.wait(after, generation, timeout=0)
+
+
+def test_events_after_a_resume_point():
+    hub = events.EventHub(history=10)
+    for event_id in (1, 2, 5):
+        hub.publish(event_id, 'tc.updated', {"tc_id": event_id}, ('admin',))
+    after, generation, missed = hub.position('2')
+    assert (after, missed) == (2, False)
+    found, after, _, missed = drain(hub, after, generation)
+    assert [event[0] for event in found] == [5] and after == 5 and not missed
+
+
+def test_resume_point_older_than_the_buffer_resyncs():
+    hub = events.EventHub(history=2)
+    for event_id in (1, 2, 3):
+        hub.publish(event_id, 'tc.updated', {}, ('admin',))
+    # Event 1 has left the buffer: a client that saw it can still resume, one that did not cannot
+    assert hub.position('0') == (3, 0, True)
+    assert hub.position('1')[2] is False
+    assert hub.position('garbage')[2] is True
+
+
+def test_resume_point_ahead_of_this_process_waits_for_it():
+    # Seen through another worker whose relay polled first
+    hub = events.EventHub()
+    hub.publish(1, 'tc.created', {}, ('admin',))
+    after, generation, missed = hub.position('3')
+    assert (after, missed) == (3, False)
+    hub.publish(2, 'tc.updated', {}, ('admin',))
+    hub.publish(4, 'tc.updated', {}, ('admin',))
+    found, after, _, _ = drain(hub, after, generation)
+    assert [event[0] for event in found] == [4]
+
+
+def test_stream_filters_by_topic_and_resyncs():
+    hub = events.EventHub()
+    stream = hub.stream('student:7', deadline=None)
+    assert next(stream).startswith('retry:')
+    hub.publish(1, 'tc.updated', {"tc_id": 1}, ('admin', 'student:8'))
+    hub.publish(2, 'tc.updated', {"tc_id": 2}, ('admin', 'student:7'))
+    frame = next(stream)
+    assert frame.startswith('id: 2\nevent: tc.updated') and '"tc_id": 1' not in frame
+    hub.resync()
+    assert next(stream) == 'id: 2\nevent: resync\ndata: {}\n\n'
+    stream.close()
+    assert hub.stats()['subscribers'] == 0
+
+
+class Outbox:
+    """ tc_events rows as the relay's queries see them """
+
+    def __init__(self, *event_ids):
+        self.rows = {}
+        self.add(*event_ids)
+
+    def add(self, *event_ids):
+        for event_id in event_ids:
+            self.rows[event_id] = (event_id, 'tc.updated', 7, json.dumps({"tc_id": event_id}))
+
+    def after(self, sql, params):
+        return [self.rows[event_id] for event_id in sorted(self.rows) if event_id > params[0]]
+
+    def within(self, sql, params):
+        ranges = list(zip(params[::2], params[1::2]))
+        return [(event_id,) for event_id in sorted(self.rows)
+                if any(low <= event_id <= high for low, high in ranges)][:1]
+
+    def connection(self):
+        return FakeConnection({
+            "SELECT event_id, name, student_id, payload FROM tc_events": self.after,
+            "SELECT event_id FROM tc_events": self.within,
+        })
+
+
+def test_relay_publishes_in_order_and_holds_rows_behind_a_gap():
+    hub = events.EventHub()
+    relay = events.EventRelay(hub, gap_wait=5)
+    outbox = Outbox(1, 2, 4)
+    connection = outbox.connection()
+
+    relay.poll(connection, now=0)
+    assert relay.position == 2 and hub.stats()['lastEventId'] == 2
+
+    # 3 commits late but within the wait: everything goes out in order
+    outbox.add(3)
+    relay.poll(connection, now=1)
+    assert relay.position == 4
+    found, _, _, _ = drain(hub, 0, hub.position(None)[1])
+    assert [event[0] for event in found] == [1, 2, 3, 4]
+
+
+def test_relay_skips_a_rolled_back_id_and_resyncs_if_it_shows_up():
+    hub = events.EventHub()
+    relay = events.EventRelay(hub, gap_wait=5)
+    outbox = Outbox(1, 3)
+    connection = outbox.connection()
+    _, generation, _ = hub.position(None)
+
+    relay.poll(connection, now=0)
+    assert relay.position == 1
+    relay.poll(connection, now=6)
+    assert relay.position == 3
+
+    outbox.add(2)
+    relay.poll(connection, now=7)
+    _, _, _, missed = drain(hub, 3, generation)
+    assert missed
+    # Reported once
+    generation = hub.position(None)[1]
+    relay.poll(connection, now=8)
+    assert not drain(hub, 3, generation)[3]
+
+
+def test_publish_tc_writes_to_the_outbox_in_the_callers_transaction(monkeypatch):
+    monkeypatch.setattr(events, 'available', lambda: True)
+    connection = FakeConnection()
+    events.publish_tc(connection.cursor(), 'tc.created', 7, {"tc_id": 1})
+    (sql, params), = connection.executed
+    assert sql.startswith("INSERT INTO tc_events") and params[:2] == ('tc.created', 7)
+    assert connection.commits == 0
+
+
+def test_streams_are_refused_before_the_outbox_exists(monkeypatch):
+    import auth
+    import main
+
+    monkeypatch.setattr(events, 'available', lambda: False)
+    monkeypatch.setattr(events.tc_relay, 'start', lambda: pytest.fail("relay started without its table"))
+    token = auth.issue_token(7, 'student')
+    response = main.app.test_client().get(f'/api/students/7/transfer-certificate/events?token={token}')
+    assert response.status_code == 503
+    assert "0008" in response.get_json()["message"]
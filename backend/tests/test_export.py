@@ -0,0 +1,80 @@
+import pytest
+from mysql.connector import Error
+
+import export
+
+
+class ExportCursor:
+    column_names = ('id', 'name')
+
+    def __init__(self, batches, fail_on_execute=False):
+        self.batches = list(batches)
+        self.fail_on_execute = fail_on_execute
+
+    def execute(self, sql):
+        if self.fail_on_execute:
+            raise Error("Table is gone")
+
+    def fetchmany(self, size):
+        batch = self.batches.pop(0)
+        if isinstance(batch, Exception):
+            raise batch
+        return batch
+
+    def close(self):
+        pass
+
+
+class ExportPool:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.released = self.discarded = 0
+
+    def acquire(self):
+        return self
+
+    def cursor(self, **kwargs):
+        return self._cursor
+
+    def release(self, connection):
+        self.released += 1
+
+    def discard(self, connection):
+        self.discarded += 1
+
+
+def test_ndjson_stream(monkeypatch):
+    pool = ExportPool(ExportCursor([[(1, 'a'), (2, 'b')], []]))
+    monkeypatch.setattr(export, 'pool', pool)
+    assert ''.join(export.stream_table('t', 'ndjson')) == '{"id": 1, "name": "a"}\n{"id": 2, "name": "b"}\n'
+    assert pool.released == 1
+
+
+def test_error_after_the_first_chunk_is_raised_not_swallowed(monkeypatch):
+    pool = ExportPool(ExportCursor([[(1, 'a')], Error("Lost connection")]))
+    monkeypatch.setattr(export, 'pool', pool)
+    chunks = export.stream_table('t', 'json')
+    assert next(chunks) == '{"t": ['
+    assert next(chunks) == '{"id": 1, "name": "a"}'
+    with pytest.raises(Error):
+        next(chunks)
+    assert pool.discarded == 1 and pool.released == 0
+
+
+def test_start_raises_errors_from_running_the_query(monkeypatch):
+    pool = ExportPool(ExportCursor([], fail_on_execute=True))
+    monkeypatch.setattr(export, 'pool', pool)
+    with pytest.raises(Error):
+        export.start(export.stream_table('t', 'csv'))
+    assert pool.discarded == 1
+
+
+def test_start_keeps_every_chunk_and_closes_the_stream(monkeypatch):
+    pool = ExportPool(ExportCursor([[(1, 'a')], [(2, 'b')], []]))
+    monkeypatch.setattr(export, 'pool', pool)
+    chunks = export.start(export.stream_table('t', 'csv'))
+    assert next(chunks) == 'id,name\r\n'
+    assert next(chunks) == '1,a\r\n'
+    chunks.close()
+    # A client that goes away mid-stream gets its connection dropped, not drained
+    assert pool.discarded == 1
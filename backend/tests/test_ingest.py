@@ -0,0 +1,78 @@
+from decimal import Decimal
+
+import pytest
+
+import ingest
+from fakes import FakeConnection
+
+
+def row(student_id, subject='Maths', marks='91'):
+    return {"student_id": student_id, "school_standard": "10th", "subject": subject,
+            "marks": marks, "academic_year": "2024-2025"}
+
+
+def test_validate_row_fills_percentage_and_grade():
+    assert ingest.validate_row(row('7', marks='79.5')) == (
+        7, '10th', 'Maths', Decimal('79.50'), Decimal('79.50'), 'B+', '2024-2025'
+    )
+
+
+@pytest.mark.parametrize("raw, message", [
+    ({**row(7), "marks": "101"}, "between 0 and 100"),
+    ({**row(7), "student_id": "x"}, "integer"),
+    ({**row(7), "subject": ""}, "missing subject"),
+    ("not a row", "object"),
+])
+def test_validate_row_rejects(raw, message):
+    with pytest.raises(ingest.RowError, match=message):
+        ingest.validate_row(raw)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    connection = FakeConnection({"SELECT student_id FROM students": [(7,), (8,)]})
+    monkeypatch.setattr(ingest, 'get_connection', connection.checkout)
+    monkeypatch.setattr(ingest.summary, 'refresh_groups', lambda cursor, keys: len(set(keys)))
+    return connection
+
+
+def test_unknown_students_are_rejected_row_by_row(database):
+    report = ingest.ingest([row(7), row(9), row(8, 'Science')], batch_size=10)
+    assert (report["rowsWritten"], report["rejected"]) == (2, 1)
+    assert report["errors"] == [{"row": 2, "error": "unknown student_id 9"}]
+    assert report["_students"] == {7, 8}
+    assert report["_cohorts"] == {('10th', '2024-2025')}
+
+
+def failing_after_first_batch():
+    yield row(7)
+    yield row(8)
+    raise ValueError("CSV line 3: bad quoting")
+
+
+def test_a_failure_part_way_keeps_what_committed_batches_changed(database):
+    report = ingest.new_report()
+    with pytest.raises(ValueError):
+        ingest.ingest(failing_after_first_batch(), batch_size=1, report=report)
+    assert report["batches"] == 2 and report["_students"] == {7, 8}
+
+
+def test_bulk_import_route_invalidates_caches_after_a_parse_error(database, monkeypatch):
+    import main
+    import auth
+
+    invalidated = []
+    monkeypatch.setattr(main.student_cache, 'invalidate', lambda *args: invalidated.append(args))
+    monkeypatch.setattr(main.analytics.cohort_cache, 'invalidate', lambda *args: invalidated.append(args))
+
+    response = main.app.test_client().post(
+        '/api/admin/academic-records/bulk-import?batch_size=1',
+        # The third line's field is over the csv module's size limit
+        data="student_id,school_standard,subject,marks,academic_year\n7,10th,Maths,91,2024-2025\n"
+             + "8,10th," + "x" * 200_000 + ",91,2024-2025\n",
+        content_type='text/csv',
+        headers={"Authorization": f"Bearer {auth.issue_token(1, 'admin')}"},
+    )
+    assert response.status_code == 400
+    assert (7, 'academic_records', 'academic_summary') in invalidated
+    assert ('10th', '2024-2025') in invalidated
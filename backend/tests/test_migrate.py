@@ -0,0 +1,51 @@
+import pytest
+
+import auth
+from fakes import FakeConnection, squash
+
+
+@pytest.fixture
+def checked(monkeypatch):
+    import main
+    import migrate
+
+    current = main.schema.Schema({"academic_summary": {"student_id"}})
+    monkeypatch.setattr(main.schema, 'current', lambda: current)
+    return {squash(sql): params for _, sql, params, _, _ in migrate.explain_checks()}
+
+
+def admin_headers():
+    return {"Authorization": f"Bearer {auth.issue_token(1, 'admin')}"}
+
+
+@pytest.mark.parametrize("url", [
+    '/api/admin/students',
+    '/api/admin/transfer-certificates',
+    '/api/admin/transfer-certificates?status=pending',
+])
+def test_admin_list_routes_run_the_checked_statements(checked, monkeypatch, url):
+    import main
+
+    connection = FakeConnection()
+    monkeypatch.setattr(main, 'get_connection', connection.checkout)
+    assert main.app.test_client().get(url, headers=admin_headers()).status_code == 200
+    sql, params = connection.executed[-1]
+    assert sql in checked
+    assert len(params) == len(checked[sql])
+
+
+@pytest.mark.parametrize("fetch", [
+    'fetch_academic_records', 'fetch_documents', 'fetch_transfer_certificates', 'fetch_schemes',
+])
+def test_student_queries_are_the_checked_statements(checked, monkeypatch, fetch):
+    import student_data
+
+    connection = FakeConnection()
+    monkeypatch.setattr(student_data, 'get_connection', connection.checkout)
+    getattr(student_data, fetch)(1)
+    assert connection.executed[-1][0] in checked
+
+
+def test_summary_check_follows_the_schema(checked):
+    assert "SELECT * FROM academic_summary WHERE student_id = %s" \
+        " ORDER BY student_id, school_standard DESC, academic_year DESC" in checked
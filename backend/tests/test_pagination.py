@@ -0,0 +1,86 @@
+import datetime
+
+import pytest
+
+import auth
+from fakes import FakeConnection
+from pagination import (MAX_PAGE_SIZE, PaginationError, decode_cursor, encode_cursor, parse_date,
+                        parse_order, parse_page_size, split_page)
+
+
+def test_cursor_round_trip_is_url_safe():
+    token = encode_cursor({"date": datetime.date(2024, 6, 1), "id": 42})
+    assert '=' not in token and '+' not in token and '/' not in token
+    assert decode_cursor(token, ('date', 'id')) == {"date": "2024-06-01", "id": 42}
+
+
+@pytest.mark.parametrize("token", [
+    'not a cursor', 'W10', encode_cursor([1, 2]),
+    encode_cursor({}), encode_cursor({"date": "2024-06-01"}), encode_cursor({"id": 4}),
+    encode_cursor({"date": "2024-06-01", "id": "4"}), encode_cursor({"date": "June", "id": 4}),
+    encode_cursor({"date": "2024-06-01", "id": True}),
+])
+def test_malformed_cursors_are_rejected(token):
+    with pytest.raises(PaginationError):
+        decode_cursor(token, ('date', 'id'))
+
+
+def test_absent_cursor_is_the_first_page():
+    assert decode_cursor(None, ('id',)) is None and decode_cursor('', ('id',)) is None
+
+
+@pytest.mark.parametrize("parse", [
+    lambda: parse_page_size('0'),
+    lambda: parse_page_size('ten'),
+    lambda: parse_order('sideways', 'asc'),
+    lambda: parse_date('01/06/2024', 'date_from'),
+])
+def test_bad_parameters_are_rejected(parse):
+    with pytest.raises(PaginationError):
+        parse()
+
+
+def test_page_size_is_capped():
+    assert parse_page_size(str(MAX_PAGE_SIZE + 1)) == MAX_PAGE_SIZE
+
+
+def test_split_page_uses_the_look_ahead_row():
+    rows = [{"id": n} for n in range(4)]
+    page, token = split_page(rows, 3, lambda row: {"id": row['id']})
+    assert page == rows[:3] and decode_cursor(token, ('id',)) == {"id": 2}
+    assert split_page(rows[:3], 3, lambda row: row) == (rows[:3], None)
+
+
+def test_student_pages_continue_after_the_cursor():
+    import main
+    sql, params = main.student_page_query(2, 'desc', school_id=5, cursor_values={"id": 40})
+    assert "s.student_id < %s" in sql and "ORDER BY s.student_id DESC" in sql
+    assert params == (5, 40, 3)
+
+
+def test_transfer_certificate_pages_break_date_ties_on_tc_id():
+    import main
+    sql, params = main.transfer_certificate_page_query(
+        10, 'asc', cursor_values={"date": "2024-06-01", "id": 7}
+    )
+    assert "(tc.application_date > %s OR (tc.application_date = %s AND tc.tc_id > %s))" in sql
+    assert params == ("2024-06-01", "2024-06-01", 7, 11)
+
+
+def test_route_returns_the_next_cursor(monkeypatch):
+    import main
+    rows = [{"student_id": n, "name": f"s{n}"} for n in (1, 2, 3)]
+    connection = FakeConnection({"SELECT s.student_id": rows})
+    monkeypatch.setattr(main, 'get_connection', connection.checkout)
+    headers = {"Authorization": f"Bearer {auth.issue_token(1, 'admin')}"}
+    client = main.app.test_client()
+
+    response = client.get('/api/admin/students?limit=2', headers=headers)
+    assert [s['student_id'] for s in response.get_json()['students']] == [1, 2]
+    assert decode_cursor(response.get_json()['nextCursor'], ('id',)) == {"id": 2}
+
+    assert client.get('/api/admin/students?cursor=%%%', headers=headers).status_code == 400
+    # A student-list cursor has no date, so the TC list refuses it
+    response = client.get(f"/api/admin/transfer-certificates?cursor={encode_cursor({'id': 2})}",
+                          headers=headers)
+    assert response.status_code == 400 and response.get_json() == {"message": "Invalid cursor"}
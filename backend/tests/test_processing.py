@@ -0,0 +1,62 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import processing
+from fakes import FakeConnection
+
+
+def test_complete_only_updates_a_job_still_leased_to_the_worker():
+    connection = FakeConnection({"UPDATE document_processing": 1})
+    result = {"detected_type": "application/pdf", "page_count": 2, "has_text": True, "has_thumbnail": False}
+
+    assert processing.complete(connection.cursor(), "host:1", "ab" * 32, result)
+    sql, params = connection.executed[-1]
+    assert "locked_by = %s AND status = 'processing'" in sql
+    assert params[-2:] == ("ab" * 32, "host:1")
+
+
+@pytest.mark.parametrize("outcome, args", [
+    (processing.complete, ({"detected_type": None, "page_count": None, "has_text": False,
+                            "has_thumbnail": False},)),
+    (processing.fail, ("boom",)),
+])
+def test_a_lost_lease_is_reported(outcome, args):
+    connection = FakeConnection({"UPDATE document_processing": 0})
+    assert not outcome(connection.cursor(), "host:1", "cd" * 32, *args)
+
+
+class FakeBlobStore:
+    def __init__(self, tmp_path, present):
+        self.root = tmp_path
+        for content_hash in present:
+            (tmp_path / content_hash).write_bytes(b'%PDF-1.4')
+
+    def path_for(self, content_hash):
+        return str(self.root / content_hash)
+
+
+def test_run_once_holds_no_connection_while_jobs_run(tmp_path, monkeypatch):
+    hashes = ["aa" * 32, "bb" * 32]
+    connection = FakeConnection({"UPDATE document_processing": 1})
+    monkeypatch.setattr(processing, "get_connection", connection.checkout)
+    monkeypatch.setattr(processing, "claim", lambda conn, worker_id, limit: hashes)
+    checked_out_while_running = []
+
+    def slow_process_file(path):
+        # Give run_once time to reach its wait before looking
+        time.sleep(0.2)
+        checked_out_while_running.append(connection.checked_out)
+        return {"detected_type": "application/pdf", "page_count": 1, "has_text": False, "has_thumbnail": False}
+
+    monkeypatch.setattr(processing, "process_file", slow_process_file)
+    dispatcher = processing.Dispatcher(FakeBlobStore(tmp_path, hashes[:1]), processes=1)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        assert dispatcher.run_once(pool) == 2
+
+    assert checked_out_while_running == [0]
+    updates = connection.statements("UPDATE document_processing")
+    # One failure for the missing blob, one completion, each committed on its own
+    assert len(updates) == 2 and connection.commits == 2
+    assert all(params[-1] == dispatcher.worker_id for _, params in updates)
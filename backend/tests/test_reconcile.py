@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+import reconcile
+from fakes import FakeConnection
+
+HASH = "ab" * 32
+
+
+def test_merge_sorted_is_a_full_outer_join():
+    on_disk = [("a", 1), ("c", 3), ("d", 4)]
+    in_db = [("b", 20), ("c", 30)]
+    assert list(reconcile.merge_sorted(on_disk, in_db)) == [
+        ("a", 1, None), ("b", None, 20), ("c", 3, 30), ("d", 4, None),
+    ]
+
+
+def test_external_sorted_merges_spilled_runs():
+    names = [f"{n:05d}" for n in range(250)][::-1]
+    assert list(reconcile.external_sorted(iter(names), run_size=40)) == sorted(names)
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    blob = tmp_path / "blobs" / HASH[:2] / HASH[2:4] / HASH
+    blob.parent.mkdir(parents=True)
+    blob.write_bytes(b"%PDF-1.4")
+    return tmp_path
+
+
+def reconciler_for(uploads, monkeypatch, recheck_rows):
+    # The scan sees no row for the blob; the recheck answers with ``recheck_rows``
+    connection = FakeConnection({
+        "SELECT content_hash FROM (": [],
+        "SELECT file_name": [],
+        "SELECT ref_count FROM document_blobs": recheck_rows,
+        "SELECT 1 FROM documents": [],
+    })
+    monkeypatch.setattr(reconcile, "get_connection", connection.checkout)
+    return connection, reconcile.Reconciler(str(uploads), checkpoint_path=str(uploads / ".reconcile-checkpoint.json"),
+                                            quarantine=True, min_age=0)
+
+
+def test_blob_referenced_since_the_scan_is_left_in_place(uploads, monkeypatch):
+    connection, reconciler = reconciler_for(uploads, monkeypatch, [(1,)])
+    state, complete = reconciler.run()
+
+    assert complete and 'orphan_blob' not in state['counts']
+    assert (uploads / "blobs" / HASH[:2] / HASH[2:4] / HASH).exists()
+    assert connection.statements("SELECT ref_count FROM document_blobs WHERE content_hash = %s FOR UPDATE")
+
+
+def test_unreferenced_blob_is_quarantined_under_the_row_lock(uploads, monkeypatch):
+    connection, reconciler = reconciler_for(uploads, monkeypatch, [])
+    state, complete = reconciler.run()
+
+    assert complete and state['counts'] == {'orphan_blob': 1}
+    relative = os.path.join("blobs", HASH[:2], HASH[2:4], HASH)
+    assert not (uploads / relative).exists()
+    assert (uploads / "quarantine" / state['pass'] / relative).exists()
+    # Scan and recheck each end their transaction
+    assert connection.rollbacks == 2
+
+
+def test_dry_run_moves_nothing(uploads, monkeypatch):
+    _, reconciler = reconciler_for(uploads, monkeypatch, [])
+    reconciler.dry_run = True
+    state, _ = reconciler.run()
+
+    assert state['counts'] == {'orphan_blob': 1}
+    assert (uploads / "blobs" / HASH[:2] / HASH[2:4] / HASH).exists()
@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+from mysql.connector.errors import PoolError
+
+import schema
+from fakes import FakeConnection
+
+
+class FakePool:
+    """ Records which thread checked a connection out """
+
+    def __init__(self, connection, error=None):
+        self._connection = connection
+        self.error = error
+        self.threads = []
+
+    def connection(self):
+        self.threads.append(threading.current_thread().name)
+        if self.error:
+            raise self.error
+        return self._connection.checkout()
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """ A Schema at migration 3 whose recheck is due """
+    snapshot = schema.Schema({"schema_migrations": {"version"}}, version=3)
+    monkeypatch.setattr(schema, '_schema', snapshot)
+    monkeypatch.setattr(schema, '_checked_at', 0.0)
+    return snapshot
+
+
+def finish_recheck():
+    for thread in threading.enumerate():
+        if thread.name == 'schema-recheck':
+            thread.join(5)
+
+
+def test_recheck_runs_off_the_callers_thread_and_picks_up_a_migration(recorded, monkeypatch):
+    fake_pool = FakePool(FakeConnection({"SELECT MAX(version)": [(4,)]}))
+    monkeypatch.setattr(schema, 'pool', fake_pool)
+    migrated = schema.Schema({"schema_migrations": {"version"}, "tc_events": {"event_id"}}, version=4)
+    monkeypatch.setattr(schema, 'probe', lambda: migrated)
+
+    # The caller gets the snapshot it had without touching the pool itself
+    assert schema.current() is recorded
+    finish_recheck()
+    assert fake_pool.threads == ['schema-recheck']
+    assert schema.current() is migrated
+
+
+def test_unchanged_version_keeps_the_snapshot(recorded, monkeypatch):
+    monkeypatch.setattr(schema, 'pool', FakePool(FakeConnection({"SELECT MAX(version)": [(3,)]})))
+    monkeypatch.setattr(schema, 'probe', lambda: pytest.fail("re-probed an unchanged schema"))
+    schema.current()
+    finish_recheck()
+    assert schema.current() is recorded
+
+
+def test_exhausted_pool_does_not_fail_the_caller(recorded, monkeypatch):
+    monkeypatch.setattr(schema, 'pool', FakePool(FakeConnection(), error=PoolError("exhausted")))
+    assert schema.current() is recorded
+    finish_recheck()
+    assert schema.current() is recorded
@@ -0,0 +1,95 @@
+import math
+import random
+
+import pytest
+
+import search
+from fakes import FakeConnection
+from search import SearchIndex, TrigramIndex, trigrams
+
+
+@pytest.fixture
+def index():
+    index = TrigramIndex()
+    search._add_student(index, 1, "Aayushmaan Kumar", "aayush", "9876543210")
+    search._add_student(index, 2, "Aayan", "aayan", "9812345678")
+    search._add_school(index, 1, "Kendriya Vidyalaya")
+    search._set_destination(index, "Delhi Public School", 3)
+    return index
+
+
+def names(results):
+    return [result["name"] for result in results]
+
+
+def test_trigrams_are_padded_per_word():
+    assert trigrams("Ab-c") == {"  a", " ab", "ab ", "  c", " c "}
+    assert trigrams("  ") == set()
+
+
+def test_closer_match_ranks_first(index):
+    assert names(index.search("aay", 10)) == ["Aayan", "Aayushmaan Kumar"]
+
+
+def test_misspelt_query_still_matches(index):
+    assert names(index.search("kendirya", 10)) == ["Kendriya Vidyalaya"]
+
+
+def test_types_and_limit(index):
+    assert names(index.search("aay", 10, types={"school"})) == []
+    assert names(index.search("aay", 1)) == ["Aayan"]
+    assert index.search("delhi", 10)[0]["count"] == 3
+
+
+def test_removed_entries_leave_no_postings(index):
+    search._set_destination(index, "DELHI PUBLIC SCHOOL", 0)
+    index.remove(("student", 1))
+    index.remove(("student", 2))
+    index.remove(("school", 1))
+    assert len(index) == 0 and not index._postings
+
+
+def test_candidate_pruning_matches_a_full_scan():
+    rng = random.Random(7)
+    alphabet = "abcdeh "
+    index = TrigramIndex()
+    texts = {}
+    for key in range(300):
+        texts[key] = "".join(rng.choice(alphabet) for _ in range(rng.randint(3, 12)))
+        index.add(("student", key), (texts[key],), {"id": key})
+
+    for _ in range(200):
+        query = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 8)))
+        grams = trigrams(query)
+        needed = max(1, math.ceil(search.MIN_SCORE * len(grams)))
+        expected = {key for key, text in texts.items() if len(grams & trigrams(text)) >= needed}
+        assert {result["id"] for result in index.search(query, 1000)} == expected, query
+
+
+def test_change_during_a_rebuild_is_replayed_onto_the_new_index(monkeypatch):
+    index = SearchIndex(ttl=300, cache_size=16)
+    connection = FakeConnection({"SELECT name, username, contact_info": [("Zoya", "zoya", "")]})
+    monkeypatch.setattr(search, 'get_connection', connection.checkout)
+
+    def load_index():
+        # Student 5 is created after this build read the students table
+        index.refresh_student(5)
+        return TrigramIndex()
+
+    monkeypatch.setattr(search, 'load_index', load_index)
+    assert names(index.search("zoya")) == ["Zoya"]
+
+
+def test_cached_results_follow_index_changes(monkeypatch):
+    index = SearchIndex(ttl=300, cache_size=16)
+    monkeypatch.setattr(search, 'load_index', TrigramIndex)
+    assert index.search("zoya") == []
+
+    connection = FakeConnection({"SELECT name, username, contact_info": [("Zoya", "zoya", "")]})
+    monkeypatch.setattr(search, 'get_connection', connection.checkout)
+    index.refresh_student(5)
+    assert names(index.search("zoya")) == ["Zoya"]
+
+
+def test_query_sharing_no_trigrams_finds_nothing(index):
+    assert index.search("zzqqxx", 10) == []
@@ -0,0 +1,125 @@
+import io
+import os
+
+import pytest
+from mysql.connector import Error
+
+import storage
+from fakes import FakeConnection
+
+CONTENT = b'%PDF-1.4 test document'
+
+
+@pytest.fixture
+def store(tmp_path):
+    return storage.BlobStore(str(tmp_path / 'blobs'))
+
+
+def stored(store, content=CONTENT):
+    content_hash, _ = store.digest(io.BytesIO(content))
+    store.ensure(io.BytesIO(content), content_hash)
+    return content_hash
+
+
+def test_digest_rewinds_and_ensure_writes_once(store):
+    stream = io.BytesIO(CONTENT)
+    content_hash, size = store.digest(stream)
+    assert size == len(CONTENT) and stream.tell() == 0
+    assert store.ensure(stream, content_hash)
+    assert not store.ensure(io.BytesIO(CONTENT), content_hash)
+    with open(store.path_for(content_hash), 'rb') as fh:
+        assert fh.read() == CONTENT
+
+
+def test_detach_restore_and_purge(store):
+    content_hash = stored(store)
+    with open(store.preview_path(content_hash, '.txt'), 'w') as fh:
+        fh.write('text')
+
+    moves = store.detach(content_hash)
+    assert len(moves) == 2 and not store.exists(content_hash)
+    store.restore(moves)
+    assert store.exists(content_hash)
+
+    moves = store.detach(content_hash)
+    store.purge(moves)
+    assert not store.exists(content_hash)
+    shard = store.path_for(content_hash).rsplit('/', 1)[0]
+    assert not [name for name in os.listdir(shard) if name.startswith(storage.TRASH_PREFIX)]
+
+
+@pytest.mark.parametrize("rows, unreferenced, statement", [
+    ([(3,)], False, "UPDATE document_blobs SET ref_count = ref_count - 1"),
+    ([(1,)], True, "DELETE FROM document_blobs"),
+    ([], True, None),
+])
+def test_drop_reference(rows, unreferenced, statement):
+    connection = FakeConnection({"SELECT ref_count FROM document_blobs": rows})
+    assert storage.drop_reference(connection.cursor(), 'ab' * 32) is unreferenced
+    assert connection.executed[0][0].endswith("FOR UPDATE")
+    if statement:
+        assert connection.executed[1][0].startswith(statement)
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, 'blob_store', storage.BlobStore(str(tmp_path / 'blobs')))
+    current = main.schema.Schema({"documents": {"document_id", "file_path", "content_hash"}})
+    monkeypatch.setattr(main.schema, 'current', lambda: current)
+    monkeypatch.setattr(main.processing, 'available', lambda: False)
+    monkeypatch.setattr(main.processing, 'statuses', lambda hashes: {})
+    monkeypatch.setattr(main.student_cache, 'invalidate', lambda *args: None)
+    return main
+
+
+def student_headers(student_id=7):
+    import auth
+    return {"Authorization": f"Bearer {auth.issue_token(student_id, 'student')}"}
+
+
+def test_upload_locks_the_blob_row_before_checking_for_the_file(app, monkeypatch):
+    connection = FakeConnection()
+    monkeypatch.setattr(app, 'get_connection', connection.checkout)
+    ensure = app.blob_store.ensure
+    locked_before_write = []
+
+    def checked_ensure(stream, content_hash):
+        locked_before_write.append(bool(connection.statements("INSERT INTO document_blobs")))
+        return ensure(stream, content_hash)
+
+    monkeypatch.setattr(app.blob_store, 'ensure', checked_ensure)
+    response = app.app.test_client().post(
+        '/api/students/7/documents/upload', headers=student_headers(),
+        data={"file": (io.BytesIO(CONTENT), 'report.pdf'), "documentType": "report"},
+    )
+
+    assert response.status_code == 200, response.get_json()
+    assert locked_before_write == [True]
+    assert app.blob_store.exists(response.get_json()['document']['content_hash'])
+
+
+class FailingCommit(FakeConnection):
+    def commit(self):
+        raise Error("Lock wait timeout exceeded")
+
+
+@pytest.mark.parametrize("connection_class, status, kept", [
+    (FakeConnection, 200, False),
+    (FailingCommit, 500, True),
+])
+def test_deleting_the_last_reference(app, monkeypatch, connection_class, status, kept):
+    content_hash = stored(app.blob_store)
+    connection = connection_class({
+        "SELECT * FROM documents": [{"document_id": 1, "student_id": 7, "file_name": "report.pdf",
+                                     "content_hash": content_hash}],
+        "SELECT ref_count FROM document_blobs": [{"ref_count": 1}],
+    })
+    monkeypatch.setattr(app, 'get_connection', connection.checkout)
+
+    response = app.app.test_client().delete('/api/students/7/documents/1', headers=student_headers())
+
+    assert response.status_code == status
+    # Unlinked only once the delete committed; a failed commit puts the file back
+    assert app.blob_store.exists(content_hash) is kept
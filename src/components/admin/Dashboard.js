@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
-import { getAllStudents, getAllTransferCertificates, getAllSchools } from '../../services/adminService';
+import { getDashboardSummary } from '../../services/adminService';
 // Chart.js imports
 import { Chart as ChartJS, ArcElement, Tooltip, Legend, BarElement, CategoryScale, LinearScale, Title } from 'chart.js';
 import { Bar, Doughnut } from 'react-chartjs-2';
@@ -12,9 +12,8 @@ ChartJS.register(CategoryScale, LinearScale, BarElement, Title, Tooltip, Legend,
 
 const AdminDashboard = () => {
   const [stats, setStats] = useState({
-    students: [],
-    transferCertificates: [],
-    schools: []
+    totalStudents: 0,
+    transferCertificatesByStatus: { pending: 0, approved: 0, rejected: 0 }
   });
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
@@ -22,33 +21,9 @@ const AdminDashboard = () => {
   useEffect(() => {
     const fetchDashboardData = async () => {
       try {
-        console.log("Fetching students...");
-        const studentsData = await getAllStudents();
-        
-        console.log("Fetching transfer certificates...");
-        const certificatesData = await getAllTransferCertificates();
-        
-        console.log("Fetching schools...");
-        const schoolsData = await getAllSchools();
-        
-        // Make sure all students are assigned to PM SHRI Mahatma Gandhi Government School
-        const updatedStudents = studentsData.students.map(student => ({
-          ...student,
-          school_name: "PM SHRI Mahatma Gandhi Government School"
-        }));
-        
-        setStats({
-          students: updatedStudents || [],
-          transferCertificates: certificatesData.transferCertificates || [],
-          // Replace with single school for consistency
-          schools: [{
-            school_id: 1,
-            name: "PM SHRI Mahatma Gandhi Government School",
-            address: "Gandhi Road, City Center",
-            contact_info: "pmshri@example.com"
-          }]
-        });
-        
+        // Counts are aggregated server-side so the dashboard never downloads full lists
+        const data = await getDashboardSummary();
+        setStats(data.summary);
         setError(null);
       } catch (err) {
         console.error("Error fetching dashboard data:", err);
@@ -68,9 +43,9 @@ const AdminDashboard = () => {
       {
         label: 'Transfer Certificate Status',
         data: [
-          stats.transferCertificates.filter(tc => tc.status === 'pending').length,
-          stats.transferCertificates.filter(tc => tc.status === 'approved').length,
-          stats.transferCertificates.filter(tc => tc.status === 'rejected').length,
+          stats.transferCertificatesByStatus.pending,
+          stats.transferCertificatesByStatus.approved,
+          stats.transferCertificatesByStatus.rejected,
         ],
         backgroundColor: [
           'rgba(234, 179, 8, 0.6)',  // Amber for pending
@@ -92,7 +67,7 @@ const AdminDashboard = () => {
     labels: ["PM SHRI Mahatma Gandhi Government School"],
     datasets: [
       {
-        data: [stats.students.length],
+        data: [stats.totalStudents],
         backgroundColor: ['rgba(59, 130, 246, 0.6)'], // Blue
         borderColor: ['rgba(59, 130, 246, 1)'],
         borderWidth: 1,
@@ -136,7 +111,7 @@ const AdminDashboard = () => {
             </h2>
           </div>
           <div className="p-6 flex flex-col items-center">
-            <span className="text-4xl font-bold text-blue-600">{stats.students.length}</span>
+            <span className="text-4xl font-bold text-blue-600">{stats.totalStudents}</span>
             <p className="text-gray-500 mb-4">Total Students</p>
             <Link 
               to="/admin/students" 
@@ -158,7 +133,7 @@ const AdminDashboard = () => {
           </div>
           <div className="p-6 flex flex-col items-center">
             <span className="text-4xl font-bold text-amber-500">
-              {stats.transferCertificates.filter(tc => tc.status === 'pending').length}
+              {stats.transferCertificatesByStatus.pending}
             </span>
             <p className="text-gray-500 mb-4">Require Attention</p>
             <Link 
@@ -227,7 +202,7 @@ const AdminDashboard = () => {
           <div className="p-6 h-[calc(100%-64px)] flex flex-col">
             <div className="text-center mb-4">
               <h3 className="text-xl font-bold text-gray-800">PM SHRI Mahatma Gandhi Government School</h3>
-              <p className="text-gray-600 mt-2">All students ({stats.students.length}) are enrolled in this school</p>
+              <p className="text-gray-600 mt-2">All students ({stats.totalStudents}) are enrolled in this school</p>
             </div>
             <div className="bg-blue-50 border-l-4 border-blue-500 p-4 mt-4">
               <div className="flex">
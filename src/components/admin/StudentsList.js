@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Card, Table, Form, InputGroup, Button, Badge, Modal, Row, Col, Alert, Tabs, Tab, ListGroup, Accordion } from 'react-bootstrap';
-import { getAllStudents, getComprehensiveStudentDetails, updateStudent } from '../../services/adminService';
+import { getAllStudents, getComprehensiveStudentDetails, getComprehensiveStudentDetailsBatch, updateStudent, searchAdmin } from '../../services/adminService';
 import { FaDownload, FaChartBar, FaTable } from 'react-icons/fa';
 import AcademicRecordsView from '../shared/AcademicRecordsView';
 
@@ -10,6 +10,10 @@ const StudentsList = () => {
   const [error, setError] = useState(null);
   const [searchTerm, setSearchTerm] = useState('');
   const [filteredStudents, setFilteredStudents] = useState([]);
+  const [suggestions, setSuggestions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [exporting, setExporting] = useState(false);
   
   // Student details modal states
   const [showDetailsModal, setShowDetailsModal] = useState(false);
@@ -26,6 +30,7 @@ const StudentsList = () => {
 
   // State for academic records and schemes
   const [academicRecords, setAcademicRecords] = useState([]);
+  const [academicSummary, setAcademicSummary] = useState([]);
   const [schemes, setSchemes] = useState([]);
   const [activeTab, setActiveTab] = useState('personal');
   const [groupedRecords, setGroupedRecords] = useState({});
@@ -36,19 +41,19 @@ const StudentsList = () => {
     fetchStudents();
   }, []);
 
+  // Ensure all students have the same school name
+  const withSchool = (list) => list.map(student => ({
+    ...student,
+    school_name: "PM SHRI Mahatma Gandhi Government School"
+  }));
+
   const fetchStudents = async () => {
     try {
       setLoading(true);
       const data = await getAllStudents();
       
-      // Ensure all students have the same school name
-      const studentsWithSchool = data.students.map(student => ({
-        ...student,
-        school_name: "PM SHRI Mahatma Gandhi Government School"
-      }));
-      
-      setStudents(studentsWithSchool);
-      setFilteredStudents(studentsWithSchool);
+      setStudents(withSchool(data.students));
+      setNextCursor(data.nextCursor || null);
       setError(null);
     } catch (err) {
       setError('Failed to load students data');
@@ -58,6 +63,21 @@ const StudentsList = () => {
     }
   };
 
+  const loadMoreStudents = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const data = await getAllStudents({ cursor: nextCursor });
+      setStudents(prev => [...prev, ...withSchool(data.students)]);
+      setNextCursor(data.nextCursor || null);
+    } catch (err) {
+      setError('Failed to load more students');
+      console.error(err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     if (searchTerm.trim() === '') {
       setFilteredStudents(students);
@@ -70,6 +90,69 @@ const StudentsList = () => {
     }
   }, [searchTerm, students]);
 
+  // Server-side typeahead also finds students on pages that are not loaded yet
+  const SEARCH_DEBOUNCE_MS = 150;
+
+  useEffect(() => {
+    const term = searchTerm.trim();
+    if (term.length < 2) {
+      setSuggestions([]);
+      return undefined;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const data = await searchAdmin(term, { types: 'student', limit: 8 });
+        // Ignore answers to keystrokes that have since been superseded
+        if (!cancelled) setSuggestions(data.results || []);
+      } catch (err) {
+        if (!cancelled) setSuggestions([]);
+        console.error(err);
+      }
+    }, SEARCH_DEBOUNCE_MS);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm]);
+
+  const handleSuggestionClick = (studentId) => {
+    setSuggestions([]);
+    handleViewDetails(studentId);
+  };
+
+  // Export comprehensive details of the listed students, fetched in batches
+  // rather than one request per student
+  const EXPORT_BATCH_SIZE = 100;
+
+  const handleExportStudents = async () => {
+    try {
+      setExporting(true);
+      const ids = filteredStudents.map(student => student.student_id);
+      const exported = {};
+      for (let i = 0; i < ids.length; i += EXPORT_BATCH_SIZE) {
+        const data = await getComprehensiveStudentDetailsBatch(ids.slice(i, i + EXPORT_BATCH_SIZE));
+        Object.assign(exported, data.students);
+      }
+
+      const url = window.URL.createObjectURL(
+        new Blob([JSON.stringify(exported, null, 2)], { type: 'application/json' })
+      );
+      const link = document.createElement('a');
+      link.href = url;
+      link.setAttribute('download', 'students_export.json');
+      document.body.appendChild(link);
+      link.click();
+      link.remove();
+      window.URL.revokeObjectURL(url);
+    } catch (err) {
+      setError('Failed to export students');
+      console.error(err);
+    } finally {
+      setExporting(false);
+    }
+  };
+
   const handleViewDetails = async (studentId) => {
     try {
       setDetailsLoading(true);
@@ -137,6 +220,9 @@ const StudentsList = () => {
         setGroupedRecords({});
       }
       
+      // Server-side rollup, one row per standard and academic year
+      setAcademicSummary(data.academicSummary || []);
+      
       // Set schemes data
       setSchemes(data.schemes || []);
       
@@ -194,8 +280,13 @@ const StudentsList = () => {
   };
 
   const renderStandardSummary = (standard, standardRecords) => {
-    const avgMarks = calculateAverage(standardRecords);
-    const avgPercentage = calculateAveragePercentage(standardRecords);
+    // Use the stored summary when the standard covers a single academic year
+    const rows = academicSummary.filter(row => row.school_standard === standard);
+    const stored = rows.length === 1 ? rows[0] : null;
+    const avgMarks = stored ? parseFloat(stored.average_marks).toFixed(2) : calculateAverage(standardRecords);
+    const avgPercentage = stored
+      ? parseFloat(stored.average_percentage).toFixed(2)
+      : calculateAveragePercentage(standardRecords);
     
     return (
       <div className="standard-summary p-3 mb-4 bg-light rounded">
@@ -312,19 +403,47 @@ const StudentsList = () => {
         <Card.Header className="bg-primary text-white">
           <div className="d-flex justify-content-between align-items-center">
             <h5 className="m-0">Students List</h5>
-            <div className="d-flex">
-              <InputGroup>
-                <Form.Control
-                  placeholder="Search students..."
-                  value={searchTerm}
-                  onChange={(e) => setSearchTerm(e.target.value)}
-                />
-                {searchTerm && (
-                  <Button variant="outline-light" onClick={() => setSearchTerm('')}>
-                    ✕
-                  </Button>
+            <div className="d-flex gap-2">
+              <Button
+                variant="outline-light"
+                onClick={handleExportStudents}
+                disabled={exporting || filteredStudents.length === 0}
+                className="text-nowrap"
+              >
+                <FaDownload className="me-1" />
+                {exporting ? 'Exporting...' : 'Export'}
+              </Button>
+              <div className="position-relative">
+                <InputGroup>
+                  <Form.Control
+                    placeholder="Search students..."
+                    value={searchTerm}
+                    onChange={(e) => setSearchTerm(e.target.value)}
+                  />
+                  {searchTerm && (
+                    <Button variant="outline-light" onClick={() => setSearchTerm('')}>
+                      ✕
+                    </Button>
+                  )}
+                </InputGroup>
+                {suggestions.length > 0 && (
+                  <ListGroup
+                    className="position-absolute w-100 shadow"
+                    style={{ zIndex: 1000, maxHeight: '320px', overflowY: 'auto' }}
+                  >
+                    {suggestions.map((result) => (
+                      <ListGroup.Item
+                        key={result.id}
+                        action
+                        onClick={() => handleSuggestionClick(result.id)}
+                      >
+                        <div>{result.name}</div>
+                        <small className="text-muted">#{result.id} · {result.username}</small>
+                      </ListGroup.Item>
+                    ))}
+                  </ListGroup>
                 )}
-              </InputGroup>
+              </div>
             </div>
           </div>
         </Card.Header>
@@ -382,6 +501,13 @@ const StudentsList = () => {
               </tbody>
             </Table>
           </div>
+          {nextCursor && (
+            <div className="text-center">
+              <Button variant="outline-primary" onClick={loadMoreStudents} disabled={loadingMore}>
+                {loadingMore ? 'Loading...' : 'Load more students'}
+              </Button>
+            </div>
+          )}
         </Card.Body>
       </Card>
 
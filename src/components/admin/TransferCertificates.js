@@ -1,6 +1,12 @@
 import React, { useState, useEffect } from 'react';
 import { Card, Table, Badge, Button, Form, Modal, Alert } from 'react-bootstrap';
-import { getAllTransferCertificates, updateTransferCertificate, deleteTransferCertificate } from '../../services/adminService';
+import {
+  getAllTransferCertificates,
+  updateTransferCertificate,
+  bulkDecideTransferCertificates,
+  deleteTransferCertificate
+} from '../../services/adminService';
+import { subscribeToEvents } from '../../services/events';
 import { useAuth } from '../../context/AuthContext';
 
 const TransferCertificates = () => {
@@ -15,18 +21,56 @@ const TransferCertificates = () => {
   const [showDeleteConfirmModal, setShowDeleteConfirmModal] = useState(false);
   const [certificateToDelete, setCertificateToDelete] = useState(null);
   const [deleteSuccess, setDeleteSuccess] = useState('');
+  const [statusFilter, setStatusFilter] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [selectedIds, setSelectedIds] = useState([]);
+  const [bulkStatus, setBulkStatus] = useState(null);
+  const [bulkComments, setBulkComments] = useState('');
+  const [bulkSubmitting, setBulkSubmitting] = useState(false);
+  const [bulkResult, setBulkResult] = useState('');
+  const [newApplications, setNewApplications] = useState(0);
 
-  // Fetch certificates on component mount
+  // Fetch certificates on mount and whenever the status filter changes
   useEffect(() => {
     fetchCertificates();
-  }, []);
+  }, [statusFilter]); // eslint-disable-line react-hooks/exhaustive-deps
 
-  // Fetch Transfer Certificates with Error Handling
+  // Decisions and deletions are pushed by the server and applied to the loaded rows
+  useEffect(() => {
+    return subscribeToEvents('/api/admin/transfer-certificates/events', {
+      'tc.updated': (change) => {
+        if (statusFilter && change.status !== statusFilter) {
+          setCertificates(prev => prev.filter(cert => cert.tc_id !== change.tc_id));
+        } else {
+          setCertificates(prev => prev.map(cert => (
+            cert.tc_id === change.tc_id ? { ...cert, ...change } : cert
+          )));
+        }
+        if (change.status !== 'pending') {
+          setSelectedIds(prev => prev.filter(id => id !== change.tc_id));
+        }
+      },
+      'tc.deleted': (change) => {
+        setCertificates(prev => prev.filter(cert => cert.tc_id !== change.tc_id));
+        setSelectedIds(prev => prev.filter(id => id !== change.tc_id));
+      },
+      // New applications are announced rather than inserted, so the loaded pages do not shift
+      'tc.created': () => setNewApplications(count => count + 1),
+      resync: () => fetchCertificates()
+    });
+  }, [statusFilter]); // eslint-disable-line react-hooks/exhaustive-deps
+
+  const filterParams = () => (statusFilter ? { status: statusFilter } : {});
+
+  // Fetch the first page of Transfer Certificates with Error Handling
   const fetchCertificates = async () => {
     try {
-      const data = await getAllTransferCertificates();
-      console.log("Fetched Certificates:", data); // Debugging
+      const data = await getAllTransferCertificates(filterParams());
       setCertificates(data.transferCertificates || []);  // Ensure it's an array
+      setNextCursor(data.nextCursor || null);
+      setSelectedIds([]);
+      setNewApplications(0);
     } catch (err) {
       setError("Failed to load transfer certificates");
       console.error(err);
@@ -35,6 +79,22 @@ const TransferCertificates = () => {
     }
   };
 
+  // Append the next page using the cursor returned by the previous request
+  const loadMoreCertificates = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const data = await getAllTransferCertificates({ ...filterParams(), cursor: nextCursor });
+      setCertificates(prev => [...prev, ...(data.transferCertificates || [])]);
+      setNextCursor(data.nextCursor || null);
+    } catch (err) {
+      setError("Failed to load transfer certificates");
+      console.error(err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   // Open Modal to Process Certificate
   const handleProcessCertificate = (certificate) => {
     setSelectedCertificate(certificate);
@@ -63,6 +123,55 @@ const TransferCertificates = () => {
     }
   };
 
+  // Only pending applications can be decided in bulk
+  const pendingIds = certificates.filter(cert => cert.status === 'pending').map(cert => cert.tc_id);
+  const allPendingSelected = pendingIds.length > 0 && pendingIds.every(id => selectedIds.includes(id));
+
+  const toggleSelected = (tcId) => {
+    setSelectedIds(prev => (prev.includes(tcId) ? prev.filter(id => id !== tcId) : [...prev, tcId]));
+  };
+
+  const toggleAllPending = () => {
+    setSelectedIds(allPendingSelected ? [] : pendingIds);
+  };
+
+  // Open the confirmation modal for approving or rejecting the selection
+  const handleBulkClick = (decision) => {
+    setBulkStatus(decision);
+    setBulkComments('');
+  };
+
+  // Apply one decision to every selected certificate in a single request
+  const handleBulkSubmit = async (e) => {
+    e.preventDefault();
+    if (!bulkStatus || selectedIds.length === 0) return;
+
+    try {
+      setBulkSubmitting(true);
+      const data = await bulkDecideTransferCertificates(selectedIds, {
+        status: bulkStatus,
+        comments: bulkComments,
+        processed_by: currentUser?.name || 'Admin'
+      });
+
+      let summary = `${data.updated} application(s) ${data.status}`;
+      if (data.skipped) summary += `, ${data.skipped} skipped (no longer pending)`;
+      if (data.notFound) summary += `, ${data.notFound} not found`;
+      setBulkResult(summary);
+      setTimeout(() => {
+        setBulkResult('');
+      }, 5000);
+
+      setBulkStatus(null);
+      fetchCertificates(); // Refresh data
+    } catch (err) {
+      console.error('Error applying bulk decision:', err);
+      setError(err.message || 'Failed to update transfer certificates');
+    } finally {
+      setBulkSubmitting(false);
+    }
+  };
+
   // Handle Delete Certificate Click
   const handleDeleteClick = (certificate) => {
     setCertificateToDelete(certificate);
@@ -80,6 +189,7 @@ const TransferCertificates = () => {
       
       // Remove certificate from state
       setCertificates(certificates.filter(cert => cert.tc_id !== certificateToDelete.tc_id));
+      setSelectedIds(selectedIds.filter(id => id !== certificateToDelete.tc_id));
       
       // Close modal and show success message
       setShowDeleteConfirmModal(false);
@@ -120,14 +230,71 @@ const TransferCertificates = () => {
       <h1 className="mb-4">Transfer Certificates Management</h1>
       
       <Card className="shadow">
-        <Card.Header as="h5" className="bg-primary text-white">
-          Transfer Certificate Applications
+        <Card.Header className="bg-primary text-white">
+          <div className="d-flex justify-content-between align-items-center">
+            <h5 className="m-0">Transfer Certificate Applications</h5>
+            <Form.Select
+              size="sm"
+              style={{ width: 'auto' }}
+              value={statusFilter}
+              onChange={(e) => setStatusFilter(e.target.value)}
+            >
+              <option value="">All statuses</option>
+              <option value="pending">Pending</option>
+              <option value="approved">Approved</option>
+              <option value="rejected">Rejected</option>
+            </Form.Select>
+          </div>
         </Card.Header>
         <Card.Body>
+          {newApplications > 0 && (
+            <Alert variant="info" className="d-flex justify-content-between align-items-center">
+              <span>{newApplications} new application(s) submitted</span>
+              <Button variant="outline-primary" size="sm" onClick={fetchCertificates}>
+                Refresh
+              </Button>
+            </Alert>
+          )}
+          {bulkResult && (
+            <Alert variant="success">
+              {bulkResult}
+            </Alert>
+          )}
+          {pendingIds.length > 0 && (
+            <div className="d-flex align-items-center mb-3">
+              <span className="me-3">{selectedIds.length} selected</span>
+              <Button
+                variant="success"
+                size="sm"
+                disabled={selectedIds.length === 0}
+                onClick={() => handleBulkClick('approved')}
+              >
+                Approve selected
+              </Button>
+              <Button
+                variant="outline-danger"
+                size="sm"
+                disabled={selectedIds.length === 0}
+                onClick={() => handleBulkClick('rejected')}
+                className="ms-2"
+              >
+                Reject selected
+              </Button>
+            </div>
+          )}
           <div className="table-responsive">
             <Table striped bordered hover>
               <thead>
                 <tr>
+                  <th>
+                    <Form.Check
+                      type="checkbox"
+                      aria-label="Select all pending applications"
+                      checked={allPendingSelected}
+                      disabled={pendingIds.length === 0}
+                      onChange={toggleAllPending}
+                    />
+                  </th>
                   <th>ID</th>
                   <th>Student</th>
                   <th>Application Date</th>
@@ -140,6 +307,15 @@ const TransferCertificates = () => {
                 {certificates.length > 0 ? (
                   certificates.map((cert) => (
                     <tr key={cert.tc_id}>
+                      <td>
+                        <Form.Check
+                          type="checkbox"
+                          aria-label={`Select application ${cert.tc_id}`}
+                          checked={selectedIds.includes(cert.tc_id)}
+                          disabled={cert.status !== 'pending'}
+                          onChange={() => toggleSelected(cert.tc_id)}
+                        />
+                      </td>
                       <td>{cert.tc_id}</td>
                       <td>{cert.student_name || 'N/A'}</td>
                       <td>{cert.application_date ? new Date(cert.application_date).toLocaleDateString() : 'N/A'}</td>
@@ -166,7 +342,7 @@ const TransferCertificates = () => {
                   ))
                 ) : (
                   <tr>
-                    <td colSpan="6" className="text-center">
+                    <td colSpan="7" className="text-center">
                       No transfer certificate applications available
                     </td>
                   </tr>
@@ -174,6 +350,13 @@ const TransferCertificates = () => {
               </tbody>
             </Table>
           </div>
+          {nextCursor && (
+            <div className="text-center">
+              <Button variant="outline-primary" onClick={loadMoreCertificates} disabled={loadingMore}>
+                {loadingMore ? 'Loading...' : 'Load more applications'}
+              </Button>
+            </div>
+          )}
         </Card.Body>
       </Card>
 
@@ -234,6 +417,43 @@ const TransferCertificates = () => {
         </Form>
       </Modal>
 
+      {/* Bulk Decision Modal */}
+      <Modal show={bulkStatus !== null} onHide={() => setBulkStatus(null)}>
+        <Modal.Header closeButton>
+          <Modal.Title>
+            {bulkStatus === 'approved' ? 'Approve' : 'Reject'} {selectedIds.length} Application(s)
+          </Modal.Title>
+        </Modal.Header>
+        <Form onSubmit={handleBulkSubmit}>
+          <Modal.Body>
+            <p>
+              Applications that have already been processed by someone else are skipped.
+            </p>
+            <Form.Group className="mb-3">
+              <Form.Label>Comments</Form.Label>
+              <Form.Control
+                as="textarea"
+                rows={3}
+                value={bulkComments}
+                onChange={(e) => setBulkComments(e.target.value)}
+              />
+            </Form.Group>
+          </Modal.Body>
+          <Modal.Footer>
+            <Button variant="secondary" onClick={() => setBulkStatus(null)}>
+              Cancel
+            </Button>
+            <Button
+              variant={bulkStatus === 'approved' ? 'success' : 'danger'}
+              type="submit"
+              disabled={bulkSubmitting}
+            >
+              {bulkSubmitting ? 'Saving...' : (bulkStatus === 'approved' ? 'Approve' : 'Reject')}
+            </Button>
+          </Modal.Footer>
+        </Form>
+      </Modal>
+
       {/* Delete Confirmation Modal */}
       <Modal show={showDeleteConfirmModal} onHide={() => setShowDeleteConfirmModal(false)}>
         <Modal.Header closeButton>
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../../context/AuthContext';
-import { getStudentProfile, getAcademicRecords, getTransferCertificates } from '../../services/studentService';
+import { getStudentDashboard } from '../../services/studentService';
 import { Link } from 'react-router-dom';
 import styled, { keyframes, createGlobalStyle } from 'styled-components';
 import { ProgressBar, Badge as RBBadge } from 'react-bootstrap';
@@ -228,6 +228,7 @@ const StudentDashboard = () => {
   const { currentUser } = useAuth();
   const [profile, setProfile] = useState(null);
   const [records, setRecords] = useState([]);
+  const [summary, setSummary] = useState([]);
   const [certificates, setCertificates] = useState([]);
   const [loading, setLoading] = useState(true);
   const [groupedRecords, setGroupedRecords] = useState({});
@@ -235,19 +236,21 @@ const StudentDashboard = () => {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const profileData = await getStudentProfile(currentUser.id);
-        const academicData = await getAcademicRecords(currentUser.id);
-        const certificatesData = await getTransferCertificates(currentUser.id);
+        // One round trip; the server loads the sections concurrently
+        const data = await getStudentDashboard(currentUser.id, [
+          'profile', 'academicRecords', 'academicSummary', 'transferCertificates'
+        ]);
         
-        setProfile(profileData.profile);
-        console.log('Academic records data:', academicData);
+        setProfile(data.profile);
+        // Per standard/year rollup maintained by the server
+        setSummary(data.academicSummary || []);
         
         // Set the full records array
-        if (academicData && academicData.academicRecords) {
-          setRecords(academicData.academicRecords);
+        if (data.academicRecords) {
+          setRecords(data.academicRecords);
           
           // Group records by academic_year and school_standard for better organization
-          const grouped = academicData.academicRecords.reduce((acc, record) => {
+          const grouped = data.academicRecords.reduce((acc, record) => {
             // Create a unique key using academic_year and school_standard
             const yearKey = record.academic_year || 'Unknown';
             const standardKey = record.school_standard || 'Unknown';
@@ -267,7 +270,7 @@ const StudentDashboard = () => {
           setGroupedRecords(grouped);
         }
         
-        setCertificates(certificatesData.transferCertificates);
+        setCertificates(data.transferCertificates || []);
       } catch (error) {
         console.error('Error fetching dashboard data:', error);
       } finally {
@@ -295,33 +298,29 @@ const StudentDashboard = () => {
     return 'secondary';
   };
 
-  // Calculate top performer subject
+  // Best subject across all standards, from the summary rows
   const getTopPerformingSubject = () => {
-    if (!records || records.length === 0) return { subject: 'N/A', marks: 0 };
+    if (!summary || summary.length === 0) return { subject: 'N/A', marks: 0 };
     
-    let highestMarks = 0;
-    let topSubject = '';
+    const best = summary.reduce((top, row) => (
+      parseFloat(row.best_percentage) > parseFloat(top.best_percentage) ? row : top
+    ));
     
-    records.forEach(record => {
-      const marks = parseFloat(record.marks) || 0;
-      if (marks > highestMarks) {
-        highestMarks = marks;
-        topSubject = record.subject;
-      }
-    });
-    
-    return { subject: topSubject, marks: highestMarks };
+    return { subject: best.best_subject, marks: parseFloat(best.best_percentage) };
   };
 
-  // Calculate average percentage
+  // Average percentage over every subject, weighting each standard by its subject count
   const getAveragePerformance = () => {
-    if (!records || records.length === 0) return 0;
+    if (!summary || summary.length === 0) return 0;
     
-    const totalPercentage = records.reduce((sum, record) => {
-      return sum + (parseFloat(record.percentage) || 0);
-    }, 0);
+    let total = 0;
+    let subjects = 0;
+    summary.forEach(row => {
+      total += parseFloat(row.average_percentage) * row.subject_count;
+      subjects += row.subject_count;
+    });
     
-    return (totalPercentage / records.length).toFixed(1);
+    return subjects ? (total / subjects).toFixed(1) : 0;
   };
 
   if (loading) {
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { Card, Table, Button, Form, Modal, Alert } from 'react-bootstrap';
+import { Card, Table, Button, Form, Modal, Alert, Badge } from 'react-bootstrap';
 import { useAuth } from '../../context/AuthContext';
 import { getDocuments, uploadDocument } from '../../services/studentService';
 import { Formik } from 'formik';
@@ -23,6 +23,39 @@ const Documents = () => {
     fetchDocuments();
   }, []);
 
+  // Previews are generated in the background; check again while any are still queued
+  useEffect(() => {
+    const waiting = documents.some(doc => doc.processing_status === 'pending' || doc.processing_status === 'processing');
+    if (!waiting) return undefined;
+    const timer = setTimeout(fetchDocuments, 5000);
+    return () => clearTimeout(timer);
+  }, [documents]);
+
+  const renderPreview = (doc) => {
+    if (doc.thumbnail_url) {
+      return (
+        <img
+          src={doc.thumbnail_url}
+          alt={doc.file_name}
+          loading="lazy"
+          style={{ width: '64px', height: '64px', objectFit: 'cover', cursor: 'pointer' }}
+          onClick={() => handleViewDocument(doc)}
+        />
+      );
+    }
+    switch (doc.processing_status) {
+      case 'pending':
+      case 'processing':
+        return <Badge bg="secondary">Processing</Badge>;
+      case 'invalid':
+        return <Badge bg="danger">File type mismatch</Badge>;
+      case 'failed':
+        return <Badge bg="warning">No preview</Badge>;
+      default:
+        return null;
+    }
+  };
+
   const fetchDocuments = async () => {
     try {
       const data = await getDocuments(currentUser.id);
@@ -137,7 +170,8 @@ const Documents = () => {
       console.log(`Using API URL: ${apiUrl}`);
       
       const response = await fetch(`${apiUrl}/api/students/${currentUser.id}/documents/${documentToDelete.document_id}`, {
-        method: 'DELETE'
+        method: 'DELETE',
+        headers: { Authorization: `Bearer ${localStorage.getItem('token')}` }
       });
 
       console.log(`Delete response status: ${response.status}`);
@@ -205,6 +239,7 @@ const Documents = () => {
             <Table striped bordered hover responsive>
               <thead>
                 <tr>
+                  <th>Preview</th>
                   <th>Type</th>
                   <th>File Name</th>
                   <th>Upload Date</th>
@@ -214,8 +249,12 @@ const Documents = () => {
               <tbody>
                 {documents.map((doc) => (
                   <tr key={doc.document_id}>
+                    <td>{renderPreview(doc)}</td>
                     <td>{doc.document_type}</td>
-                    <td>{doc.file_name}</td>
+                    <td>
+                      {doc.file_name}
+                      {doc.page_count > 1 && <div className="text-muted small">{doc.page_count} pages</div>}
+                    </td>
                     <td>{new Date(doc.upload_date).toLocaleDateString()}</td>
                     <td>
                       <div className="d-flex gap-2">
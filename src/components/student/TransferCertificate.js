@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Card, Table, Button, Form, Modal, Alert, Badge } from 'react-bootstrap';
 import { useAuth } from '../../context/AuthContext';
 import { getTransferCertificates, applyForTransferCertificate, deleteTransferCertificate } from '../../services/studentService';
+import { subscribeToEvents } from '../../services/events';
 import { Formik } from 'formik';
 import * as Yup from 'yup';
 
@@ -20,6 +21,20 @@ const TransferCertificate = () => {
     fetchCertificates();
   }, []);
 
+  // Status changes are pushed by the server instead of re-fetching the list
+  useEffect(() => {
+    if (!currentUser?.id) return undefined;
+    return subscribeToEvents(`/api/students/${currentUser.id}/transfer-certificate/events`, {
+      'tc.updated': (change) => setCertificates(prev => prev.map(cert => (
+        cert.tc_id === change.tc_id ? { ...cert, ...change } : cert
+      ))),
+      'tc.deleted': (change) => setCertificates(prev => prev.filter(cert => cert.tc_id !== change.tc_id)),
+      'tc.created': () => fetchCertificates(),
+      // Changes were missed (server restart or a long disconnect): reload once
+      resync: () => fetchCertificates()
+    });
+  }, [currentUser?.id]); // eslint-disable-line react-hooks/exhaustive-deps
+
   const fetchCertificates = async () => {
     try {
       const data = await getTransferCertificates(currentUser.id);
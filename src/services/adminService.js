@@ -9,13 +9,21 @@ const handleRequest = async (request, errorMessage) => {
   }
 };
 
-export const getAllStudents = async () => {
-  return handleRequest(API.get('/api/admin/students'), 'Failed to fetch students');
+// List endpoints are keyset-paginated: pass the previous response's nextCursor
+// as `cursor` to fetch the following page
+export const getAllStudents = async (params = {}) => {
+  return handleRequest(API.get('/api/admin/students', { params }), 'Failed to fetch students');
 };
 
-export const getAllTransferCertificates = async () => {
+// Typeahead over student names/usernames/contacts, schools and TC destination
+// schools, best matches first; `types` narrows it, e.g. { types: 'student' }
+export const searchAdmin = async (q, params = {}) => {
+  return handleRequest(API.get('/api/admin/search', { params: { q, ...params } }), 'Search failed');
+};
+
+export const getAllTransferCertificates = async (params = {}) => {
   try {
-    const response = await API.get('/api/admin/transfer-certificates');
+    const response = await API.get('/api/admin/transfer-certificates', { params });
     console.log("API Response:", response.data); // Debugging
     return response.data;
   } catch (error) {
@@ -31,6 +39,13 @@ export const updateTransferCertificate = async (tcId, data) => {
   );
 };
 
+export const bulkDecideTransferCertificates = async (tcIds, data) => {
+  return handleRequest(
+    API.post('/api/admin/transfer-certificates/bulk-decision', { tcIds, ...data }),
+    'Failed to update transfer certificates'
+  );
+};
+
 export const deleteTransferCertificate = async (tcId) => {
   return handleRequest(
     API.delete(`/api/admin/transfer-certificates/${tcId}`),
@@ -38,6 +53,10 @@ export const deleteTransferCertificate = async (tcId) => {
   );
 };
 
+export const getDashboardSummary = async () => {
+  return handleRequest(API.get('/api/admin/dashboard/summary'), 'Failed to fetch dashboard summary');
+};
+
 export const getAllSchools = async () => {
   return handleRequest(API.get('/api/admin/schools'), 'Failed to fetch schools');
 };
@@ -62,6 +81,15 @@ export const getComprehensiveStudentDetails = async (studentId) => {
   }
 };
 
+// Fetch comprehensive details for up to 100 students in one request.
+// Resolves to { students: { [studentId]: { student, academicRecords, schemes } }, missing: [...] }
+export const getComprehensiveStudentDetailsBatch = async (studentIds) => {
+  return handleRequest(
+    API.post('/api/admin/students/comprehensive', { studentIds }),
+    'Failed to fetch comprehensive student details'
+  );
+};
+
 // New functions for academic records management
 export const getAcademicRecords = async (studentId) => {
   return handleRequest(
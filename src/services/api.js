@@ -13,6 +13,53 @@ API.interceptors.request.use((config) => {
   return config;
 });
 
+// Access tokens are short-lived; on a 401 exchange the refresh token once and retry.
+// Concurrent failures share a single refresh request.
+let refreshRequest = null;
+
+export const refreshAccessToken = () => {
+  if (!refreshRequest) {
+    const refreshToken = localStorage.getItem('refreshToken');
+    refreshRequest = (refreshToken
+      ? axios.post(`${API.defaults.baseURL}/api/auth/refresh`, { refreshToken })
+      : Promise.reject(new Error('No refresh token'))
+    )
+      .then((response) => {
+        localStorage.setItem('token', response.data.token);
+        localStorage.setItem('refreshToken', response.data.refreshToken);
+        return response.data.token;
+      })
+      .finally(() => {
+        refreshRequest = null;
+      });
+  }
+  return refreshRequest;
+};
+
+API.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const original = error.config;
+    const isAuthCall = original?.url?.startsWith('/api/auth/');
+    if (error.response?.status !== 401 || !original || original._retried || isAuthCall) {
+      return Promise.reject(error);
+    }
+    original._retried = true;
+    try {
+      const token = await refreshAccessToken();
+      original.headers.Authorization = `Bearer ${token}`;
+      return API(original);
+    } catch (refreshError) {
+      // Session is over: clear it and send the user back to the login page
+      localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
+      localStorage.removeItem('user');
+      window.location.assign('/login');
+      return Promise.reject(error);
+    }
+  }
+);
+
 // Function to fetch all transfer certificates
 export const getAllTransferCertificates = async () => {
   try {
@@ -6,6 +6,7 @@ export const login = async (credentials) => {
 
     if (response.data.token) {
       localStorage.setItem('token', response.data.token);
+      localStorage.setItem('refreshToken', response.data.refreshToken);
       localStorage.setItem('user', JSON.stringify(response.data.user));
     }
 
@@ -17,7 +18,16 @@ export const login = async (credentials) => {
 };
 
 export const logout = () => {
+  const token = localStorage.getItem('token');
+  const refreshToken = localStorage.getItem('refreshToken');
+  if (token) {
+    // Revoke both tokens server-side; local state is cleared regardless
+    API.post('/api/auth/logout', { refreshToken }, {
+      headers: { Authorization: `Bearer ${token}` },
+    }).catch(() => {});
+  }
   localStorage.removeItem('token');
+  localStorage.removeItem('refreshToken');
   localStorage.removeItem('user');
 };
 
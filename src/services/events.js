@@ -0,0 +1,46 @@
+import API, { refreshAccessToken } from './api';
+
+// Server-sent events. EventSource cannot send an Authorization header, so the
+// access token travels in the URL; the server ends the stream when that token
+// expires. The browser's own reconnect is then refused, so refresh the token
+// and reopen, resuming after the last event received.
+export const subscribeToEvents = (path, handlers) => {
+  let source = null;
+  let lastEventId = null;
+  let closed = false;
+  let retryTimer = null;
+
+  const open = () => {
+    const params = new URLSearchParams({ token: localStorage.getItem('token') || '' });
+    if (lastEventId) params.set('lastEventId', lastEventId);
+    source = new EventSource(`${API.defaults.baseURL}${path}?${params}`);
+
+    Object.entries(handlers).forEach(([name, handler]) => {
+      source.addEventListener(name, (event) => {
+        lastEventId = event.lastEventId || lastEventId;
+        handler(event.data ? JSON.parse(event.data) : {});
+      });
+    });
+
+    source.onerror = () => {
+      // While CONNECTING the browser retries on its own; CLOSED means the server refused us
+      if (closed || source.readyState !== EventSource.CLOSED) return;
+      retryTimer = setTimeout(async () => {
+        try {
+          await refreshAccessToken();
+        } catch (err) {
+          return; // Session is over; the next API call sends the user to the login page
+        }
+        if (!closed) open();
+      }, 1000);
+    };
+  };
+
+  open();
+
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    if (source) source.close();
+  };
+};
@@ -9,6 +9,18 @@ export const getStudentProfile = async (studentId) => {
   }
 };
 
+// Fetch several dashboard sections in a single request.
+// `fields` limits the payload, e.g. ['profile', 'academicRecords'].
+export const getStudentDashboard = async (studentId, fields) => {
+  try {
+    const params = fields ? { fields: fields.join(',') } : {};
+    const response = await API.get(`/api/students/${studentId}/dashboard`, { params });
+    return response.data;
+  } catch (error) {
+    throw error.response?.data || { message: 'Failed to fetch dashboard' };
+  }
+};
+
 export const getAcademicRecords = async (studentId) => {
   try {
     const response = await API.get(`/api/students/${studentId}/academic-records`);